@@ -0,0 +1,102 @@
+import argparse
+import dataclasses
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.harness import compare, run_components, run_pipeline, store, summarize
+from benchmarks.synthetic import MIB, SCENARIOS, Scenario, generate
+from fgi.logger import Logger
+
+RESULTS_PATH = Path(__file__).parent / "results"
+
+
+def _add_scenario_options(parser: argparse.ArgumentParser):
+    _ = parser.add_argument("-s", "--scenarios", nargs="*", choices=SCENARIOS.keys(), default=["small"], help="Predefined scenarios")
+    _ = parser.add_argument("--dex-count", type=int, help="Override count of dex files")
+    _ = parser.add_argument("--classes-per-dex", type=int, help="Override count of classes in every dex")
+    _ = parser.add_argument("--native-lib-size", type=int, help="Override size of every native library, in MiB")
+    _ = parser.add_argument("--native-lib-count", type=int, help="Override count of native libraries per architecture")
+    _ = parser.add_argument("--resource-size", type=int, help="Override total size of resources, in MiB")
+    _ = parser.add_argument("--split", action=argparse.BooleanOptionalAction, help="Override split layout (base + ABI config splits)")
+
+
+def _get_scenarios(args: argparse.Namespace) -> list[Scenario]:
+    overrides = {
+        "dex_count": args.dex_count,
+        "classes_per_dex": args.classes_per_dex,
+        "native_lib_size": args.native_lib_size * MIB if args.native_lib_size is not None else None,
+        "native_lib_count": args.native_lib_count,
+        "resource_size": args.resource_size * MIB if args.resource_size is not None else None,
+        "split": args.split,
+    }
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return [dataclasses.replace(SCENARIOS[name], **overrides) for name in args.scenarios]
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks on synthetic APKs, fully offline")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Only generate synthetic APKs")
+    _add_scenario_options(generate_parser)
+    _ = generate_parser.add_argument("-o", "--out", type=Path, default=Path.cwd(), help="Output directory")
+
+    run_parser = subparsers.add_parser("run", help="Run benchmarks and store results")
+    _add_scenario_options(run_parser)
+    _ = run_parser.add_argument(
+        "-m",
+        "--mode",
+        choices=["components", "pipeline"],
+        default="components",
+        help="components times JVM-free stages only, pipeline times whole fgi run (requires JDK and APKEditor jar)",
+    )
+    _ = run_parser.add_argument("-n", "--repeat", type=int, default=3, help="Runs per scenario, medians are compared")
+    _ = run_parser.add_argument("--apkeditor", type=Path, default=Path.home() / ".fgi" / "apkeditor.jar", help="APKEditor jar served by local release server")
+    _ = run_parser.add_argument("--gadget-size", type=int, default=20, help="Size of synthetic frida-gadget, in MiB")
+    _ = run_parser.add_argument("-r", "--results", type=Path, default=RESULTS_PATH, help="Directory for results")
+    _ = run_parser.add_argument("--keep", action="store_true", help="Keep generated APKs and outputs")
+    _ = run_parser.add_argument("fgi_args", nargs=argparse.REMAINDER, help="Extra fgi options for pipeline mode, after --")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results")
+    _ = compare_parser.add_argument("baseline", type=Path)
+    _ = compare_parser.add_argument("current", type=Path)
+    _ = compare_parser.add_argument("-t", "--threshold", type=float, default=10, help="Allowed slowdown of stage median wall time, in %%")
+
+    args = parser.parse_args()
+    Logger.initialize(False)
+
+    if args.command == "compare":
+        regressions = compare(args.baseline, args.current, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    if args.command == "generate":
+        for scenario in _get_scenarios(args):
+            Logger.info(f"Generated {generate(scenario, args.out)}")
+        return
+
+    if args.mode == "pipeline":
+        assert args.apkeditor.exists(), "APKEditor jar doesn't exist, specify it via --apkeditor"
+    fgi_args = [arg for arg in args.fgi_args if arg != "--"]
+    for scenario in _get_scenarios(args):
+        workdir = Path(tempfile.mkdtemp(prefix=f"fgi-benchmark-{scenario.name}-"))
+        try:
+            if args.mode == "pipeline":
+                runs = run_pipeline(scenario, workdir, args.apkeditor, args.gadget_size * MIB, args.repeat, fgi_args)
+            else:
+                runs = []
+                for i in range(args.repeat):
+                    (workdir / str(i)).mkdir()
+                    runs.append(run_components(scenario, workdir / str(i), args.gadget_size * MIB))
+        finally:
+            if not args.keep:
+                shutil.rmtree(workdir, True)
+        path = store(args.results, scenario, args.mode, runs)
+        Logger.info(f"{scenario.name}: results are stored in {path}")
+        for key, summary in summarize(runs).items():
+            Logger.info(f"  {key}: {summary['wall']:.3f}s wall, {summary['cpu']:.3f}s CPU")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import dataclasses
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from pathlib import Path
+from typing import Any
+from zipfile import ZipFile
+
+from benchmarks.releases import ReleaseServer
+from benchmarks.synthetic import Scenario, generate
+from fgi.apk import APK
+from fgi.archive import ZipRewriter
+from fgi.arguments import Arguments
+from fgi.dex import Dex
+from fgi.frida_config import CONFIG_TYPES
+from fgi.library import Library
+from fgi.logger import Logger
+from fgi.main import App
+from fgi.manifest import Manifest
+from fgi.profiler import Profiler
+from fgi.signer import Signer
+from fgi.smali import Smali, SmaliIndex
+
+Records = list[dict[str, Any]]
+
+SMALI_TEMPLATE = """.class public %s
+.super %s
+
+
+# direct methods
+.method public constructor <init>()V
+    .locals 0
+
+    invoke-direct {p0}, %s-><init>()V
+
+    return-void
+.end method
+"""
+
+
+class HomeOverride:
+    """Points fgi cache (~/.fgi) into benchmark directory, so real one isn't touched"""
+
+    def __init__(self, home: Path):
+        self.home = home
+        self.original: dict[str, str | None] = {}
+
+    def __enter__(self):
+        self.home.mkdir(exist_ok=True)
+        for key in ("HOME", "USERPROFILE"):
+            self.original[key] = os.environ.get(key)
+            os.environ[key] = str(self.home)
+        return self
+
+    def __exit__(self, *_):
+        for key, value in self.original.items():
+            if value is None:
+                _ = os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def _write_smali_tree(temp_path: Path, input_path: Path):
+    """Decoded tree like APKEditor produces it, for JVM-free smali benchmarks"""
+    with ZipFile(input_path) as zipfile:
+        names = sorted((name for name in zipfile.namelist() if name.endswith(".dex")), key=lambda x: int(x[7:-4] or 1))
+        for name in names:
+            root = temp_path / "smali" / name.removesuffix(".dex")
+            for descriptor in Dex(zipfile.read(name)).class_descriptors():
+                class_name = descriptor.decode()
+                superclass = "Landroid/app/Activity;" if class_name.endswith("/MainActivity;") else "Ljava/lang/Object;"
+                path = root / (class_name[1:-1] + ".smali")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                _ = path.write_text(SMALI_TEMPLATE % (class_name, superclass, superclass), encoding="utf8")
+
+
+def run_components(scenario: Scenario, workdir: Path, gadget_size: int) -> Records:
+    """Time JVM-free stages (manifest parsing, dex scan, smali index and injection, compose, sign) on synthetic APK"""
+    input_path = generate(scenario, workdir)
+    home = workdir / "home"
+    home.mkdir()
+    for arch in scenario.architectures:
+        _ = (home / f"{arch}.so").write_bytes(os.urandom(gadget_size))
+    argv = ["-i", str(input_path), "-o", str(workdir / "out.apk"), "-r", str(workdir), "-a", *scenario.architectures]
+    arguments = Arguments.create(argv + (["--split-native"] if scenario.split else []))
+    loader = arguments.pick_loader()(None, input_path, workdir)  # pyright: ignore[reportArgumentType]
+
+    Profiler.initialize(True)
+    with Profiler.stage("total"):
+        with Profiler.stage("load"):
+            loader.load()
+        apk = APK(None, arguments, loader)  # pyright: ignore[reportArgumentType]
+        with Profiler.stage("entry activities"):
+            entrypoints = apk.get_entry_activities()
+        with Profiler.stage("find entry dexes"):
+            _ = apk.find_entry_dexes(entrypoints)
+
+        _write_smali_tree(apk.temp_path, loader.output_path)
+        with Profiler.stage("smali index"):
+            index = SmaliIndex(apk.temp_path)
+            _ = index._load()  # pyright: ignore[reportPrivateUsage]
+        with Profiler.stage("smali injection"):
+            for entrypoint in entrypoints:
+                smali = Smali.find(apk.temp_path, entrypoint, index)
+                smali.perform_injection(arguments.library_name)
+                smali.save()
+
+        with Profiler.stage("manifest"):
+            manifest = Manifest.from_apk(loader.output_path)
+            manifest.enable_extract_native_libs()
+            patched_manifest = manifest.to_bytes()
+
+        library = Library(arguments.library_name, arguments.architectures, home)
+        library.copy_frida()
+        library.copy_config(CONFIG_TYPES["listen"])
+        composed = workdir / "composed.apk"
+        with Profiler.stage("compose"):
+            with ZipFile(loader.output_path) as source, ZipRewriter(composed) as built:
+                built.write("AndroidManifest.xml", patched_manifest)
+                built.copy_all(source, {"AndroidManifest.xml"})
+                library.write(built)
+
+        if Signer.is_available():
+            key_path = home / "debug.keystore"
+            Signer.generate_key(key_path)
+            with Profiler.stage("sign"):
+                APK.sign_file(composed, key_path)
+        else:
+            Logger.warn("cryptography is not installed, skipping sign stage")
+        del apk
+    return Profiler.records
+
+
+def run_pipeline(scenario: Scenario, workdir: Path, apkeditor_path: Path, gadget_size: int, repeat: int, extra_args: list[str]) -> list[Records]:
+    """Time whole App.run on synthetic APK, first run includes deps download from local release server"""
+    input_path = generate(scenario, workdir)
+    temp_root = workdir / "tmp"
+    temp_root.mkdir()
+    runs: list[Records] = []
+    with HomeOverride(workdir / "home"), ReleaseServer(apkeditor_path, gadget_size):
+        for i in range(repeat):
+            out = workdir / (f"out-{i}" if "--split-native" in extra_args else f"out-{i}.apk")
+            argv = ["-i", str(input_path), "-o", str(out), "-r", str(temp_root), "--profile", str(workdir / f"profile-{i}.json"), "--no-result-cache"]
+            Logger.info(f"Running {scenario.name} ({i + 1}/{repeat})...")
+            App(argv + extra_args).run()
+            runs.append(Profiler.records)
+    return runs
+
+
+def _get_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=Path(__file__).parent, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def store(results_path: Path, scenario: Scenario, mode: str, runs: list[Records]) -> Path:
+    results_path.mkdir(parents=True, exist_ok=True)
+    path = results_path / f"{time.strftime('%Y%m%d-%H%M%S')}-{scenario.name}-{mode}.json"
+    result = {
+        "scenario": dataclasses.asdict(scenario),
+        "mode": mode,
+        "commit": _get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "time": time.time(),
+        "runs": runs,
+    }
+    with open(path, "w", encoding="utf8") as f:
+        json.dump(result, f, indent=2)
+    return path
+
+
+def summarize(runs: list[Records]) -> dict[str, dict[str, float]]:
+    """Median wall and CPU time per stage (keyed by path of nested stages) across runs"""
+    samples: dict[str, dict[str, list[float]]] = {}
+    for records in runs:
+        stack: list[str] = []
+        totals: dict[str, dict[str, float]] = {}
+        for record in records:
+            if record["kind"] != "stage":
+                continue
+            del stack[record["depth"] :]
+            stack.append(record["name"])
+            total = totals.setdefault("/".join(stack), {"wall": 0, "cpu": 0})
+            total["wall"] += record.get("wall") or 0
+            total["cpu"] += (record.get("cpu") or 0) + (record.get("children_cpu") or 0)
+        for key, total in totals.items():
+            sample = samples.setdefault(key, {"wall": [], "cpu": []})
+            sample["wall"].append(total["wall"])
+            sample["cpu"].append(total["cpu"])
+    return {key: {metric: statistics.median(values) for metric, values in sample.items()} for key, sample in samples.items()}
+
+
+def compare(baseline_path: Path, current_path: Path, threshold: float, min_wall: float = 0.05) -> int:
+    """Print per-stage difference of median wall time, returns count of regressions above threshold (in %)"""
+    with open(baseline_path, "r", encoding="utf8") as f:
+        baseline = summarize(json.load(f)["runs"])
+    with open(current_path, "r", encoding="utf8") as f:
+        current = summarize(json.load(f)["runs"])
+
+    regressions = 0
+    rows = [("Stage", "Baseline s", "Current s", "Delta", "")]
+    for key in [*baseline, *(key for key in current if key not in baseline)]:
+        before = baseline.get(key, {}).get("wall")
+        after = current.get(key, {}).get("wall")
+        delta = "-"
+        flag = ""
+        if before is not None and after is not None and before > 0:
+            change = (after - before) / before * 100
+            delta = f"{change:+.1f}%"
+            # Short stages are too noisy to be judged
+            if change > threshold and max(before, after) >= min_wall:
+                flag = "REGRESSION"
+                regressions += 1
+        rows.append((key, "-" if before is None else f"{before:.3f}", "-" if after is None else f"{after:.3f}", delta, flag))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    for row in rows:
+        print("  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row)))
+    return regressions
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import lzma
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from fgi import cache
+from fgi.constants import ARCHITECTURES
+
+FRIDA_TAG = "16.0.0-benchmark"
+APKEDITOR_TAG = "V1.0.0-benchmark"
+
+
+class ReleaseServer:
+    """Local stand-in for GitHub release API serving synthetic frida-gadget and given APKEditor jar"""
+
+    def __init__(self, apkeditor_path: Path | None, gadget_size: int):
+        self.assets: dict[str, bytes] = {}
+        frida_assets = []
+        for arch in ARCHITECTURES:
+            name = f"frida-gadget-{FRIDA_TAG}-android-{arch}.so.xz"
+            self.assets[name] = lzma.compress(os.urandom(gadget_size), preset=0)
+            frida_assets.append(name)
+        apkeditor_assets = []
+        if apkeditor_path is not None:
+            name = f"APKEditor-{APKEDITOR_TAG}.jar"
+            self.assets[name] = apkeditor_path.read_bytes()
+            apkeditor_assets.append(name)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._create_handler())
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        self.releases = {
+            "/repos/frida/frida/releases": (FRIDA_TAG, frida_assets),
+            "/repos/REAndroid/APKEditor/releases": (APKEDITOR_TAG, apkeditor_assets),
+        }
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def _describe(self, tag: str, names: list[str]) -> bytes:
+        assets = [
+            {
+                "name": name,
+                "browser_download_url": f"{self.url}/assets/{name}",
+                "size": len(self.assets[name]),
+                "digest": "sha256:" + hashlib.sha256(self.assets[name]).hexdigest(),
+            }
+            for name in names
+        ]
+        return json.dumps({"tag_name": tag, "assets": assets}).encode()
+
+    def _create_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):  # pyright: ignore[reportImplicitOverride]
+                pass
+
+            def _send(self, status: int, body: bytes, headers: dict[str, str] | None = None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                _ = self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith("/assets/"):
+                    data = server.assets.get(self.path.removeprefix("/assets/"))
+                    if data is None:
+                        return self._send(404, b"")
+                    offset = int(self.headers["Range"].removeprefix("bytes=").rstrip("-")) if self.headers.get("Range") else 0
+                    if offset:
+                        return self._send(206, data[offset:], {"Content-Range": f"bytes {offset}-{len(data) - 1}/{len(data)}"})
+                    return self._send(200, data)
+
+                for prefix, (tag, names) in server.releases.items():
+                    if self.path in (f"{prefix}/latest", f"{prefix}/tags/{tag}"):
+                        etag = f'"{tag}"'
+                        if self.headers.get("If-None-Match") == etag:
+                            return self._send(304, b"", {"ETag": etag})
+                        return self._send(200, server._describe(tag, names), {"ETag": etag})
+                return self._send(404, b"")
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        # fgi resolves release URLs through this table only
+        self.original_urls = dict(cache._RELEASE_URLS)  # pyright: ignore[reportPrivateUsage]
+        cache._RELEASE_URLS.update(  # pyright: ignore[reportPrivateUsage]
+            {
+                "frida": (f"{self.url}/repos/frida/frida/releases/latest", f"{self.url}/repos/frida/frida/releases/tags/%s"),
+                "apkeditor": (f"{self.url}/repos/REAndroid/APKEditor/releases/latest", f"{self.url}/repos/REAndroid/APKEditor/releases/tags/%s"),
+            }
+        )
+        return self
+
+    def __exit__(self, *_):
+        cache._RELEASE_URLS.update(self.original_urls)  # pyright: ignore[reportPrivateUsage]
+        self.server.shutdown()
+        self.server.server_close()
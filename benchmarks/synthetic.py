@@ -0,0 +1,286 @@
+import hashlib
+import os
+import struct
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+
+from fgi.archive import ZipRewriter
+from fgi.axml import (
+    ANDROID_ATTRIBUTE_IDS,
+    ANDROID_NAMESPACE,
+    RES_STRING_POOL_TYPE,
+    RES_XML_END_ELEMENT_TYPE,
+    RES_XML_END_NAMESPACE_TYPE,
+    RES_XML_RESOURCE_MAP_TYPE,
+    RES_XML_START_ELEMENT_TYPE,
+    RES_XML_START_NAMESPACE_TYPE,
+    RES_XML_TYPE,
+    TYPE_INT_BOOLEAN,
+    TYPE_INT_DEC,
+    TYPE_STRING,
+)
+from fgi.constants import ARCHITECTURES
+
+PACKAGE = "com.fgi.benchmark"
+ENTRY_ACTIVITY = PACKAGE + ".MainActivity"
+NO_INDEX = 0xFFFFFFFF
+MIB = 1024 * 1024
+
+# (namespace is android, name, value), value type defines attribute type
+Attribute = tuple[bool, str, str | int | bool]
+# (tag, attributes, children)
+Element = tuple[str, list[Attribute], list["Element"]]
+
+
+@dataclass
+class Scenario:
+    """Shape of synthetic APK"""
+
+    name: str
+    dex_count: int = 1
+    classes_per_dex: int = 1000
+    native_lib_size: int = 1 * MIB
+    native_lib_count: int = 1
+    architectures: tuple[str, ...] = ("arm64",)
+    resource_size: int = 4 * MIB
+    resource_count: int = 64
+    split: bool = False
+    extract_native_libs: bool = False
+    min_sdk_version: int = 24
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario("small"),
+        Scenario("multidex", dex_count=8, classes_per_dex=5000),
+        Scenario("native-heavy", native_lib_size=64 * MIB, native_lib_count=4, architectures=("arm64", "arm")),
+        Scenario("large", dex_count=16, classes_per_dex=8000, native_lib_size=32 * MIB, native_lib_count=4, resource_size=256 * MIB, resource_count=2048),
+        Scenario("split", dex_count=4, classes_per_dex=4000, native_lib_size=16 * MIB, architectures=("arm64", "arm", "x86_64"), split=True),
+    )
+}
+
+
+def _uleb128(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if not value:
+            out.append(byte)
+            return bytes(out)
+        out.append(byte | 0x80)
+
+
+def _align(data: bytearray, alignment: int = 4):
+    data.extend(b"\x00" * (-len(data) % alignment))
+
+
+def _to_descriptor(class_name: str) -> str:
+    return "L" + class_name.replace(".", "/") + ";"
+
+
+def create_dex(classes: dict[str, str]) -> bytes:
+    """Minimal valid dex, every class (name -> superclass name) has only constructor calling super one"""
+    supers = {_to_descriptor(name): _to_descriptor(superclass) for name, superclass in classes.items()}
+    # Strings (and so types and methods) must be sorted, plain ASCII sorts same way as UTF-16
+    strings = sorted(set(supers) | set(supers.values()) | {"<init>", "V"})
+    string_index = {string: i for i, string in enumerate(strings)}
+    types = [string for string in strings if string.startswith("L") or string == "V"]
+    type_index = {descriptor: i for i, descriptor in enumerate(types)}
+    # All methods are "<init>()V", so they're sorted by class only
+    method_classes = sorted(set(supers) | set(supers.values()), key=lambda x: type_index[x])
+    method_index = {descriptor: i for i, descriptor in enumerate(method_classes)}
+    class_defs = sorted(supers)
+
+    string_ids_offset = 0x70
+    type_ids_offset = string_ids_offset + 4 * len(strings)
+    proto_ids_offset = type_ids_offset + 4 * len(types)
+    method_ids_offset = proto_ids_offset + 12
+    class_defs_offset = method_ids_offset + 8 * len(method_classes)
+    data_offset = class_defs_offset + 32 * len(class_defs)
+
+    data = bytearray()
+    code_offsets: dict[str, int] = {}
+    for descriptor in class_defs:
+        code_offsets[descriptor] = data_offset + len(data)
+        # 1 register (this), invoke-direct {p0}, super-><init>()V; return-void
+        data += struct.pack("<4HII", 1, 1, 1, 0, 0, 4) + struct.pack("<4H", 0x1070, method_index[supers[descriptor]], 0, 0x000E)
+    string_data_offset = data_offset + len(data)
+    string_offsets: list[int] = []
+    for string in strings:
+        string_offsets.append(data_offset + len(data))
+        data += _uleb128(len(string)) + string.encode() + b"\x00"
+    class_data_offset = data_offset + len(data)
+    class_data_offsets: dict[str, int] = {}
+    for descriptor in class_defs:
+        class_data_offsets[descriptor] = data_offset + len(data)
+        # No fields, one direct method (public constructor), no virtual methods
+        data += _uleb128(0) + _uleb128(0) + _uleb128(1) + _uleb128(0)
+        data += _uleb128(method_index[descriptor]) + _uleb128(0x10001) + _uleb128(code_offsets[descriptor])
+    _align(data)
+    map_offset = data_offset + len(data)
+    sections = [
+        (0x0000, 1, 0),
+        (0x0001, len(strings), string_ids_offset),
+        (0x0002, len(types), type_ids_offset),
+        (0x0003, 1, proto_ids_offset),
+        (0x0005, len(method_classes), method_ids_offset),
+        (0x0006, len(class_defs), class_defs_offset),
+        (0x2001, len(class_defs), data_offset),
+        (0x2002, len(strings), string_data_offset),
+        (0x2000, len(class_defs), class_data_offset),
+        (0x1000, 1, map_offset),
+    ]
+    data += struct.pack("<I", len(sections)) + b"".join(struct.pack("<HHII", kind, 0, size, offset) for kind, size, offset in sections)
+
+    body = bytearray()
+    body += b"".join(struct.pack("<I", offset) for offset in string_offsets)
+    body += b"".join(struct.pack("<I", string_index[descriptor]) for descriptor in types)
+    body += struct.pack("<3I", string_index["V"], type_index["V"], 0)
+    body += b"".join(struct.pack("<HHI", type_index[descriptor], 0, string_index["<init>"]) for descriptor in method_classes)
+    for descriptor in class_defs:
+        # public, superclass, no interfaces, source file, annotations or static values
+        body += struct.pack("<8I", type_index[descriptor], 0x1, type_index[supers[descriptor]], 0, NO_INDEX, 0, class_data_offsets[descriptor], 0)
+    body += data
+
+    file_size = 0x70 + len(body)
+    header = bytearray(0x70)
+    header[:8] = b"dex\n035\x00"
+    struct.pack_into("<3I", header, 32, file_size, 0x70, 0x12345678)
+    struct.pack_into("<5I", header, 44, 0, 0, map_offset, len(strings), string_ids_offset)
+    struct.pack_into("<4I", header, 64, len(types), type_ids_offset, 1, proto_ids_offset)
+    struct.pack_into("<4I", header, 88, len(method_classes), method_ids_offset, len(class_defs), class_defs_offset)
+    struct.pack_into("<2I", header, 104, file_size - data_offset, data_offset)
+    header[12:32] = hashlib.sha1(bytes(header[32:]) + body).digest()
+    struct.pack_into("<I", header, 8, zlib.adler32(bytes(header[12:]) + body))
+    return bytes(header) + bytes(body)
+
+
+def create_axml(root: Element) -> bytes:
+    """Binary XML with android namespace, used for manifests"""
+    strings: list[str] = []
+    # Attribute names which have resource ids must come first, in same order as resource map
+    ids = {name: resource_id for resource_id, name in ANDROID_ATTRIBUTE_IDS.items()}
+    mapped: list[str] = []
+
+    def collect(element: Element):
+        for is_android, name, _ in element[1]:
+            if is_android and name in ids and name not in mapped:
+                mapped.append(name)
+        for child in element[2]:
+            collect(child)
+
+    collect(root)
+    strings += mapped
+
+    def index(string: str) -> int:
+        if string not in strings:
+            strings.append(string)
+        return strings.index(string)
+
+    def node(chunk_type: int, extension: bytes) -> bytes:
+        return struct.pack("<HHIII", chunk_type, 16, 16 + len(extension), 1, NO_INDEX) + extension
+
+    namespace = struct.pack("<II", index("android"), index(ANDROID_NAMESPACE))
+    body = bytearray(node(RES_XML_START_NAMESPACE_TYPE, namespace))
+
+    def write(element: Element):
+        tag, attributes, children = element
+        encoded = bytearray()
+        for is_android, name, value in attributes:
+            if isinstance(value, bool):
+                raw, data_type, data = NO_INDEX, TYPE_INT_BOOLEAN, NO_INDEX if value else 0
+            elif isinstance(value, int):
+                raw, data_type, data = NO_INDEX, TYPE_INT_DEC, value
+            else:
+                raw = data = index(value)
+                data_type = TYPE_STRING
+            encoded += struct.pack("<3IHBBI", index(ANDROID_NAMESPACE) if is_android else NO_INDEX, index(name), raw, 8, 0, data_type, data)
+        body.extend(node(RES_XML_START_ELEMENT_TYPE, struct.pack("<II6H", NO_INDEX, index(tag), 20, 20, len(attributes), 0, 0, 0) + encoded))
+        for child in children:
+            write(child)
+        body.extend(node(RES_XML_END_ELEMENT_TYPE, struct.pack("<II", NO_INDEX, index(tag))))
+
+    write(root)
+    body += node(RES_XML_END_NAMESPACE_TYPE, namespace)
+
+    pool = bytearray()
+    offsets: list[int] = []
+    for string in strings:
+        offsets.append(len(pool))
+        pool += struct.pack("<H", len(string)) + string.encode("utf-16-le") + b"\x00\x00"
+    _align(pool)
+    strings_start = 28 + 4 * len(strings)
+    string_pool = struct.pack("<HHI5I", RES_STRING_POOL_TYPE, 28, strings_start + len(pool), len(strings), 0, 0, strings_start, 0)
+    string_pool += b"".join(struct.pack("<I", offset) for offset in offsets) + pool
+    resource_map = struct.pack("<HHI", RES_XML_RESOURCE_MAP_TYPE, 8, 8 + 4 * len(mapped)) + b"".join(struct.pack("<I", ids[name]) for name in mapped)
+
+    content = string_pool + resource_map + body
+    return struct.pack("<HHI", RES_XML_TYPE, 8, 8 + len(content)) + content
+
+
+def create_manifest(scenario: Scenario) -> bytes:
+    launcher = (
+        "intent-filter",
+        [],
+        [
+            ("action", [(True, "name", "android.intent.action.MAIN")], []),
+            ("category", [(True, "name", "android.intent.category.LAUNCHER")], []),
+        ],
+    )
+    application = (
+        "application",
+        [(True, "extractNativeLibs", scenario.extract_native_libs)],
+        [("activity", [(True, "name", ENTRY_ACTIVITY), (True, "exported", True)], [launcher])],
+    )
+    uses_sdk = ("uses-sdk", [(True, "minSdkVersion", scenario.min_sdk_version)], [])
+    return create_axml(("manifest", [(False, "package", PACKAGE)], [uses_sdk, application]))
+
+
+def create_split_manifest(split: str) -> bytes:
+    return create_axml(("manifest", [(False, "package", PACKAGE), (False, "split", split)], [("application", [], [])]))
+
+
+def _write_native_libs(writer: ZipRewriter, scenario: Scenario, arch: str):
+    for i in range(scenario.native_lib_count):
+        # Random data doesn't compress, same as real stripped libraries mostly
+        writer.write(f"lib/{ARCHITECTURES[arch]}/libnative{i}.so", os.urandom(scenario.native_lib_size), compress=scenario.extract_native_libs)
+
+
+def _write_base(writer: ZipRewriter, scenario: Scenario):
+    writer.write("AndroidManifest.xml", create_manifest(scenario))
+    for i in range(scenario.dex_count):
+        classes = {f"{PACKAGE}.generated{i}.Class{j}": "java.lang.Object" for j in range(scenario.classes_per_dex)}
+        if i == scenario.dex_count - 1:
+            # Entry activity is in last dex, so finding it requires scanning all of them
+            classes[ENTRY_ACTIVITY] = "android.app.Activity"
+        writer.write("classes.dex" if i == 0 else f"classes{i + 1}.dex", create_dex(classes))
+    if scenario.resource_count:
+        resource_size = scenario.resource_size // scenario.resource_count
+        for i in range(scenario.resource_count):
+            # Half compressible, half random
+            writer.write(f"res/raw/resource{i}.bin", bytes(resource_size // 2) + os.urandom(resource_size - resource_size // 2))
+
+
+def generate(scenario: Scenario, out: Path) -> Path:
+    """Generate APK (or split APKs directory) for scenario, returns input path for fgi"""
+    if not scenario.split:
+        path = out / f"{scenario.name}.apk"
+        with ZipRewriter(path) as writer:
+            _write_base(writer, scenario)
+            for arch in scenario.architectures:
+                _write_native_libs(writer, scenario, arch)
+        return path
+
+    path = out / scenario.name
+    path.mkdir()
+    with ZipRewriter(path / "base.apk") as writer:
+        _write_base(writer, scenario)
+    for arch in scenario.architectures:
+        abi = ARCHITECTURES[arch].replace("-", "_")
+        with ZipRewriter(path / f"split_config.{abi}.apk") as writer:
+            writer.write("AndroidManifest.xml", create_split_manifest(f"config.{abi}"))
+            _write_native_libs(writer, scenario, arch)
+    return path
@@ -0,0 +1,15 @@
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from fgi.session import PatchResult, Session
+
+__all__ = ["PatchResult", "Session"]
+
+
+def __getattr__(name: str) -> Any:
+    # Imported on first use, as session pulls in whole pipeline and every fgi module would import it otherwise
+    if name in __all__:
+        from fgi import session
+
+        return getattr(session, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,81 +1,150 @@
 import platform
 import random
+import re
 import shutil
 import string
 from pathlib import Path
+from zipfile import ZipFile
 
+from fgi.apkeditor import APKEditor
+from fgi.archive import ZipRewriter
 from fgi.arguments import Arguments
+from fgi.axml import BINARY_MANIFEST_ERRORS, BinaryManifest
 from fgi.cmd import run_command_and_check
+from fgi.constants import ARCHITECTURES, DEX_ENTRY_PATTERN, SIGNATURE_ENTRY_PATTERN
+from fgi.dex import Dex
+from fgi.library import Library
 from fgi.loaders.base import BaseLoader
 from fgi.loaders.split import SplitAPKLoader
 from fgi.logger import Logger
+from fgi.signer import V2_MIN_SDK, Signer
+from fgi.smali import SmaliIndex
+from fgi.tree_cache import TreeCache
 from fgi.utils.not_none import not_none
 
 
 class APK:
-    def __init__(self, apkeditor_path: Path, arguments: Arguments, loader: BaseLoader):
-        self.apkeditor_path = apkeditor_path
+    def __init__(self, apkeditor: APKEditor, arguments: Arguments, loader: BaseLoader):
+        self.apkeditor = apkeditor
         self.arguments = arguments
         self.loader = loader
         self.temp_path = self.arguments.temp_root_path / "".join(random.choices(string.ascii_letters, k=12))
+        # Stub dex name -> original dex name
+        self.target_dexes: dict[str, str] = {}
+        # Patched binary manifest, replaces one from rebuilt stub
+        self.manifest: bytes | None = None
 
     @property
-    def _built_apk_path(self):
-        return self.arguments.temp_root_path / (self.loader.source.absolute().name + "-built")
+    def _stub_apk_path(self):
+        return self.arguments.temp_root_path / (self.loader.source.absolute().name + "-stub")
+
+    @property
+    def _rebuilt_apk_path(self):
+        return self.arguments.temp_root_path / (self.loader.source.absolute().name + "-rebuilt")
 
     @property
     def _zipaligned_apk_path(self):
         return self.arguments.temp_root_path / (self.loader.source.absolute().name + "-zipaligned")
 
-    @property
-    def _signed_apk_path(self):
-        return self.arguments.temp_root_path / (self.loader.source.absolute().name + "-signed")
+    def list_dexes(self) -> list[str]:
+        with ZipFile(self.loader.output_path) as zipfile:
+            return sorted(filter(lambda x: re.fullmatch(DEX_ENTRY_PATTERN, x), zipfile.namelist()))
 
-    def decode(self):
-        Logger.info(f"Decoding APK to {self.temp_path}...")
-        _ = run_command_and_check(
+    def find_entry_dexes(self, entrypoints: list[str]) -> list[str]:
+        descriptors = {Dex.to_descriptor(entrypoint): entrypoint for entrypoint in entrypoints}
+        dex_names: list[str] = []
+        with ZipFile(self.loader.output_path) as zipfile:
+            for name in sorted(filter(lambda x: re.fullmatch(DEX_ENTRY_PATTERN, x), zipfile.namelist())):
+                defined = set(Dex(zipfile.read(name)).class_descriptors()) & descriptors.keys()
+                for descriptor in defined:
+                    Logger.debug(f"{descriptors.pop(descriptor)} is defined in {name}")
+                if defined:
+                    dex_names.append(name)
+                if not descriptors:
+                    return dex_names
+        raise RuntimeError(f"Couldn't find dex containing entrypoint(s) ({', '.join(descriptors.values())})")
+
+    def decode_dex(self, dex_names: list[str], tree_cache: TreeCache | None = None):
+        """Decode stub APK with manifest, resource table and only given dex files, so res/ isn't decoded and encoded"""
+        self.target_dexes = {("classes.dex" if i == 0 else f"classes{i + 1}.dex"): name for i, name in enumerate(dex_names)}
+        with ZipFile(self.loader.output_path) as source, ZipRewriter(self._stub_apk_path) as stub:
+            for name in ("AndroidManifest.xml", "resources.arsc"):
+                if name in source.NameToInfo:
+                    stub.copy(source, source.getinfo(name))
+            for stub_name, name in self.target_dexes.items():
+                stub.copy(source, source.getinfo(name), stub_name)
+
+        key = ""
+        if tree_cache is not None:
+            key = tree_cache.compute_key(self._stub_apk_path)
+            if tree_cache.fetch(key, self.temp_path):
+                self._stub_apk_path.unlink()
+                return
+
+        Logger.info(f"Decoding {', '.join(dex_names)} to {self.temp_path}...")
+        _ = self.apkeditor.run(
             [
-                "java",
-                "-jar",
-                self.apkeditor_path,
                 "d",
                 "-i",
-                self.loader.output_path,
+                self._stub_apk_path,
                 "-o",
                 self.temp_path,
             ]
         )
+        self._stub_apk_path.unlink()
+        if tree_cache is not None:
+            # Index is stored with tree, so later runs reuse it
+            SmaliIndex(self.temp_path).ensure()
+            tree_cache.store(key, self.temp_path)
 
     def build(self):
         Logger.info("Building APK...")
-        _ = run_command_and_check(
+        _ = self.apkeditor.run(
             [
-                "java",
-                "-jar",
-                self.apkeditor_path,
                 "b",
                 "-i",
                 self.temp_path,
                 "-o",
-                self._built_apk_path,
+                self._rebuilt_apk_path,
             ]
         )
+        if not self.arguments.no_cleanup:
+            # Decoded tree is consumed, free scratch space before composing
+            shutil.rmtree(self.temp_path)
 
-    def zipalign(self):
-        Logger.info("Zipaligning APK...")
-        _ = run_command_and_check(
-            [
-                "zipalign",
-                "-p",
-                "4",
-                self._built_apk_path,
-                self._zipaligned_apk_path,
-            ]
-        )
-        self._built_apk_path.unlink()
+    def compose(self, library: Library, architectures: list[str] | None = None):
+        """Stream entries of original APK with rebuilt dex and patched manifest, append libraries and align"""
+        Logger.info("Injecting libraries and zipaligning APK...")
+        with ZipFile(self.loader.output_path) as source, ZipRewriter(self._zipaligned_apk_path, library_alignment=self.arguments.page_size) as built:
+            with ZipFile(self._rebuilt_apk_path) as stub:
+                if self.manifest is not None:
+                    built.write("AndroidManifest.xml", self.manifest)
+                else:
+                    built.copy(stub, stub.getinfo("AndroidManifest.xml"))
+                for stub_name, name in self.target_dexes.items():
+                    built.copy(stub, stub.getinfo(stub_name), name)
+            overrides = {*self.target_dexes.values(), "AndroidManifest.xml"}
 
-    def generate_debug_key(self, key_path: Path):
+            for info in source.infolist():
+                if info.filename in overrides or re.fullmatch(SIGNATURE_ENTRY_PATTERN, info.filename):
+                    continue
+                built.copy(source, info)
+            library.write(built, architectures)
+        self._rebuilt_apk_path.unlink()
+        if isinstance(self.loader, SplitAPKLoader):
+            self.loader.output_path.unlink(True)
+
+    def list_architectures(self) -> list[str]:
+        with ZipFile(self.loader.output_path) as zipfile:
+            apk_architectures = {name.split("/")[1] for name in zipfile.namelist() if name.startswith("lib/") and name.count("/") == 2}
+        return [k for k, v in ARCHITECTURES.items() if v in apk_architectures]
+
+    @staticmethod
+    def generate_debug_key(key_path: Path):
         Logger.debug("Generating key...")
+        if Signer.is_available():
+            Signer.generate_key(key_path)
+            return
         _ = run_command_and_check(
             [
                 "keytool",
@@ -100,10 +169,26 @@ class APK:
             ]
         )
 
-    def sign(self, key_path: Path):
-        Logger.info("Signing APK...")
-        # Move APK to track stage if any error
-        shutil.move(self._zipaligned_apk_path, self._signed_apk_path)
+    @staticmethod
+    def read_min_sdk_version(path: Path) -> int:
+        try:
+            return BinaryManifest.from_apk(path).min_sdk_version
+        except BINARY_MANIFEST_ERRORS as e:
+            Logger.debug(f"Failed to read binary manifest of {path.name} ({e})")
+            return 1
+
+    @staticmethod
+    def sign_file(path: Path, key_path: Path, min_sdk_version: int | None = None):
+        """Sign APK in place, using in-process v2/v3 signer if APK doesn't need v1 signature (minSdk is read from APK unless given)"""
+        signer = Signer.load(key_path)
+        if signer is not None:
+            if min_sdk_version is None:
+                min_sdk_version = APK.read_min_sdk_version(path)
+            if min_sdk_version >= V2_MIN_SDK:
+                Logger.debug(f"Signing {path.name} in process")
+                signer.sign(path)
+                return
+            Logger.debug(f"{path.name} requires v1 signature (minSdk {min_sdk_version}), using apksigner")
 
         apksigner_executable = "apksigner"
 
@@ -120,39 +205,54 @@ class APK:
                 "pass:android",
                 "--ks-key-alias",
                 "androiddebugkey",
-                self._signed_apk_path,
+                path,
             ]
         )
+
+    def sign(self, key_path: Path):
+        Logger.info("Signing APK...")
+        APK.sign_file(self._zipaligned_apk_path, key_path)
         shutil.move(
-            self._signed_apk_path,
+            self._zipaligned_apk_path,
             not_none(self.arguments.out),  # pyright: ignore[reportArgumentType]
         )  # XXX: assume that everything is ready
 
-    def get_entry_activity(self):
-        output = run_command_and_check(
-            [
-                "java",
-                "-jar",
-                self.apkeditor_path,
-                "info",
-                "-i",
-                self.loader.output_path,
-                "-activities",
-            ]
-        )
-        if isinstance(self.loader, SplitAPKLoader):
-            # Now we can safely remove merged APK
-            self.loader.output_path.unlink()
-        entrypoints = output.strip().replace("activity-main=", "").replace('"', "")
-        assert entrypoints is not None, "No entrypoint(s) found :("
+    def export(self, path: Path):
+        """Move composed (unsigned) APK to path, e.g. to sign it together with other splits"""
+        shutil.move(self._zipaligned_apk_path, path)
+
+    def get_entry_activities(self) -> list[str]:
+        try:
+            entrypoints = BinaryManifest.from_apk(self.loader.output_path).get_entry_activities()
+        except BINARY_MANIFEST_ERRORS as e:
+            Logger.warn(f"Failed to read binary manifest ({e}), falling back to APKEditor")
+            output = self.apkeditor.run(
+                [
+                    "info",
+                    "-i",
+                    self.loader.output_path,
+                    "-activities",
+                ]
+            )
+            entrypoints = [line.strip().replace("activity-main=", "").replace('"', "") for line in output.splitlines() if "activity-main=" in line]
+        assert len(entrypoints) > 0, "No entrypoint(s) found :("
+        Logger.debug(f"Entrypoint(s): {', '.join(entrypoints)}")
         return entrypoints
 
-    def __del__(self):
+    def cleanup(self):
         if not self.arguments.no_cleanup and self.temp_path.exists():
             shutil.rmtree(self.temp_path)
-        # GC everything if program died before GC in function
-        if isinstance(self.loader, SplitAPKLoader) and self.loader.merge_temp_path.exists():
-            shutil.rmtree(self.loader.merge_temp_path)
-        self._built_apk_path.unlink(True)
+        self.loader.cleanup()
+        self._stub_apk_path.unlink(True)
+        self._rebuilt_apk_path.unlink(True)
         self._zipaligned_apk_path.unlink(True)
-        self._signed_apk_path.unlink(True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cleanup()
+
+    def __del__(self):
+        # GC everything if program died before cleanup
+        self.cleanup()
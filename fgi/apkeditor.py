@@ -0,0 +1,111 @@
+import struct
+import subprocess
+import threading
+from pathlib import Path
+
+from fgi.apkeditor_worker import WORKER_CLASS, WORKER_SOURCE
+from fgi.cmd import run_command_and_check
+from fgi.logger import Logger
+from fgi.profiler import Profiler
+from fgi.utils.atomic import atomic_path
+
+_INT = struct.Struct(">i")
+
+
+class APKEditor:
+    """Runs APKEditor commands, either in one-shot JVM or in long-lived worker if warm"""
+
+    def __init__(self, path: Path, warm: bool = False):
+        self.path = path
+        self.warm = warm
+        self.worker: subprocess.Popen[bytes] | None = None
+        self.worker_failed = False
+        self.lock = threading.Lock()
+
+    @property
+    def _worker_source_path(self) -> Path:
+        return self.path.parent / f"{WORKER_CLASS}.java"
+
+    def _read(self, size: int) -> bytes:
+        assert self.worker is not None and self.worker.stdout is not None
+        return self.worker.stdout.read(size)
+
+    def _read_int(self) -> int:
+        data = self._read(_INT.size)
+        if len(data) != _INT.size:
+            raise EOFError("APKEditor worker exited")
+        return _INT.unpack(data)[0]
+
+    def _start_worker(self):
+        source = self._worker_source_path
+        if not source.exists() or source.read_text(encoding="utf8") != WORKER_SOURCE:
+            # Concurrent run may start java on it meanwhile, so it never sees partial file
+            with atomic_path(source) as path:
+                _ = path.write_text(WORKER_SOURCE, encoding="utf8")
+
+        Logger.debug("Starting APKEditor worker...")
+        # Source-file mode compiles worker in memory, so no separate javac step is needed
+        self.worker = subprocess.Popen(
+            ["java", "-cp", self.path, source],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+        if self._read_int() != 0:
+            raise EOFError("APKEditor worker doesn't support this APKEditor version")
+
+    def _run_in_worker(self, args: list[str | Path]) -> tuple[int, str]:
+        if self.worker is None:
+            self._start_worker()
+        assert self.worker is not None and self.worker.stdin is not None
+
+        Logger.debug(f"Running {args} in APKEditor worker")
+        request = _INT.pack(len(args))
+        for arg in args:
+            encoded = str(arg).encode()
+            request += _INT.pack(len(encoded)) + encoded
+        _ = self.worker.stdin.write(request)
+        self.worker.stdin.flush()
+
+        code = self._read_int()
+        output = self._read(self._read_int())
+        return code, output.decode()
+
+    def run(self, args: list[str | Path]) -> str:
+        with Profiler.stage(f"APKEditor {args[0]}"):
+            return self._run(args)
+
+    def _run(self, args: list[str | Path]) -> str:
+        if self.warm and not self.worker_failed:
+            with self.lock:
+                try:
+                    code, output = self._run_in_worker(args)
+                except (OSError, EOFError) as e:
+                    Logger.warn(f"APKEditor worker is unavailable ({e}), falling back to one-shot JVM")
+                    self.worker_failed = True
+                    self.close()
+                else:
+                    if code != 0:
+                        raise RuntimeError(f"APKEditor {args} returned non-zero exit status: {output}")
+                    return output
+        return run_command_and_check(["java", "-jar", self.path, *args])
+
+    def close(self):
+        if self.worker is None:
+            return
+        if self.worker.stdin is not None:
+            self.worker.stdin.close()
+        try:
+            _ = self.worker.wait(5)
+        except subprocess.TimeoutExpired:
+            self.worker.kill()
+        self.worker = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __del__(self):
+        self.close()
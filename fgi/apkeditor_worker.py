@@ -0,0 +1,71 @@
+# Runs APKEditor commands in a single JVM using Main.execute(String[]).
+# Protocol (big-endian, over stdin/stdout):
+#   worker -> fgi: int status (0 if ready)
+#   fgi -> worker: int argc, then argc * (int length, UTF-8 bytes)
+#   worker -> fgi: int exit code, int length, output bytes
+WORKER_CLASS = "ApkEditorWorker"
+
+WORKER_SOURCE = """
+import java.io.*;
+import java.lang.reflect.Method;
+import java.nio.charset.StandardCharsets;
+
+public class ApkEditorWorker {
+    public static void main(String[] args) throws Exception {
+        DataInputStream in = new DataInputStream(new BufferedInputStream(System.in));
+        DataOutputStream out = new DataOutputStream(new BufferedOutputStream(new FileOutputStream(FileDescriptor.out)));
+        // Anything printed outside of command must not break protocol
+        System.setOut(System.err);
+
+        Method execute;
+        try {
+            execute = Class.forName("com.reandroid.apkeditor.Main").getMethod("execute", String[].class);
+        } catch (ReflectiveOperationException e) {
+            out.writeInt(-1);
+            out.flush();
+            return;
+        }
+        out.writeInt(0);
+        out.flush();
+
+        while (true) {
+            int count;
+            try {
+                count = in.readInt();
+            } catch (EOFException e) {
+                return;
+            }
+            String[] command = new String[count];
+            for (int i = 0; i < count; i++) {
+                byte[] arg = new byte[in.readInt()];
+                in.readFully(arg);
+                command[i] = new String(arg, StandardCharsets.UTF_8);
+            }
+
+            ByteArrayOutputStream captured = new ByteArrayOutputStream();
+            PrintStream stream = new PrintStream(captured, true, "UTF-8");
+            PrintStream stdout = System.out;
+            PrintStream stderr = System.err;
+            System.setOut(stream);
+            System.setErr(stream);
+            int code;
+            try {
+                Object result = execute.invoke(null, (Object) command);
+                code = result instanceof Integer ? (Integer) result : 0;
+            } catch (Throwable e) {
+                (e.getCause() != null ? e.getCause() : e).printStackTrace(stream);
+                code = 1;
+            } finally {
+                System.setOut(stdout);
+                System.setErr(stderr);
+            }
+
+            byte[] output = captured.toByteArray();
+            out.writeInt(code);
+            out.writeInt(output.length);
+            out.write(output);
+            out.flush();
+        }
+    }
+}
+"""
@@ -0,0 +1,291 @@
+import struct
+import zlib
+from pathlib import Path
+from types import TracebackType
+from typing import BinaryIO
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile, ZipInfo
+
+from fgi.constants import CHUNK_SIZE
+from fgi.utils.atomic import atomic_path
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4H2LH")
+
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+_END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+
+# Same extra field as zipalign and apksigner use for padding: header id, size, alignment, zeros
+_ALIGNMENT_EXTRA = struct.Struct("<3H")
+_ALIGNMENT_EXTRA_ID = 0xD935
+
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+
+ALIGNMENT = 4
+LIBRARY_ALIGNMENT = 4096
+# Entries after first replaced one are kept in memory while archive is updated in place, otherwise it's rewritten
+MAX_MOVED_SIZE = 64 * 1024 * 1024
+
+
+def _dos_date_time(date_time: tuple[int, int, int, int, int, int]) -> tuple[int, int]:
+    year, month, day, hour, minute, second = date_time
+    return (year - 1980) << 9 | month << 5 | day, hour << 11 | minute << 5 | second // 2
+
+
+def _seek_data(source: ZipFile, info: ZipInfo) -> BinaryIO:
+    fp: BinaryIO = source.fp  # pyright: ignore[reportAssignmentType]
+    _ = fp.seek(info.header_offset)
+    header = _LOCAL_HEADER.unpack(fp.read(_LOCAL_HEADER.size))
+    assert header[0] == _LOCAL_HEADER_SIGNATURE, f"Bad local header for {info.filename}"
+    _ = fp.seek(header[9] + header[10], 1)  # skip name and extra
+    return fp
+
+
+def read_raw(source: ZipFile, info: ZipInfo) -> bytes:
+    """Raw (compressed) entry data"""
+    data = _seek_data(source, info).read(info.compress_size)
+    assert len(data) == info.compress_size, f"Unexpected end of data for {info.filename}"
+    return data
+
+
+class ZipRewriter:
+    """Writes ZIP archive, copying entries from other archives without recompression
+
+    Uncompressed entries are aligned while writing, same as "zipalign -p" does. If offset is given, existing archive is truncated
+    at it and written from there, entries before it are added with keep
+    """
+
+    def __init__(self, path: Path, alignment: int = ALIGNMENT, library_alignment: int = LIBRARY_ALIGNMENT, offset: int | None = None):
+        self.path = path
+        self.alignment = alignment
+        self.library_alignment = library_alignment
+        if offset is None:
+            self.file: BinaryIO = open(path, "wb")
+        else:
+            self.file = open(path, "r+b")
+            _ = self.file.truncate(offset)
+            _ = self.file.seek(offset)
+        self.central_directory: list[bytes] = []
+        self.names: set[str] = set()
+
+    def _alignment_extra(self, info: ZipInfo, name: str, offset: int) -> bytes:
+        if info.compress_type != ZIP_STORED:
+            return b""
+        alignment = self.library_alignment if name.endswith(".so") else self.alignment
+        data_offset = offset + _LOCAL_HEADER.size + len(name.encode())
+        padding = -(data_offset + _ALIGNMENT_EXTRA.size) % alignment
+        return _ALIGNMENT_EXTRA.pack(_ALIGNMENT_EXTRA_ID, 2 + padding, alignment) + b"\x00" * padding
+
+    def _local_header(self, info: ZipInfo, name: str, offset: int) -> bytes:
+        if info.compress_size > _MAX_32 or info.file_size > _MAX_32:
+            raise RuntimeError("Zip64 archives are not supported")
+        encoded_name = name.encode()
+        extra = self._alignment_extra(info, name, offset)
+        date, time = _dos_date_time(info.date_time)
+        return (
+            _LOCAL_HEADER.pack(
+                _LOCAL_HEADER_SIGNATURE,
+                info.extract_version,
+                self._flags(info, name),
+                info.compress_type,
+                time,
+                date,
+                info.CRC,
+                info.compress_size,
+                info.file_size,
+                len(encoded_name),
+                len(extra),
+            )
+            + encoded_name
+            + extra
+        )
+
+    def _flags(self, info: ZipInfo, name: str) -> int:
+        return (info.flag_bits & ~_FLAG_DATA_DESCRIPTOR) | (_FLAG_UTF8 if not name.isascii() else 0)
+
+    def _start_entry(self, name: str) -> int:
+        if name in self.names:
+            raise RuntimeError(f"{name} already exists in APK")
+        self.names.add(name)
+        offset = self.file.tell()
+        if offset > _MAX_32:
+            raise RuntimeError("Zip64 archives are not supported")
+        return offset
+
+    def _finish_entry(self, info: ZipInfo, name: str, offset: int):
+        encoded_name = name.encode()
+        date, time = _dos_date_time(info.date_time)
+        self.central_directory.append(
+            _CENTRAL_HEADER.pack(
+                _CENTRAL_HEADER_SIGNATURE,
+                info.create_version | info.create_system << 8,
+                info.extract_version,
+                self._flags(info, name),
+                info.compress_type,
+                time,
+                date,
+                info.CRC,
+                info.compress_size,
+                info.file_size,
+                len(encoded_name),
+                0,
+                0,
+                0,
+                info.internal_attr,
+                info.external_attr,
+                offset,
+            )
+            + encoded_name
+        )
+
+    def keep(self, info: ZipInfo):
+        """Add entry which is already written before offset"""
+        self.names.add(info.filename)
+        self._finish_entry(info, info.filename, info.header_offset)
+
+    def copy(self, source: ZipFile, info: ZipInfo, name: str | None = None):
+        """Copy raw (compressed) entry data from source archive"""
+        fp = _seek_data(source, info)
+
+        name = name or info.filename
+        offset = self._start_entry(name)
+        _ = self.file.write(self._local_header(info, name, offset))
+        remaining = info.compress_size
+        while remaining > 0:
+            chunk = fp.read(min(CHUNK_SIZE, remaining))
+            assert chunk, f"Unexpected end of data for {info.filename}"
+            _ = self.file.write(chunk)
+            remaining -= len(chunk)
+        self._finish_entry(info, name, offset)
+
+    def copy_all(self, source: ZipFile, exclude: set[str] | None = None):
+        for info in source.infolist():
+            if exclude is None or info.filename not in exclude:
+                self.copy(source, info)
+
+    def _new_info(self, name: str, compress: bool) -> ZipInfo:
+        info = ZipInfo(name)
+        info.external_attr = 0o644 << 16
+        info.compress_type = ZIP_DEFLATED if compress else ZIP_STORED
+        info.CRC = 0
+        return info
+
+    def write(self, name: str, data: bytes, compress: bool = True):
+        info = self._new_info(name, compress)
+        info.file_size = len(data)
+        info.CRC = zlib.crc32(data)
+        if compress:
+            compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+            data = compressor.compress(data) + compressor.flush()
+        info.compress_size = len(data)
+        self.write_raw(info, data)
+
+    def write_raw(self, info: ZipInfo, data: bytes):
+        """Write entry with already compressed data"""
+        offset = self._start_entry(info.filename)
+        _ = self.file.write(self._local_header(info, info.filename, offset))
+        _ = self.file.write(data)
+        self._finish_entry(info, info.filename, offset)
+
+    def write_file(self, name: str, path: Path, compress: bool = True):
+        info = self._new_info(name, compress)
+        offset = self._start_entry(name)
+        # Sizes and CRC are unknown yet, header will be rewritten when data is written
+        _ = self.file.write(self._local_header(info, name, offset))
+
+        data_offset = self.file.tell()
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                info.CRC = zlib.crc32(chunk, info.CRC)
+                info.file_size += len(chunk)
+                _ = self.file.write(compressor.compress(chunk) if compress else chunk)
+        if compress:
+            _ = self.file.write(compressor.flush())
+        end = self.file.tell()
+        info.compress_size = end - data_offset
+
+        _ = self.file.seek(offset)
+        _ = self.file.write(self._local_header(info, name, offset))
+        _ = self.file.seek(end)
+        self._finish_entry(info, name, offset)
+
+    def close(self):
+        if self.file.closed:
+            return
+        if len(self.central_directory) > _MAX_16:
+            raise RuntimeError("Zip64 archives are not supported")
+        offset = self.file.tell()
+        for record in self.central_directory:
+            _ = self.file.write(record)
+        size = self.file.tell() - offset
+        _ = self.file.write(
+            _END_OF_CENTRAL_DIRECTORY.pack(
+                _END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+                0,
+                0,
+                len(self.central_directory),
+                len(self.central_directory),
+                size,
+                offset,
+                0,
+            )
+        )
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ):
+        self.close()
+
+
+def replace_entries(path: Path, entries: dict[str, bytes], compress: bool, library_alignment: int = LIBRARY_ALIGNMENT) -> bool:
+    """Replace (or add) entries of archive, returns whether it's updated in place
+
+    Archive is truncated before first replaced entry, so only entries after it are moved (and re-aligned), signing block is dropped.
+    If too much data would be moved, archive is rewritten instead
+    """
+    with ZipFile(path) as source:
+        infos = sorted(source.infolist(), key=lambda x: x.header_offset)
+        replaced = [info for info in infos if info.filename in entries]
+        # Local headers of kept entries aren't rewritten, so their flags must match central directory written from scratch
+        in_place = not any(info.flag_bits & _FLAG_DATA_DESCRIPTOR for info in infos)
+        if replaced:
+            offset = replaced[0].header_offset
+        elif infos and in_place:
+            offset = _seek_data(source, infos[-1]).tell() + infos[-1].compress_size
+        else:
+            offset = 0
+        moved = [info for info in infos if info.header_offset >= offset and info.filename not in entries]
+        in_place = in_place and sum(info.compress_size for info in moved) <= MAX_MOVED_SIZE
+        moved_data = [(info, read_raw(source, info)) for info in moved] if in_place else []
+
+    if not in_place:
+        with atomic_path(path) as temp_path:
+            with ZipFile(path) as source, ZipRewriter(temp_path, library_alignment=library_alignment) as writer:
+                for info in source.infolist():
+                    if info.filename not in entries:
+                        writer.copy(source, info)
+                for name, data in entries.items():
+                    writer.write(name, data, compress)
+        return False
+
+    with ZipRewriter(path, library_alignment=library_alignment, offset=offset) as writer:
+        for info in infos:
+            if info.header_offset < offset:
+                writer.keep(info)
+        for info, data in moved_data:
+            writer.write_raw(info, data)
+        for name, data in entries.items():
+            writer.write(name, data, compress)
+    return True
@@ -1,4 +1,5 @@
 import argparse
+import dataclasses
 import json
 import tempfile
 from dataclasses import dataclass
@@ -6,10 +7,16 @@ from pathlib import Path
 from typing import Any
 from zipfile import ZipFile
 
-from fgi.constants import ARCHITECTURES
+from fgi.archive import LIBRARY_ALIGNMENT
+from fgi.constants import ARCHITECTURES, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_TIMEOUT, UPDATE_CHECK_DEADLINE, UPDATE_CHECK_TTL
 from fgi.loaders.apk import APKLoader
 from fgi.loaders.base import BaseLoader
 from fgi.loaders.split import SplitAPKLoader
+from fgi.loaders.split_native import SplitNativeLoader
+
+# Options which affect deps and APKEditor, so they're shared by batch or session and can't be overridden per input
+SHARED_FIELDS = {"offline_mode", "verbose", "warm_jvm", "download_timeout", "download_chunk_size", "update_ttl", "update_deadline"}
+PATH_FIELDS = {"input", "out", "config_path", "script_path", "temp_root_path", "profile"}
 
 
 @dataclass
@@ -26,13 +33,37 @@ class Arguments:
     no_cleanup: bool
     frida_version: str
     offline_mode: bool
+    targeted_decode: bool
+    split_native: bool
+    stored_libs: bool
+    page_size: int
+    warm_jvm: bool
+    no_result_cache: bool
+    tree_cache: bool
+    download_timeout: float
+    download_chunk_size: int
+    update_ttl: float
+    update_deadline: float
     verbose: bool
+    profile: Path | None = None
 
     @staticmethod
-    def create():
+    def create(argv: list[str] | None = None):
         parser = argparse.ArgumentParser()
         _ = parser.add_argument("-i", "--input", type=Path, required=True, help="Target APK file")
         _ = parser.add_argument("-o", "--out", type=Path, help="Output APK file")
+        _ = parser.add_argument(
+            "--profile",
+            type=Path,
+            metavar="REPORT",
+            help="Record wall and CPU time, peak RSS and I/O of every stage and subprocess, write them as JSON to REPORT and log as table",
+        )
+        Arguments.add_options(parser)
+        return Arguments.from_namespace(parser.parse_args(argv))
+
+    @staticmethod
+    def add_options(parser: argparse.ArgumentParser):
+        """Add options shared between single and batch modes"""
         _ = parser.add_argument(
             "-a",
             "--architectures",
@@ -72,8 +103,8 @@ class Arguments:
             "-r",
             "--temp-root-path",
             type=Path,
-            default=tempfile.gettempdir(),
-            help="Root path where temporary directory will be created",
+            default=Arguments.get_default_temp_root_path(),
+            help="Root path where temporary directory will be created. If default one doesn't have enough space, output directory or current one is used",
         )
 
         _ = parser.add_argument(
@@ -83,6 +114,67 @@ class Arguments:
         )
         _ = parser.add_argument("--frida-version", type=str, help="Specific frida version (e.g 16.7.19)")
         _ = parser.add_argument("--offline-mode", action="store_true", help="Disable updates check for deps")
+        _ = parser.add_argument(
+            "--targeted-decode",
+            action="store_true",
+            help="Decode and rebuild only dex containing entry activity, other entries are copied as is",
+        )
+        _ = parser.add_argument(
+            "--split-native",
+            action="store_true",
+            help="Patch base and ABI config splits in place instead of merging split APKs, out is directory of split APKs for adb install-multiple",
+        )
+        _ = parser.add_argument(
+            "--stored-libs",
+            action="store_true",
+            help="Keep extractNativeLibs as is and store injected libraries uncompressed and page-aligned, so they're loaded from APK without extraction",
+        )
+        _ = parser.add_argument(
+            "--page-size",
+            type=int,
+            choices=[4, 16],
+            default=LIBRARY_ALIGNMENT // 1024,
+            help="Alignment of uncompressed native libraries, in KiB (16 for devices with 16 KiB pages)",
+        )
+        _ = parser.add_argument(
+            "--warm-jvm",
+            action="store_true",
+            help="Run all APKEditor commands in single long-lived JVM, falls back to one-shot JVM if unavailable",
+        )
+        _ = parser.add_argument(
+            "--no-result-cache",
+            action="store_true",
+            help="Always patch APK instead of reusing previous result for same input and options",
+        )
+        _ = parser.add_argument(
+            "--tree-cache",
+            action="store_true",
+            help="Reuse decoded tree of same input and APKEditor version, e.g. when re-patching it with other options",
+        )
+        _ = parser.add_argument(
+            "--download-timeout",
+            type=float,
+            default=DOWNLOAD_TIMEOUT,
+            help="Connect and read timeout for deps downloads, in seconds",
+        )
+        _ = parser.add_argument(
+            "--download-chunk-size",
+            type=int,
+            default=DOWNLOAD_CHUNK_SIZE // 1024,
+            help="Chunk size for deps downloads, in KiB",
+        )
+        _ = parser.add_argument(
+            "--update-ttl",
+            type=float,
+            default=UPDATE_CHECK_TTL,
+            help="Skip update check for deps if previous one was done less than this many seconds ago",
+        )
+        _ = parser.add_argument(
+            "--update-deadline",
+            type=float,
+            default=UPDATE_CHECK_DEADLINE,
+            help="Use cached deps if update check doesn't finish in this many seconds",
+        )
         _ = parser.add_argument(
             "-v",
             "--verbose",
@@ -90,10 +182,11 @@ class Arguments:
             help="Verbose logging (useful for debugging)",
         )
 
-        args = parser.parse_args()
+    @staticmethod
+    def from_namespace(args: argparse.Namespace):
         return Arguments(
-            args.input,  # pyright: ignore[reportAny]
-            args.out,  # pyright: ignore[reportAny]
+            getattr(args, "input", None),  # pyright: ignore[reportAny]
+            getattr(args, "out", None),  # pyright: ignore[reportAny]
             args.architectures,  # pyright: ignore[reportAny]
             args.config_type,  # pyright: ignore[reportAny]
             args.config_path,  # pyright: ignore[reportAny]
@@ -104,19 +197,52 @@ class Arguments:
             args.no_cleanup,  # pyright: ignore[reportAny]
             args.frida_version,  # pyright: ignore[reportAny]
             args.offline_mode,  # pyright: ignore[reportAny]
+            args.targeted_decode,  # pyright: ignore[reportAny]
+            args.split_native,  # pyright: ignore[reportAny]
+            args.stored_libs,  # pyright: ignore[reportAny]
+            args.page_size * 1024,  # pyright: ignore[reportAny]
+            args.warm_jvm,  # pyright: ignore[reportAny]
+            args.no_result_cache,  # pyright: ignore[reportAny]
+            args.tree_cache,  # pyright: ignore[reportAny]
+            args.download_timeout,  # pyright: ignore[reportAny]
+            args.download_chunk_size * 1024,  # pyright: ignore[reportAny]
+            args.update_ttl,  # pyright: ignore[reportAny]
+            args.update_deadline,  # pyright: ignore[reportAny]
             args.verbose,  # pyright: ignore[reportAny]
+            getattr(args, "profile", None),  # pyright: ignore[reportAny]
         )
 
+    @staticmethod
+    def create_default():
+        """Defaults of all options, input is not set"""
+        parser = argparse.ArgumentParser()
+        Arguments.add_options(parser)
+        return Arguments.from_namespace(parser.parse_args([]))
+
+    def override(self, options: dict[str, Any]):
+        """Copy with given per-input options (field names), shared options can't be overridden"""
+        field_names = {field.name for field in dataclasses.fields(Arguments)}
+        for key in options:
+            assert key in field_names, f'Unknown option "{key}"'
+            assert key not in SHARED_FIELDS, f'Option "{key}" is shared and can\'t be overridden per input'
+        overrides: dict[str, Any] = {"architectures": list(self.architectures)}
+        overrides.update({k: Path(v) if k in PATH_FIELDS and v is not None else v for k, v in options.items()})
+        return dataclasses.replace(self, **overrides)
+
     def validate(self):
         if not self.is_split_apk():  # XXX: Assume that split APKs always exists
             assert self.input.exists(), "Input APK doesn't exist"
         if self.out is None:
-            if ".apk" not in self.input.name:
-                self.out = Path.cwd() / (self.input.absolute().name + ".patched.apk")
-            else:
-                self.out = Path.cwd() / self.input.name.replace(".apk", ".patched.apk")
+            self.out = self.get_default_out(Path.cwd())
         assert not self.out.exists(), 'Out path is exist, delete, rename or specify manually via "-o"'
-        assert self.out.name.endswith(".apk"), "Out filename must endswith .apk"
+        if self.split_native:
+            assert self.is_split_apk(), "Split native mode requires split APKs directory as input"
+        else:
+            assert self.out.name.endswith(".apk"), "Out filename must endswith .apk"
+        # Per-input overrides (batch manifest, server jobs) bypass argparse choices
+        assert isinstance(self.architectures, list), "Architectures must be list"  # pyright: ignore[reportUnnecessaryIsInstance]
+        for arch in self.architectures:
+            assert arch in ARCHITECTURES, f'Unknown architecture "{arch}", choose from {", ".join(ARCHITECTURES)}'
         assert self.is_builtin_config() or (self.config_path and not self.config_type), 'Specify "config-type" or "config-path"'
         if self.is_script_required():
             assert self.script_path, 'Script is required when "config-type" equals "script" or config provided via "config-path" have "type": "script"'
@@ -124,6 +250,19 @@ class Arguments:
         assert self.library_name.startswith("lib") and self.library_name.endswith(".so"), "Invalid name for frida library"
         assert self.script_name.startswith("lib") and self.script_name.endswith(".so"), "Invalid name for frida script"
         assert self.temp_root_path.exists(), "Root temp path doesn't exist"
+        assert self.download_timeout > 0 and self.download_chunk_size > 0, "Download timeout and chunk size must be positive"
+
+    @staticmethod
+    def get_default_temp_root_path() -> str:
+        return tempfile.gettempdir()
+
+    def get_default_out(self, directory: Path) -> Path:
+        name = self.input.absolute().name
+        if self.split_native:
+            return directory / (name + ".patched")
+        if ".apk" not in name:
+            return directory / (name + ".patched.apk")
+        return directory / name.replace(".apk", ".patched.apk")
 
     def is_builtin_config(self) -> bool:
         return self.config_path is None and self.config_type is not None
@@ -154,6 +293,8 @@ class Arguments:
             return self.is_xapk() and any(filter(lambda x: x.filename.startswith("Android"), zipfile.filelist))  # pyright: ignore[reportUnknownMemberType, reportUnknownLambdaType, reportAttributeAccessIssue]
 
     def pick_loader(self) -> type[BaseLoader]:
+        if self.is_split_apk() and self.split_native:
+            return SplitNativeLoader
         if self.is_split_apk():
             return SplitAPKLoader
         if self.is_xapk():
@@ -0,0 +1,522 @@
+import struct
+from pathlib import Path
+from zipfile import ZipFile
+
+from fgi.constants import ARCHITECTURES
+
+RES_STRING_POOL_TYPE = 0x0001
+RES_XML_TYPE = 0x0003
+RES_XML_START_NAMESPACE_TYPE = 0x0100
+RES_XML_END_NAMESPACE_TYPE = 0x0101
+RES_XML_START_ELEMENT_TYPE = 0x0102
+RES_XML_END_ELEMENT_TYPE = 0x0103
+RES_XML_CDATA_TYPE = 0x0104
+RES_XML_RESOURCE_MAP_TYPE = 0x0180
+
+TYPE_REFERENCE = 0x01
+TYPE_STRING = 0x03
+TYPE_INT_DEC = 0x10
+TYPE_INT_HEX = 0x11
+TYPE_INT_BOOLEAN = 0x12
+
+UTF8_FLAG = 1 << 8
+
+ANDROID_NAMESPACE = "http://schemas.android.com/apk/res/android"
+
+# Attribute names can be stripped or obfuscated, but resource ids can't
+ANDROID_ATTRIBUTE_IDS = {
+    0x01010001: "label",
+    0x01010003: "name",
+    0x0101000E: "enabled",
+    0x0101000F: "debuggable",
+    0x01010010: "exported",
+    0x01010202: "targetActivity",
+    0x01010024: "value",
+    0x0101020C: "minSdkVersion",
+    0x010104EA: "extractNativeLibs",
+    0x010104EC: "usesCleartextTraffic",
+}
+ANDROID_ATTRIBUTE_RESOURCE_IDS = {v: k for k, v in ANDROID_ATTRIBUTE_IDS.items()}
+
+# Raised by BinaryManifest on malformed or missing manifest
+BINARY_MANIFEST_ERRORS = (AssertionError, struct.error, IndexError, KeyError)
+
+_CHUNK_HEADER = struct.Struct("<HHI")
+_STRING_POOL_HEADER = struct.Struct("<5I")
+_NODE_HEADER = struct.Struct("<II")
+_START_ELEMENT = struct.Struct("<II6H")
+_ATTRIBUTE = struct.Struct("<3IHBBI")
+_NO_ENTRY = 0xFFFFFFFF
+
+
+class AXMLAttribute:
+    def __init__(self, namespace: str | None, name: str, raw_value: str | None, data_type: int, data: int):
+        self.namespace = namespace
+        self.name = name
+        self.raw_value = raw_value
+        self.data_type = data_type
+        self.data = data
+
+    @property
+    def value(self) -> str | int | bool | None:
+        if self.data_type == TYPE_STRING:
+            return self.raw_value
+        if self.data_type == TYPE_INT_BOOLEAN:
+            return self.data != 0
+        if self.data_type in (TYPE_INT_DEC, TYPE_INT_HEX):
+            return self.data
+        if self.data_type == TYPE_REFERENCE:
+            return f"@0x{self.data:08x}"
+        return self.raw_value
+
+
+class AXMLElement:
+    def __init__(self, name: str, attributes: list[AXMLAttribute]):
+        self.name = name
+        self.attributes = attributes
+        self.children: list[AXMLElement] = []
+
+    def get(self, name: str, namespace: str | None = ANDROID_NAMESPACE) -> str | int | bool | None:
+        for attribute in self.attributes:
+            if attribute.name == name and attribute.namespace == namespace:
+                return attribute.value
+        return None
+
+    def iter(self, name: str):
+        for child in self.children:
+            if child.name == name:
+                yield child
+            yield from child.iter(name)
+
+
+class AXML:
+    """Android binary XML reader"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.strings: list[str] = []
+        self.resource_ids: list[int] = []
+        self.root: AXMLElement | None = None
+        self._parse()
+
+    def _parse(self):
+        chunk_type, header_size, size = _CHUNK_HEADER.unpack_from(self.data, 0)
+        assert chunk_type == RES_XML_TYPE, "Not a binary XML"
+
+        stack: list[AXMLElement] = []
+        offset = header_size
+        while offset < min(size, len(self.data)):
+            chunk_type, header_size, chunk_size = _CHUNK_HEADER.unpack_from(self.data, offset)
+            assert chunk_size > 0, "Malformed binary XML chunk"
+            if chunk_type == RES_STRING_POOL_TYPE:
+                self.strings = self._parse_string_pool(offset)
+            elif chunk_type == RES_XML_RESOURCE_MAP_TYPE:
+                count = (chunk_size - header_size) // 4
+                self.resource_ids = list(struct.unpack_from(f"<{count}I", self.data, offset + header_size))
+            elif chunk_type == RES_XML_START_ELEMENT_TYPE:
+                element = self._parse_element(offset + header_size)
+                if stack:
+                    stack[-1].children.append(element)
+                elif self.root is None:
+                    self.root = element
+                stack.append(element)
+            elif chunk_type == RES_XML_END_ELEMENT_TYPE:
+                _ = stack.pop()
+            offset += chunk_size
+        assert self.root is not None, "Binary XML has no root element"
+
+    def _parse_string_pool(self, offset: int) -> list[str]:
+        string_count, _, flags, strings_start, _ = _STRING_POOL_HEADER.unpack_from(self.data, offset + _CHUNK_HEADER.size)
+        offsets = struct.unpack_from(f"<{string_count}I", self.data, offset + _CHUNK_HEADER.size + _STRING_POOL_HEADER.size)
+        base = offset + strings_start
+        return [self._read_string(base + string_offset, flags & UTF8_FLAG != 0) for string_offset in offsets]
+
+    def _read_length(self, offset: int, utf8: bool) -> tuple[int, int]:
+        if utf8:
+            length = self.data[offset]
+            if length & 0x80:
+                return (length & 0x7F) << 8 | self.data[offset + 1], offset + 2
+            return length, offset + 1
+        (length,) = struct.unpack_from("<H", self.data, offset)
+        if length & 0x8000:
+            (low,) = struct.unpack_from("<H", self.data, offset + 2)
+            return (length & 0x7FFF) << 16 | low, offset + 4
+        return length, offset + 2
+
+    def _read_string(self, offset: int, utf8: bool) -> str:
+        if utf8:
+            _, offset = self._read_length(offset, True)  # length in UTF-16 units
+            length, offset = self._read_length(offset, True)
+            return self.data[offset : offset + length].decode("utf8", errors="replace")
+        length, offset = self._read_length(offset, False)
+        return self.data[offset : offset + length * 2].decode("utf-16-le", errors="replace")
+
+    def get_string(self, idx: int) -> str | None:
+        return self.strings[idx] if 0 <= idx < len(self.strings) else None
+
+    def _get_attribute_name(self, idx: int) -> str:
+        if idx < len(self.resource_ids) and self.resource_ids[idx] in ANDROID_ATTRIBUTE_IDS:
+            return ANDROID_ATTRIBUTE_IDS[self.resource_ids[idx]]
+        return self.get_string(idx) or ""
+
+    def _parse_element(self, offset: int) -> AXMLElement:
+        _, name, attribute_start, attribute_size, attribute_count, _, _, _ = _START_ELEMENT.unpack_from(self.data, offset)
+        attributes: list[AXMLAttribute] = []
+        for i in range(attribute_count):
+            namespace, attribute_name, raw_value, _, _, data_type, data = _ATTRIBUTE.unpack_from(self.data, offset + attribute_start + i * attribute_size)
+            attributes.append(
+                AXMLAttribute(
+                    self.get_string(namespace),
+                    self._get_attribute_name(attribute_name),
+                    self.get_string(raw_value),
+                    data_type,
+                    data,
+                )
+            )
+        return AXMLElement(self.get_string(name) or "", attributes)
+
+
+class AXMLWriter:
+    """Android binary XML writer, edits attributes and elements of compiled XML without decoding and encoding it"""
+
+    def __init__(self, data: bytes):
+        chunk_type, header_size, size = _CHUNK_HEADER.unpack_from(data, 0)
+        assert chunk_type == RES_XML_TYPE, "Not a binary XML"
+        reader = AXML(data)
+        self.strings = reader.strings
+        self.resource_ids = reader.resource_ids
+        self.chunks: list[bytearray] = []
+        self.pool: tuple[int, int, list[int], bytes] | None = None  # flags, style count, offsets, string data
+        self.pool_modified = False
+
+        offset = header_size
+        while offset < min(size, len(data)):
+            chunk_type, header_size, chunk_size = _CHUNK_HEADER.unpack_from(data, offset)
+            if chunk_type == RES_STRING_POOL_TYPE:
+                string_count, style_count, flags, strings_start, styles_start = _STRING_POOL_HEADER.unpack_from(data, offset + _CHUNK_HEADER.size)
+                offsets = list(struct.unpack_from(f"<{string_count}I", data, offset + header_size))
+                end = offset + (styles_start if style_count else chunk_size)
+                self.pool = (flags, style_count, offsets, data[offset + strings_start : end])
+            self.chunks.append(bytearray(data[offset : offset + chunk_size]))
+            offset += chunk_size
+        assert self.pool is not None, "Binary XML has no string pool"
+
+    @staticmethod
+    def _type(chunk: bytearray) -> int:
+        return _CHUNK_HEADER.unpack_from(chunk, 0)[0]
+
+    @staticmethod
+    def _header_size(chunk: bytearray) -> int:
+        return _CHUNK_HEADER.unpack_from(chunk, 0)[1]
+
+    def _string_refs(self, chunk: bytearray) -> list[int]:
+        """Offsets of string pool references in node chunk"""
+        chunk_type = self._type(chunk)
+        if chunk_type not in (
+            RES_XML_START_NAMESPACE_TYPE,
+            RES_XML_END_NAMESPACE_TYPE,
+            RES_XML_START_ELEMENT_TYPE,
+            RES_XML_END_ELEMENT_TYPE,
+            RES_XML_CDATA_TYPE,
+        ):
+            return []
+        ext = self._header_size(chunk)
+        refs = [_CHUNK_HEADER.size + 4]  # comment
+        if chunk_type == RES_XML_CDATA_TYPE:
+            refs.append(ext)
+            if chunk[ext + 7] == TYPE_STRING:
+                refs.append(ext + 8)
+            return refs
+        refs += [ext, ext + 4]
+        if chunk_type == RES_XML_START_ELEMENT_TYPE:
+            _, _, attribute_start, attribute_size, attribute_count, _, _, _ = _START_ELEMENT.unpack_from(chunk, ext)
+            for i in range(attribute_count):
+                attribute = ext + attribute_start + i * attribute_size
+                refs += [attribute, attribute + 4, attribute + 8]
+                if chunk[attribute + 15] == TYPE_STRING:
+                    refs.append(attribute + 16)
+        return refs
+
+    def _encode_string(self, value: str, utf8: bool) -> bytes:
+        def encode_length(length: int, utf8: bool) -> bytes:
+            if utf8:
+                return bytes([length]) if length < 0x80 else bytes([0x80 | length >> 8, length & 0xFF])
+            return struct.pack("<H", length) if length < 0x8000 else struct.pack("<HH", 0x8000 | length >> 16, length & 0xFFFF)
+
+        if utf8:
+            encoded = value.encode("utf8")
+            return encode_length(len(value.encode("utf-16-le")) // 2, True) + encode_length(len(encoded), True) + encoded + b"\x00"
+        encoded = value.encode("utf-16-le")
+        return encode_length(len(encoded) // 2, False) + encoded + b"\x00\x00"
+
+    def _insert_string(self, idx: int, value: str) -> int:
+        assert self.pool is not None
+        flags, style_count, offsets, data = self.pool
+        if style_count > 0:
+            raise RuntimeError("Binary XML with styled strings isn't supported")
+        offsets.insert(idx, len(data))
+        self.pool = (flags, style_count, offsets, data + self._encode_string(value, flags & UTF8_FLAG != 0))
+        self.strings.insert(idx, value)
+        if idx < len(self.strings) - 1:
+            for chunk in self.chunks:
+                for ref in self._string_refs(chunk):
+                    (value_idx,) = struct.unpack_from("<I", chunk, ref)
+                    if value_idx != _NO_ENTRY and value_idx >= idx:
+                        struct.pack_into("<I", chunk, ref, value_idx + 1)
+        self.pool_modified = True
+        return idx
+
+    def _string(self, value: str) -> int:
+        """Index of string, added to pool if missing"""
+        for i in range(len(self.resource_ids), len(self.strings)):
+            if self.strings[i] == value:
+                return i
+        return self._insert_string(len(self.strings), value)
+
+    def _attribute_name(self, name: str, resource_id: int | None) -> int:
+        """Index of attribute name, names with resource id are kept at start of pool in sync with resource map"""
+        if resource_id is None:
+            return self._string(name)
+        if resource_id in self.resource_ids:
+            return self.resource_ids.index(resource_id)
+        idx = self._insert_string(len(self.resource_ids), name)
+        self.resource_ids.append(resource_id)
+        return idx
+
+    def _find_elements(self, name: str) -> list[int]:
+        indexes: list[int] = []
+        for i, chunk in enumerate(self.chunks):
+            if self._type(chunk) == RES_XML_START_ELEMENT_TYPE:
+                (name_idx,) = struct.unpack_from("<I", chunk, self._header_size(chunk) + 4)
+                if name_idx < len(self.strings) and self.strings[name_idx] == name:
+                    indexes.append(i)
+        return indexes
+
+    def _find_element(self, name: str) -> int:
+        indexes = self._find_elements(name)
+        assert indexes, f"No <{name}> element in binary XML"
+        return indexes[0]
+
+    def _attributes(self, chunk: bytearray) -> list[tuple[int, int, int]]:
+        """Offset, namespace and name index of every attribute in start element chunk"""
+        ext = self._header_size(chunk)
+        _, _, attribute_start, attribute_size, attribute_count, _, _, _ = _START_ELEMENT.unpack_from(chunk, ext)
+        attributes: list[tuple[int, int, int]] = []
+        for i in range(attribute_count):
+            offset = ext + attribute_start + i * attribute_size
+            namespace, name, _ = struct.unpack_from("<3I", chunk, offset)
+            attributes.append((offset, namespace, name))
+        return attributes
+
+    def _get_resource_id(self, name_idx: int) -> int | None:
+        return self.resource_ids[name_idx] if name_idx < len(self.resource_ids) else None
+
+    def _find_attribute(self, chunk: bytearray, name: str, namespace: str | None, resource_id: int | None) -> int | None:
+        for offset, namespace_idx, name_idx in self._attributes(chunk):
+            if resource_id is not None and self._get_resource_id(name_idx) == resource_id:
+                return offset
+            attribute_namespace = self.strings[namespace_idx] if namespace_idx != _NO_ENTRY else None
+            if resource_id is None and attribute_namespace == namespace and name_idx < len(self.strings) and self.strings[name_idx] == name:
+                return offset
+        return None
+
+    def _encode_value(self, value: bool | int | str) -> tuple[int, int, int]:
+        """Raw value index, type and data of typed value"""
+        if isinstance(value, bool):
+            return _NO_ENTRY, TYPE_INT_BOOLEAN, _NO_ENTRY if value else 0
+        if isinstance(value, int):
+            return _NO_ENTRY, TYPE_INT_DEC, value & _NO_ENTRY
+        idx = self._string(value)
+        return idx, TYPE_STRING, idx
+
+    def _set_attribute(self, element_idx: int, name: str, value: bool | int | str, namespace: str | None, resource_id: int | None):
+        # Strings must be added before offsets are taken, as it may remap indexes
+        name_idx = self._attribute_name(name, resource_id)
+        namespace_idx = self._string(namespace) if namespace is not None else _NO_ENTRY
+        raw_value, data_type, data = self._encode_value(value)
+
+        chunk = self.chunks[element_idx]
+        offset = self._find_attribute(chunk, name, namespace, resource_id)
+        if offset is not None:
+            _ATTRIBUTE.pack_into(chunk, offset, namespace_idx, name_idx, raw_value, _ATTRIBUTE.size - 12, 0, data_type, data)
+            return
+
+        # Attributes are sorted by resource id, ones without it go last
+        ext = self._header_size(chunk)
+        attributes = self._attributes(chunk)
+        position = len(attributes)
+        if resource_id is not None:
+            position = next((i for i, (_, _, idx) in enumerate(attributes) if (self._get_resource_id(idx) or _NO_ENTRY) > resource_id), position)
+        namespace_ref, element_name, attribute_start, attribute_size, attribute_count, id_index, class_index, style_index = _START_ELEMENT.unpack_from(
+            chunk, ext
+        )
+        assert attribute_size == _ATTRIBUTE.size, "Unsupported attribute size"
+        offset = ext + attribute_start + position * attribute_size
+        chunk[offset:offset] = _ATTRIBUTE.pack(namespace_idx, name_idx, raw_value, _ATTRIBUTE.size - 12, 0, data_type, data)
+        # Special attribute indexes are 1-based, 0 means none
+        id_index, class_index, style_index = (i + 1 if i > position else i for i in (id_index, class_index, style_index))
+        _START_ELEMENT.pack_into(
+            chunk, ext, namespace_ref, element_name, attribute_start, attribute_size, attribute_count + 1, id_index, class_index, style_index
+        )
+        struct.pack_into("<I", chunk, 4, len(chunk))
+
+    def get_attribute(self, element: str, name: str, namespace: str | None = ANDROID_NAMESPACE) -> str | int | bool | None:
+        """Value of attribute of first element with given name"""
+        chunk = self.chunks[self._find_element(element)]
+        offset = self._find_attribute(chunk, name, namespace, ANDROID_ATTRIBUTE_RESOURCE_IDS.get(name) if namespace == ANDROID_NAMESPACE else None)
+        if offset is None:
+            return None
+        _, _, raw_value, _, _, data_type, data = _ATTRIBUTE.unpack_from(chunk, offset)
+        return AXMLAttribute(namespace, name, self.strings[raw_value] if raw_value != _NO_ENTRY else None, data_type, data).value
+
+    def set_attribute(self, element: str, name: str, value: bool | int | str, namespace: str | None = ANDROID_NAMESPACE, resource_id: int | None = None):
+        """Set or add attribute of first element with given name, android attributes must have resource id"""
+        if resource_id is None and namespace == ANDROID_NAMESPACE:
+            assert name in ANDROID_ATTRIBUTE_RESOURCE_IDS, f"Unknown resource id of android:{name}"
+            resource_id = ANDROID_ATTRIBUTE_RESOURCE_IDS[name]
+        self._set_attribute(self._find_element(element), name, value, namespace, resource_id)
+
+    def add_element(self, parent: str, name: str, attributes: dict[str, bool | int | str | tuple[bool | int | str, int]] | None = None):
+        """Append element with android attributes as last child of first element with given name
+
+        Attribute value is either plain value or (value, resource id), latter one is required for attributes with unknown resource id
+        """
+        parent_idx = self._find_element(parent)
+        depth = 0
+        end_idx = parent_idx
+        for end_idx in range(parent_idx, len(self.chunks)):
+            chunk_type = self._type(self.chunks[end_idx])
+            depth += 1 if chunk_type == RES_XML_START_ELEMENT_TYPE else -1 if chunk_type == RES_XML_END_ELEMENT_TYPE else 0
+            if depth == 0:
+                break
+        (line,) = struct.unpack_from("<I", self.chunks[parent_idx], _CHUNK_HEADER.size)
+
+        name_idx = self._string(name)
+        header_size = _CHUNK_HEADER.size + _NODE_HEADER.size
+        start = _CHUNK_HEADER.pack(RES_XML_START_ELEMENT_TYPE, header_size, header_size + _START_ELEMENT.size)
+        start += _NODE_HEADER.pack(line, _NO_ENTRY) + _START_ELEMENT.pack(_NO_ENTRY, name_idx, _START_ELEMENT.size, _ATTRIBUTE.size, 0, 0, 0, 0)
+        end = (
+            _CHUNK_HEADER.pack(RES_XML_END_ELEMENT_TYPE, header_size, header_size + 8)
+            + _NODE_HEADER.pack(line, _NO_ENTRY)
+            + struct.pack("<2I", _NO_ENTRY, name_idx)
+        )
+        self.chunks[end_idx:end_idx] = [bytearray(start), bytearray(end)]
+        for attribute, value in (attributes or {}).items():
+            if isinstance(value, tuple):
+                value, resource_id = value
+            else:
+                assert attribute in ANDROID_ATTRIBUTE_RESOURCE_IDS, f"Unknown resource id of android:{attribute}, pass (value, resource id)"
+                resource_id = ANDROID_ATTRIBUTE_RESOURCE_IDS[attribute]
+            self._set_attribute(end_idx, attribute, value, ANDROID_NAMESPACE, resource_id)
+
+    def _build_pool(self) -> bytes:
+        assert self.pool is not None
+        flags, _, offsets, data = self.pool
+        header_size = _CHUNK_HEADER.size + _STRING_POOL_HEADER.size
+        data += b"\x00" * (-len(data) % 4)
+        strings_start = header_size + len(offsets) * 4
+        return (
+            _CHUNK_HEADER.pack(RES_STRING_POOL_TYPE, header_size, strings_start + len(data))
+            + _STRING_POOL_HEADER.pack(len(offsets), 0, flags, strings_start, 0)
+            + struct.pack(f"<{len(offsets)}I", *offsets)
+            + data
+        )
+
+    def _build_resource_map(self) -> bytes:
+        return _CHUNK_HEADER.pack(RES_XML_RESOURCE_MAP_TYPE, _CHUNK_HEADER.size, _CHUNK_HEADER.size + len(self.resource_ids) * 4) + struct.pack(
+            f"<{len(self.resource_ids)}I", *self.resource_ids
+        )
+
+    def to_bytes(self) -> bytes:
+        chunks = [bytes(chunk) for chunk in self.chunks]
+        if self.pool_modified:
+            types = [self._type(chunk) for chunk in self.chunks]
+            pool_idx = types.index(RES_STRING_POOL_TYPE)
+            chunks[pool_idx] = self._build_pool()
+            if RES_XML_RESOURCE_MAP_TYPE in types:
+                chunks[types.index(RES_XML_RESOURCE_MAP_TYPE)] = self._build_resource_map()
+            elif self.resource_ids:
+                chunks.insert(pool_idx + 1, self._build_resource_map())
+        body = b"".join(chunks)
+        return _CHUNK_HEADER.pack(RES_XML_TYPE, _CHUNK_HEADER.size, _CHUNK_HEADER.size + len(body)) + body
+
+
+class BinaryManifest(AXML):
+    """AndroidManifest.xml reader working directly on APK without decoding"""
+
+    @staticmethod
+    def from_apk(apk_path: Path) -> "BinaryManifest":
+        with ZipFile(apk_path) as zipfile:
+            return BinaryManifest(zipfile.read("AndroidManifest.xml"))
+
+    @property
+    def manifest(self) -> AXMLElement:
+        assert self.root is not None and self.root.name == "manifest", "Root element of manifest is not <manifest>"
+        return self.root
+
+    @property
+    def application(self) -> AXMLElement | None:
+        return next(self.manifest.iter("application"), None)
+
+    @property
+    def package(self) -> str:
+        package = self.manifest.get("package", None)
+        assert isinstance(package, str), "No package name in manifest"
+        return package
+
+    @property
+    def split(self) -> str | None:
+        split = self.manifest.get("split", None)
+        return split if isinstance(split, str) else None
+
+    @property
+    def split_architecture(self) -> str | None:
+        """Architecture of config split, e.g. "arm64" for "config.arm64_v8a" """
+        if self.split is None or not self.split.startswith("config."):
+            return None
+        # "-" isn't allowed in split names, but "_" is part of "x86_64"
+        abi = self.split.removeprefix("config.")
+        return next((k for k, v in ARCHITECTURES.items() if v.replace("-", "_") == abi), None)
+
+    @property
+    def extract_native_libs(self) -> bool | None:
+        value = self.application.get("extractNativeLibs") if self.application else None
+        return value if isinstance(value, bool) else None
+
+    @property
+    def min_sdk_version(self) -> int:
+        uses_sdk = next(self.manifest.iter("uses-sdk"), None)
+        value = uses_sdk.get("minSdkVersion") if uses_sdk else None
+        return value if isinstance(value, int) else 1
+
+    def resolve_class_name(self, name: str) -> str:
+        if name.startswith("."):
+            return self.package + name
+        if "." not in name:
+            return f"{self.package}.{name}"
+        return name
+
+    def _is_launcher(self, element: AXMLElement) -> bool:
+        for intent_filter in element.iter("intent-filter"):
+            actions = [action.get("name") for action in intent_filter.iter("action")]
+            categories = [category.get("name") for category in intent_filter.iter("category")]
+            if "android.intent.action.MAIN" in actions and "android.intent.category.LAUNCHER" in categories:
+                return True
+        return False
+
+    def get_entry_activities(self) -> list[str]:
+        """MAIN/LAUNCHER activities, activity-aliases resolved to their target activities"""
+        application = self.application
+        if application is None:
+            return []
+
+        entrypoints: list[str] = []
+        for element in application.children:
+            if element.name not in ("activity", "activity-alias") or element.get("enabled") is False:
+                continue
+            if not self._is_launcher(element):
+                continue
+            name = element.get("targetActivity" if element.name == "activity-alias" else "name")
+            if isinstance(name, str) and self.resolve_class_name(name) not in entrypoints:
+                entrypoints.append(self.resolve_class_name(name))
+        return entrypoints
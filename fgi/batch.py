@@ -0,0 +1,213 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from fgi.apkeditor import APKEditor
+from fgi.arguments import Arguments
+from fgi.cache import Cache
+from fgi.logger import Logger
+
+_worker_cache: Cache | None = None
+_worker_apkeditor: APKEditor | None = None
+
+
+def _initialize_worker(template: Arguments):
+    global _worker_cache, _worker_apkeditor
+    Logger.initialize(template.verbose)
+    # Inputs pinned to other frida version download it in worker
+    _worker_cache = Cache(template.download_timeout, template.download_chunk_size, template.update_ttl, template.update_deadline)
+    _worker_apkeditor = APKEditor(_worker_cache.get_apkeditor_path(), template.warm_jvm)
+
+
+def _run_job(arguments: Arguments) -> str | None:
+    from fgi.main import App
+
+    assert _worker_cache is not None
+    try:
+        App.patch(arguments, _worker_cache, _worker_apkeditor)
+        return None
+    except Exception as e:
+        return str(e) or type(e).__name__
+
+
+def _available_memory() -> int | None:
+    try:
+        with open("/proc/meminfo", "r", encoding="utf8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+def _is_split_apk_directory(path: Path) -> bool:
+    return any(path.glob("base*.apk"))
+
+
+@dataclass
+class BatchJob:
+    source: str
+    arguments: Arguments | None = None
+    error: str | None = None
+    elapsed: float = 0
+
+
+@dataclass
+class BatchArguments:
+    inputs: list[str]
+    manifest: Path | None
+    jobs: int
+    min_free_memory: int
+    out_dir: Path
+    template: Arguments
+
+    @staticmethod
+    def create(argv: list[str]):
+        parser = argparse.ArgumentParser(prog="fgi batch")
+        _ = parser.add_argument(
+            "inputs",
+            nargs="*",
+            help="Target APK files, split APK directories, directories containing them or glob patterns",
+        )
+        _ = parser.add_argument(
+            "-m",
+            "--manifest",
+            type=Path,
+            help='JSON list of inputs, each one is either path or object with "input" key and per-input option overrides',
+        )
+        _ = parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Maximum count of concurrent jobs")
+        _ = parser.add_argument(
+            "--min-free-memory",
+            type=int,
+            default=1024,
+            help="Don't start new job while available memory (in MiB) is lower than this, unless nothing is running",
+        )
+        _ = parser.add_argument("-O", "--out-dir", type=Path, default=Path.cwd(), help="Directory for patched APKs")
+        Arguments.add_options(parser)
+
+        args = parser.parse_args(argv)
+        return BatchArguments(
+            args.inputs,  # pyright: ignore[reportAny]
+            args.manifest,  # pyright: ignore[reportAny]
+            args.jobs,  # pyright: ignore[reportAny]
+            args.min_free_memory,  # pyright: ignore[reportAny]
+            args.out_dir,  # pyright: ignore[reportAny]
+            Arguments.from_namespace(args),
+        )
+
+    def validate(self):
+        assert self.inputs or self.manifest, "Specify inputs or manifest"
+        assert self.jobs > 0, "Jobs count must be positive"
+        assert self.out_dir.is_dir(), "Out directory doesn't exist"
+        assert self.template.temp_root_path.exists(), "Root temp path doesn't exist"
+        if self.manifest:
+            assert self.manifest.exists(), "Manifest doesn't exist"
+
+    def _expand(self, pattern: str) -> list[Path]:
+        if glob.has_magic(pattern):
+            return [Path(path) for path in sorted(glob.glob(pattern))]
+        path = Path(pattern)
+        if path.is_dir() and not _is_split_apk_directory(path):
+            children = sorted(path.iterdir())
+            return [child for child in children if (child.is_file() and child.suffix == ".apk") or (child.is_dir() and _is_split_apk_directory(child))]
+        return [path]
+
+    def collect(self) -> list[dict[str, Any]]:
+        """List of inputs with their option overrides"""
+        entries: list[dict[str, Any]] = [{"input": path} for pattern in self.inputs for path in self._expand(pattern)]
+        if self.manifest:
+            with open(self.manifest, "r", encoding="utf8") as f:
+                manifest: list[str | dict[str, Any]] = json.load(f)
+            assert isinstance(manifest, list), "Manifest must contain list of inputs"
+            for item in manifest:
+                entry = {"input": item} if isinstance(item, str) else {k.replace("-", "_"): v for k, v in item.items()}
+                assert "input" in entry, f'"input" key is missing in manifest entry: {item}'
+                entries.append(entry)
+        return entries
+
+    def create_job(self, entry: dict[str, Any]) -> BatchJob:
+        job = BatchJob(str(entry["input"]))
+        try:
+            arguments = self.template.override(entry)
+            if arguments.out is None:
+                arguments.out = arguments.get_default_out(self.out_dir)
+            arguments.validate()
+            job.arguments = arguments
+        except (AssertionError, OSError, TypeError, ValueError) as e:
+            job.error = str(e)
+        return job
+
+
+class BatchApp:
+    def __init__(self, argv: list[str]):
+        self.argv = argv
+
+    def _has_free_memory(self, min_free_memory: int) -> bool:
+        available = _available_memory()
+        return available is None or available >= min_free_memory * 1024 * 1024
+
+    def run(self):
+        batch = BatchArguments.create(self.argv)
+
+        Logger.initialize(batch.template.verbose)
+
+        batch.validate()
+
+        from fgi.main import App
+
+        cache = App.prepare(batch.template)
+        del cache
+
+        jobs = [batch.create_job(entry) for entry in batch.collect()]
+        outs = [job.arguments.out for job in jobs if job.arguments]
+        for job in jobs:
+            if job.arguments and outs.count(job.arguments.out) > 1:
+                job.error = f"Out path {job.arguments.out} is used by several inputs"
+                job.arguments = None
+
+        queue = [job for job in jobs if job.arguments]
+        Logger.info(f"Patching {len(queue)} input(s) using {batch.jobs} worker(s)...")
+        pending: dict[Future[str | None], tuple[BatchJob, float]] = {}
+        with ProcessPoolExecutor(
+            max_workers=batch.jobs,
+            initializer=_initialize_worker,
+            initargs=(batch.template,),
+        ) as executor:
+            while queue or pending:
+                # Don't start new job if memory is low, wait for running one instead
+                if queue and len(pending) < batch.jobs and (not pending or self._has_free_memory(batch.min_free_memory)):
+                    job = queue.pop(0)
+                    Logger.info(f"Starting {job.source}")
+                    pending[executor.submit(_run_job, job.arguments)] = (job, time.monotonic())
+                    continue
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job, started = pending.pop(future)
+                    job.elapsed = time.monotonic() - started
+                    try:
+                        job.error = future.result()
+                    except Exception as e:
+                        job.error = f"Worker failed: {e}"
+                    Logger.info(f"Finished {job.source}" if job.error is None else f"Failed {job.source}: {job.error}")
+
+        self.summarize(jobs)
+
+    def summarize(self, jobs: list[BatchJob]):
+        Logger.info("Summary:")
+        for job in jobs:
+            if job.error is None:
+                Logger.info(f"  OK    {job.source} -> {job.arguments.out if job.arguments else ''} ({job.elapsed:.1f}s)")
+            else:
+                Logger.error(f"  FAIL  {job.source}: {job.error}")
+        failed = len([job for job in jobs if job.error is not None])
+        if failed > 0:
+            raise RuntimeError(f"{failed} of {len(jobs)} input(s) failed")
+        Logger.info(f"All {len(jobs)} input(s) are patched")
@@ -1,101 +1,259 @@
 import json
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable
 
-from fgi.constants import APKEDITOR_TAGGED_URL, APKEDITOR_URL, ARCHITECTURES, FRIDA_GADGET_ARCH_PATTERN, FRIDA_TAGGED_URL, FRIDA_URL
-from fgi.downloader import Downloader
+from fgi.apk import APK
+from fgi.constants import (
+    APKEDITOR_TAGGED_URL,
+    APKEDITOR_URL,
+    ARCHITECTURES,
+    DOWNLOAD_CHUNK_SIZE,
+    DOWNLOAD_TIMEOUT,
+    FRIDA_GADGET_ARCH_PATTERN,
+    FRIDA_TAGGED_URL,
+    FRIDA_URL,
+    UPDATE_CHECK_DEADLINE,
+    UPDATE_CHECK_TTL,
+)
+from fgi.downloader import Asset, Downloader
+from fgi.gadget_cache import GadgetCache
 from fgi.logger import Logger
+from fgi.utils.atomic import FileLock, atomic_path
 from fgi.utils.not_none import not_none
 
 
+_RELEASE_URLS = {
+    "frida": (FRIDA_URL, FRIDA_TAGGED_URL),
+    "apkeditor": (APKEDITOR_URL, APKEDITOR_TAGGED_URL),
+}
+
+
 class Cache:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        download_timeout: float = DOWNLOAD_TIMEOUT,
+        download_chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+        update_ttl: float = UPDATE_CHECK_TTL,
+        update_deadline: float = UPDATE_CHECK_DEADLINE,
+    ) -> None:
+        self.download_timeout = download_timeout
+        self.download_chunk_size = download_chunk_size
+        self.update_ttl = update_ttl
+        self.update_deadline = update_deadline
         self.home = Path.home() / ".fgi"
         self.metadata = self.home / "metadata.json"
+        self.gadgets = GadgetCache(self.home / "gadgets")
         self.is_metadata_open = False
-        self.metadata_dict: dict[str, str] = {}
+        self.metadata_dict: dict[str, Any] = {}
+
+    def _lock(self, name: str) -> FileLock:
+        return FileLock(self.home / f"{name}.lock")
+
+    def _read_metadata(self) -> dict[str, Any]:
+        # Metadata is replaced atomically, so it can be read without lock
+        with open(self.metadata, "r", encoding="utf8") as f:
+            return json.load(f)
+
+    def _write_metadata(self, metadata: dict[str, Any]):
+        with atomic_path(self.metadata) as path, open(path, "w", encoding="utf8") as f:
+            json.dump(metadata, f)
 
     def _open_metadata(self):
         if self.is_metadata_open:
             return
-        with open(self.metadata, "r+", encoding="utf8") as f:
-            self.metadata_dict = json.load(f)
+        self.metadata_dict = self._read_metadata()
         self.is_metadata_open = True
 
-    def _close_metadata(self):
-        if not self.is_metadata_open:
-            return
-        with open(self.metadata, "w+", encoding="utf8") as f:
-            json.dump(self.metadata_dict, f)
-        self.is_metadata_open = False
+    def _update_metadata(self, update: Callable[[dict[str, Any]], None]):
+        """Apply update to loaded metadata and, under lock, to one on disk, so changes of concurrent runs aren't lost"""
+        self._open_metadata()
+        update(self.metadata_dict)
+        with self._lock("metadata"):
+            metadata = self._read_metadata()
+            update(metadata)
+            self._write_metadata(metadata)
 
     def ensure(self):
-        if not self.home.exists():
-            self.home.mkdir()
+        self.home.mkdir(exist_ok=True)
         if not self.metadata.exists():
-            with open(self.metadata, "w+", encoding="utf8") as f:
-                json.dump({"frida": "v0", "apkeditor": "v0"}, f)
+            with self._lock("metadata"):
+                if not self.metadata.exists():
+                    self._write_metadata({"frida": "v0", "apkeditor": "v0"})
+        self.gadgets.ensure()
+        self.gadgets.migrate(self.home, self.get_version("frida"))
+
+    def _create_downloader(self, key: str) -> Downloader:
+        return Downloader(*_RELEASE_URLS[key], self.download_timeout, self.download_chunk_size)
+
+    def _check_release(self, key: str, etag: str | None, outcomes: dict[str, tuple[str | None, str | None] | Exception]):
+        try:
+            outcomes[key] = self._create_downloader(key).check_latest_release(etag)
+        except (RuntimeError, AssertionError, ValueError) as e:
+            outcomes[key] = e
+
+    def get_latest_tags(self, keys: list[str]) -> dict[str, str]:
+        """Latest release tags, checked concurrently, skipped within TTL and conditional on ETag of previous check
+
+        If check fails or doesn't finish before deadline, already downloaded version is used
+        """
+        self._open_metadata()
+        checks: dict[str, dict[str, Any]] = self.metadata_dict.setdefault("checks", {})
+        tags: dict[str, str] = {}
+        pending: list[str] = []
+        for key in keys:
+            check = checks.get(key)
+            if check and time.time() - check["time"] < self.update_ttl and check.get("tag"):
+                Logger.debug(f"Skipping update check for {key}, last check was {int(time.time() - check['time'])}s ago")
+                tags[key] = check["tag"]
+            else:
+                pending.append(key)
+
+        updated: dict[str, dict[str, Any]] = {}
+        outcomes: dict[str, tuple[str | None, str | None] | Exception] = {}
+        # Daemon threads, so slow requests can't hold the run after deadline
+        threads = [threading.Thread(target=self._check_release, args=(key, checks.get(key, {}).get("etag"), outcomes), daemon=True) for key in pending]
+        deadline = time.monotonic() + self.update_deadline
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(max(0, deadline - time.monotonic()))
+
+        for key in pending:
+            outcome = outcomes.get(key, None)
+            if isinstance(outcome, tuple):
+                tag, etag = outcome
+                tag = tag or checks[key]["tag"]
+                updated[key] = {"time": time.time(), "etag": etag, "tag": tag}
+                tags[key] = tag
+                continue
+            reason = outcome or "deadline exceeded"
+            if self.get_version(key) == "v0":
+                raise RuntimeError(f"Update check for {key} failed ({reason}) and there is no cached version")
+            Logger.warn(f"Update check for {key} failed ({reason}), using cached version {self.get_version(key)}")
+            tags[key] = self.get_version(key)
+        if updated:
+            self._update_metadata(lambda metadata: metadata.setdefault("checks", {}).update(updated))
+        return tags
 
     def check_and_download_frida(self, target_version: str | None = None):
-        downloader = Downloader(FRIDA_URL, FRIDA_TAGGED_URL)
-        if target_version:
-            tag = target_version
-        else:
-            tag = downloader.get_latest_release_tag()
+        """Ensure frida-gadget of given (by default latest) version is cached and use it by default"""
+        tag = target_version if target_version else self._create_downloader("frida").get_latest_release_tag()
+        self.ensure_frida(tag)
+        self.set_version("frida", tag)
 
-        if tag == self.get_version("frida"):
-            return
+    def use_frida(self, version: str):
+        """Use already cached frida-gadget by default, e.g. in offline mode"""
+        assert self.gadgets.has(version), f"frida-gadget {version} isn't cached, run without offline mode to download it"
+        self.gadgets.touch(version)
+        self.set_version("frida", version)
 
+    def ensure_frida(self, tag: str):
+        """Download frida-gadget of given version if it isn't cached yet, other cached versions are kept"""
+        if not self.gadgets.has(tag):
+            # Concurrent runs share part files of downloads, so only one of them downloads
+            with FileLock(self.gadgets.get_lock_path(tag)):
+                if not self.gadgets.has(tag):
+                    self._download_frida(tag)
+        self.gadgets.touch(tag)
+
+    def _download_frida(self, tag: str):
+        downloader = self._create_downloader("frida")
         Logger.info(f"Downloading frida-gadget (v{tag})...")
 
         assets = downloader.get_assets(tag)
 
+        targets: dict[str, Asset] = {}
         for asset in assets:
-            if not ("gadget" in asset and "android" in asset):
+            if not ("gadget" in asset.name and "android" in asset.name):
                 continue
-            arch = re.search(FRIDA_GADGET_ARCH_PATTERN, asset).group(1)
+            arch = re.search(FRIDA_GADGET_ARCH_PATTERN, asset.name).group(1)
             if arch in ARCHITECTURES.keys():
-                Logger.info(f"Downloading {arch} frida-gadget...")
+                targets[arch] = asset
 
-                data = downloader.get_asset(asset)
-                decompressed_data = downloader.decompress(data)
+        path = self.gadgets.get_path(tag)
+        path.mkdir(exist_ok=True)
+        with ThreadPoolExecutor(max_workers=len(ARCHITECTURES)) as executor:
+            # Propagate first exception, if any
+            for _ in executor.map(lambda item: self._download_gadget(downloader, path, *item), targets.items()):
+                pass
+        self.gadgets.store(tag, list(targets))
 
-                with open(self.home / f"{arch}.so", "wb+") as f:
-                    f.write(decompressed_data)
-        self.set_version("frida", tag)
+    def _download_gadget(self, downloader: Downloader, directory: Path, arch: str, asset: Asset):
+        Logger.info(f"Downloading {arch} frida-gadget...")
+        path = directory / f"{arch}.so"
+        if path.exists():
+            path.chmod(0o644)
+        downloader.download(asset, path, decompress=True)
+        # Gadgets are shared by all runs (and may be hardlinked), so they are never modified in place
+        path.chmod(0o444)
 
-    def check_and_download_apkeditor(self) -> None:
-        downloader = Downloader(APKEDITOR_URL, APKEDITOR_TAGGED_URL)
-        tag = downloader.get_latest_release_tag()
+    def check_and_download_apkeditor(self, target_version: str | None = None) -> None:
+        downloader = self._create_downloader("apkeditor")
+        tag = target_version if target_version else downloader.get_latest_release_tag()
         if tag == self.get_version("apkeditor"):
             return
 
-        Logger.info("Downloading APKEditor...")
+        with self._lock("apkeditor"):
+            # May be downloaded by concurrent run meanwhile
+            if tag != self._read_metadata().get("apkeditor"):
+                Logger.info("Downloading APKEditor...")
+                assets = downloader.get_assets(tag)
+                assert len(assets) == 1, "Wrong asset count for APKEditor"
+                # Jar is replaced atomically, so running JVMs keep reading old one
+                downloader.download(assets[0], self.get_apkeditor_path())
+            self.set_version("apkeditor", tag)
 
-        assets: list[str] = downloader.get_assets()
-        assert len(assets) == 1, "Wrong asset count for APKEditor"
-        data = downloader.get_asset(assets[0])
-
-        with open(self.get_apkeditor_path(), "wb+") as f:
-            f.write(data)
-        self.set_version("apkeditor", tag)
+    def ensure_key(self):
+        """Generate debug key if it's missing, key is written atomically and only once"""
+        if self.get_key_path().exists():
+            return
+        with self._lock("key"):
+            if not self.get_key_path().exists():
+                with atomic_path(self.get_key_path()) as path:
+                    APK.generate_debug_key(path)
 
     def get_version(self, key: str) -> str:
         self._open_metadata()
         return not_none(self.metadata_dict.get(key))
 
     def set_version(self, key: str, value: str):
-        self._open_metadata()
-        self.metadata_dict[key] = value
+        def update(metadata: dict[str, Any]):
+            metadata[key] = value
+
+        self._update_metadata(update)
 
     def get_home_path(self) -> Path:
         return self.home
 
+    def get_gadgets_path(self, version: str | None = None) -> Path:
+        """Directory with frida-gadgets of given (by default currently used) version"""
+        return self.gadgets.get_path(version or self.get_version("frida"))
+
     def get_apkeditor_path(self) -> Path:
         return self.home / "apkeditor.jar"
 
+    def get_results_path(self) -> Path:
+        return self.home / "results"
+
+    def get_trees_path(self) -> Path:
+        return self.home / "trees"
+
     def get_key_path(self) -> Path:
         return self.home / "debug.keystore"
 
+    def close(self):
+        # Metadata is written on every change, so only loaded copy is dropped
+        self.is_metadata_open = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
     def __del__(self):
-        self._close_metadata()
+        self.close()
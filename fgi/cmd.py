@@ -2,9 +2,16 @@ import subprocess
 from pathlib import Path
 
 from fgi.logger import Logger
+from fgi.profiler import Profiler
 
 
 def run_command_and_check(cmd: list[str | Path]):
+    if Profiler.enabled:
+        Logger.debug(f"Running {cmd}")
+        code, output = Profiler.run_command(cmd)
+        if code != 0:
+            raise RuntimeError(f"Command {cmd} returned non-zero exit status: {output}")
+        return output
     try:
         Logger.debug(f"Running {cmd}")
         return subprocess.check_output(cmd, stderr=subprocess.STDOUT).decode()
@@ -5,11 +5,29 @@ ARCHITECTURES = {
     "x86_64": "x86_64",
 }
 TEMP_PATH_LEN = 12
+SMALI_INDEX_NAME = "smali-index.json"
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 10
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_RETRIES = 5
+UPDATE_CHECK_TTL = 60 * 60
+UPDATE_CHECK_DEADLINE = 15
+RESULT_CACHE_MAX_SIZE = 4 * 1024 * 1024 * 1024
+SERVE_PORT = 8765
+SERVE_RETENTION = 24 * 60 * 60
+GADGET_CACHE_MAX_SIZE = 1024 * 1024 * 1024
+GADGET_CACHE_MIN_AGE = 60 * 60
+TREE_CACHE_MAX_SIZE = 4 * 1024 * 1024 * 1024
+# Rough size of smali (and decoded resources) relative to binary dex, used for scratch space estimation
+DECODE_EXPANSION_RATIO = 4
+SCRATCH_MARGIN = 1.25
 FRIDA_URL = "https://api.github.com/repos/frida/frida/releases/latest"
 FRIDA_TAGGED_URL = "https://api.github.com/repos/frida/frida/releases/tags/%s"
 FRIDA_GADGET_ARCH_PATTERN = r"android-(\w+[-\w]*).so"
 APKEDITOR_URL = "https://api.github.com/repos/REAndroid/APKEditor/releases/latest"
 APKEDITOR_TAGGED_URL = "https://api.github.com/repos/REAndroid/APKEditor/releases/tags/%s"
+DEX_ENTRY_PATTERN = r"classes\d*\.dex"
+SIGNATURE_ENTRY_PATTERN = r"META-INF/([^/]+\.(SF|RSA|DSA|EC)|MANIFEST\.MF)"
 
 SMALI_FULL_LOAD_LIBRARY = (
     ".method static constructor <init>()V\n"  # Using <clinit> may cause method overflow
@@ -0,0 +1,51 @@
+import struct
+
+
+class Dex:
+    """Minimal DEX reader, only what's needed to locate class definitions"""
+
+    def __init__(self, data: bytes):
+        assert data[:4] == b"dex\n", "Not a DEX file"
+        self.data = data
+        (
+            self.string_ids_size,
+            self.string_ids_off,
+            self.type_ids_size,
+            self.type_ids_off,
+        ) = struct.unpack_from("<4I", data, 56)
+        self.class_defs_size, self.class_defs_off = struct.unpack_from("<2I", data, 96)
+
+    def _read_uleb128(self, offset: int) -> tuple[int, int]:
+        result = 0
+        shift = 0
+        while True:
+            byte = self.data[offset]
+            offset += 1
+            result |= (byte & 0x7F) << shift
+            if byte & 0x80 == 0:
+                return result, offset
+            shift += 7
+
+    def get_string(self, idx: int) -> bytes:
+        (string_data_off,) = struct.unpack_from("<I", self.data, self.string_ids_off + idx * 4)
+        _, start = self._read_uleb128(string_data_off)
+        return self.data[start : self.data.index(b"\x00", start)]
+
+    def get_type(self, idx: int) -> bytes:
+        (descriptor_idx,) = struct.unpack_from("<I", self.data, self.type_ids_off + idx * 4)
+        return self.get_string(descriptor_idx)
+
+    def class_descriptors(self) -> list[bytes]:
+        descriptors: list[bytes] = []
+        for i in range(self.class_defs_size):
+            # class_def_item is 32 bytes long, class_idx comes first
+            (class_idx,) = struct.unpack_from("<I", self.data, self.class_defs_off + i * 32)
+            descriptors.append(self.get_type(class_idx))
+        return descriptors
+
+    def defines(self, descriptor: bytes) -> bool:
+        return descriptor in self.class_descriptors()
+
+    @staticmethod
+    def to_descriptor(class_name: str) -> bytes:
+        return ("L" + class_name.replace(".", "/") + ";").encode()
@@ -1,23 +1,44 @@
+import hashlib
 import lzma
+from dataclasses import dataclass
+from pathlib import Path
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from fgi.constants import ARCHITECTURES, DOWNLOAD_CHUNK_SIZE, DOWNLOAD_RETRIES, DOWNLOAD_TIMEOUT
 from fgi.logger import Logger
 
 
+@dataclass
+class Asset:
+    name: str
+    url: str
+    size: int | None
+    digest: str | None  # e.g. "sha256:<hex>"
+
+
 class Downloader:
-    def __init__(self, url: str, tagged_url: str):
+    def __init__(self, url: str, tagged_url: str, timeout: float = DOWNLOAD_TIMEOUT, chunk_size: int = DOWNLOAD_CHUNK_SIZE):
         self.url = url
         self.tagged_url = tagged_url
+        self.timeout = timeout
+        self.chunk_size = chunk_size
         self.tag: str | None = None
+        # Shared between concurrent downloads, so pool must fit all of them
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=len(ARCHITECTURES))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
-    def _request(self, url: str):
+    def _request(self, url: str, headers: dict[str, str] | None = None):
         try:
             Logger.debug(f"Requesting {url}...")
-            response = requests.get(url, timeout=10)
-        except requests.ConnectionError:
-            raise RuntimeError(f"Request to {url} is timed out")
-        assert response.status_code == 200, f"Failed making request to {url}, status code is not 200"
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise RuntimeError(f"Request to {url} failed ({e})")
+        # 304 is only possible for conditional requests
+        assert response.status_code == 200 or response.status_code == 304 and headers, f"Failed making request to {url}, status code is not 200"
         return response
 
     def get_latest_release_tag(self) -> str:
@@ -26,13 +47,104 @@ class Downloader:
             Logger.debug(f"Latest release tag for {self.url}: {self.tag}")
         return self.tag
 
-    def get_assets(self, tag: str | None = None) -> list[str]:
+    def check_latest_release(self, etag: str | None = None) -> tuple[str | None, str | None]:
+        """Latest release tag and ETag, tag is None if release is not modified since given ETag"""
+        response = self._request(self.url, {"If-None-Match": etag} if etag else None)
+        if response.status_code == 304:
+            Logger.debug(f"Latest release for {self.url} is not modified")
+            return None, etag
+        self.tag = response.json().get("tag_name")
+        Logger.debug(f"Latest release tag for {self.url}: {self.tag}")
+        return self.tag, response.headers.get("ETag")
+
+    def get_assets(self, tag: str | None = None) -> list[Asset]:
         target_tag = tag if tag else self.get_latest_release_tag()
         url = self.tagged_url % target_tag
-        return [asset["browser_download_url"] for asset in self._request(url).json()["assets"]]
+        return [
+            Asset(asset["name"], asset["browser_download_url"], asset.get("size"), asset.get("digest"))
+            for asset in self._request(url).json()["assets"]  # pyright: ignore[reportAny]
+        ]
+
+    def _report_progress(self, asset: Asset, previous: int, current: int):
+        if not asset.size:
+            return
+        # Report every 10%
+        if previous * 10 // asset.size != current * 10 // asset.size:
+            Logger.info(f"{asset.name}: {current * 100 // asset.size}% ({current // 1024} KiB of {asset.size // 1024} KiB)")
+
+    def _fetch(self, asset: Asset, part_path: Path):
+        """Download asset into part file, continuing from what is already there"""
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        if asset.size is not None and offset >= asset.size:
+            if offset == asset.size:
+                return
+            part_path.unlink()
+            offset = 0
+
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        if offset:
+            Logger.debug(f"Resuming {asset.name} from {offset} bytes")
+        with self.session.get(asset.url, headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Part file is broken, start from scratch on next attempt
+                part_path.unlink()
+                raise requests.RequestException("Requested range is not satisfiable")
+            if response.status_code not in (200, 206):
+                raise RuntimeError(f"Failed downloading {asset.url}, status code is {response.status_code}")
+            if response.status_code == 200:
+                # Server ignored Range
+                offset = 0
+
+            with open(part_path, "ab" if offset else "wb") as f:
+                for chunk in response.iter_content(self.chunk_size):
+                    _ = f.write(chunk)
+                    self._report_progress(asset, offset, offset + len(chunk))
+                    offset += len(chunk)
+
+    def _verify(self, asset: Asset, part_path: Path):
+        size = part_path.stat().st_size
+        if asset.size is not None and size != asset.size:
+            raise requests.RequestException(f"Size mismatch, got {size} of {asset.size} bytes")
+        if not asset.digest:
+            return
+        algorithm, _, expected = asset.digest.partition(":")
+        if not expected or algorithm not in hashlib.algorithms_available:
+            Logger.debug(f"Skipping verification of {asset.name}, unsupported digest {asset.digest}")
+            return
+        digest = hashlib.new(algorithm)
+        with open(part_path, "rb") as f:
+            while chunk := f.read(self.chunk_size):
+                digest.update(chunk)
+        if digest.hexdigest() != expected:
+            part_path.unlink()
+            raise RuntimeError(f"Checksum mismatch for {asset.name}")
+
+    def download(self, asset: Asset, path: Path, decompress: bool = False):
+        """Download asset with resume and verification, then (decompress and) atomically move it to path"""
+        part_path = path.with_name(asset.name + ".part")
+        for attempt in range(1, DOWNLOAD_RETRIES + 1):
+            try:
+                self._fetch(asset, part_path)
+                self._verify(asset, part_path)
+                break
+            except requests.RequestException as e:
+                if attempt == DOWNLOAD_RETRIES:
+                    raise RuntimeError(f"Failed downloading {asset.name}: {e}")
+                Logger.warn(f"Downloading {asset.name} failed ({e}), retrying ({attempt}/{DOWNLOAD_RETRIES})...")
 
-    def get_asset(self, url: str) -> bytes:
-        return self._request(url).content
+        if not decompress:
+            _ = part_path.replace(path)
+            return
 
-    def decompress(self, data: bytes) -> bytes:
-        return lzma.decompress(data)
+        # Decompressed only after whole .part is downloaded and verified, so interrupted download can be resumed from bytes already on disk
+        temp_path = path.with_name(path.name + ".tmp")
+        decompressor = lzma.LZMADecompressor()
+        with open(part_path, "rb") as source, open(temp_path, "wb") as f:
+            while chunk := source.read(self.chunk_size):
+                _ = f.write(decompressor.decompress(chunk))
+        if not decompressor.eof:
+            temp_path.unlink()
+            part_path.unlink()
+            raise RuntimeError(f"Compressed data of {asset.name} is truncated")
+        _ = temp_path.replace(path)
+        part_path.unlink()
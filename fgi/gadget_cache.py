@@ -0,0 +1,80 @@
+import json
+import shutil
+import time
+from pathlib import Path
+
+from fgi.constants import ARCHITECTURES, GADGET_CACHE_MAX_SIZE, GADGET_CACHE_MIN_AGE
+from fgi.logger import Logger
+from fgi.utils.atomic import FileLock, atomic_path
+from fgi.utils.lru import LRUCache
+
+METADATA_NAME = "metadata.json"
+
+
+class GadgetCache(LRUCache):
+    """frida-gadgets of several versions (<version>/<arch>.so), least recently used versions are evicted"""
+
+    description = "frida-gadget cache"
+
+    def __init__(self, path: Path, max_size: int = GADGET_CACHE_MAX_SIZE):
+        super().__init__(path, max_size, GADGET_CACHE_MIN_AGE)
+
+    def get_path(self, version: str) -> Path:
+        return self.path / version
+
+    def get_lock_path(self, version: str) -> Path:
+        return self.path / f"{version}.lock"
+
+    def _get_metadata_path(self, version: str) -> Path:
+        return self.get_path(version) / METADATA_NAME
+
+    def has(self, version: str) -> bool:
+        """Version is complete, metadata is written only after all gadgets are downloaded"""
+        return self._get_metadata_path(version).exists()
+
+    def touch(self, version: str):
+        self.touch_entry(self.get_path(version))
+
+    def get_architectures(self, version: str) -> list[str]:
+        with open(self._get_metadata_path(version), "r", encoding="utf8") as f:
+            return json.load(f)["architectures"]
+
+    def _list_entries(self) -> list[Path]:
+        """Complete versions"""
+        return [path for path in self.path.iterdir() if path.is_dir() and self.has(path.name)]
+
+    def _get_access_path(self, entry: Path) -> Path:
+        return entry / METADATA_NAME
+
+    def _remove(self, entry: Path):
+        # Version becomes incomplete first, so partially removed one isn't used
+        (entry / METADATA_NAME).unlink(True)
+        shutil.rmtree(entry, True)
+
+    def store(self, version: str, architectures: list[str]):
+        """Mark downloaded version as complete, then evict old ones"""
+        metadata = {"version": version, "architectures": [arch for arch in ARCHITECTURES if arch in architectures], "time": time.time()}
+        with atomic_path(self._get_metadata_path(version)) as path, open(path, "w", encoding="utf8") as f:
+            json.dump(metadata, f)
+        self.evict(self.get_path(version))
+
+    def evict(self, keep: Path | None = None):
+        with FileLock(self.path / "evict.lock"):
+            super().evict(keep)
+
+    def migrate(self, home: Path, version: str):
+        """Move gadgets of single-version layout (~/.fgi/<arch>.so) into versioned one"""
+        if not any((home / f"{arch}.so").exists() for arch in ARCHITECTURES):
+            return
+        with FileLock(self.get_lock_path(version)):
+            # Concurrent run may have moved some of them meanwhile
+            legacy = [home / f"{arch}.so" for arch in ARCHITECTURES if (home / f"{arch}.so").exists()]
+            if version == "v0" or self.has(version):
+                for path in legacy:
+                    path.unlink(True)
+                return
+            Logger.debug(f"Moving frida-gadget {version} into versioned cache")
+            self.get_path(version).mkdir(parents=True, exist_ok=True)
+            for path in legacy:
+                _ = path.replace(self.get_path(version) / path.name)
+            self.store(version, [path.stem for path in self.get_path(version).glob("*.so")])
@@ -1,75 +1,57 @@
 from pathlib import Path
-from shutil import copy
 
+from fgi.archive import ZipRewriter
 from fgi.constants import ARCHITECTURES
 from fgi.logger import Logger
 
 
 class Library:
+    """Collects frida-gadget, config and script entries to be written into APK"""
+
     def __init__(
         self,
         library_name: str,
         architectures: list[str],
-        cache_home_path: Path,
-        temp_path: Path,
+        gadgets_path: Path,
+        stored: bool = False,
     ):
         self.library_name = library_name
         self.architectures = architectures
-        self.cache_home_path = cache_home_path
-        self.temp_path = temp_path
-
-    def ensure(self):
-        path = self.get_root_path()
-        if not path.exists():
-            Logger.debug("lib/ directory does NOT exist, creating")
-            path.mkdir()
-
-    def ensure_arch(self, arch: str):
-        path = self.get_arch_path(arch)
-        if not path.exists():
-            Logger.debug(f"lib/{arch}/ directory does NOT exist, creating")
-            path.mkdir()
+        self.gadgets_path = gadgets_path
+        # Uncompressed entries are page-aligned by writer, so they can be loaded from APK directly
+        self.stored = stored
+        self.entries: dict[str, Path | bytes] = {}
 
-    def get_root_path(self) -> Path:
-        return self.temp_path / "root" / "lib"
-
-    def list_architectures(self) -> list[str]:
-        apk_architectures = list(map(lambda x: x.name, self.get_root_path().glob("*")))
-        return [k for k, v in ARCHITECTURES.items() if v in apk_architectures]
-
-    def get_arch_path(self, arch: str) -> Path:
-        return self.get_root_path() / ARCHITECTURES[arch]
+    def get_arch_path(self, arch: str) -> str:
+        return f"lib/{ARCHITECTURES[arch]}"
 
     def copy_frida(self):
-        self.ensure()
-
-        if len(self.architectures) == 0:
-            self.architectures = self.list_architectures()
-            assert len(self.architectures) > 0, "Failed to get APK architectures, please file a bug"
-            Logger.debug(f"Using architectures from APK: {', '.join(self.architectures)}")
+        assert len(self.architectures) > 0, "Failed to get APK architectures, please file a bug"
 
         for arch in self.architectures:
-            self.ensure_arch(arch)
             Logger.info(f"Copying {arch} frida-gadget")
-            if (self.get_arch_path(arch) / self.library_name).exists():
-                raise RuntimeError("frida-gadget already injected with specified name")
-            copy(
-                self.cache_home_path / (arch + ".so"),
-                self.get_arch_path(arch) / self.library_name,
-            )
+            self.entries[f"{self.get_arch_path(arch)}/{self.library_name}"] = self.gadgets_path / (arch + ".so")
 
     def copy_config(self, config: str):
         for arch in self.architectures:
             Logger.debug(f"Copying {arch} config")
-            with open(
-                self.get_arch_path(arch) / self.library_name.replace(".so", ".config.so"),
-                "w+",
-                encoding="utf8",
-            ) as f:
-                f.write(config)
+            self.entries[f"{self.get_arch_path(arch)}/{self.library_name.replace('.so', '.config.so')}"] = config.encode()
 
     def copy_script(self, script_name: str, script: bytes):
         for arch in self.architectures:
             Logger.debug(f"Copying {script_name} / {arch}")
-            with open(self.get_arch_path(arch) / script_name, "wb+") as f:
-                f.write(script)
+            self.entries[f"{self.get_arch_path(arch)}/{script_name}"] = script
+
+    def write(self, writer: ZipRewriter, architectures: list[str] | None = None):
+        """Write entries for given (by default all) architectures"""
+        prefixes = tuple(self.get_arch_path(arch) + "/" for arch in (self.architectures if architectures is None else architectures))
+        for name, content in self.entries.items():
+            if not name.startswith(prefixes):
+                continue
+            if name in writer.names:
+                raise RuntimeError(f"{name} already injected")
+            Logger.debug(f"Writing {name}")
+            if isinstance(content, Path):
+                writer.write_file(name, content, not self.stored)
+            else:
+                writer.write(name, content, not self.stored)
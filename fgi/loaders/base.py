@@ -1,10 +1,12 @@
 from abc import ABC, abstractmethod
 from pathlib import Path
 
+from fgi.apkeditor import APKEditor
+
 
 class BaseLoader(ABC):
-    def __init__(self, apkeditor_path: Path, source: Path, temp_path: Path):
-        self.apkeditor_path = apkeditor_path
+    def __init__(self, apkeditor: APKEditor, source: Path, temp_path: Path):
+        self.apkeditor = apkeditor
         self.source = source
         self.temp_path = temp_path
 
@@ -16,3 +18,9 @@ class BaseLoader(ABC):
     @abstractmethod
     def output_path(self) -> Path:
         pass
+
+    def cleanup(self):
+        """Remove everything created by load"""
+
+    def __del__(self):
+        self.cleanup()
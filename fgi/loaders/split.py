@@ -1,15 +1,17 @@
 import shutil
+from pathlib import Path
 
-from fgi.cmd import run_command_and_check
 from fgi.loaders.base import BaseLoader
 from fgi.logger import Logger
+from fgi.utils.stage import stage
 
 
 class SplitAPKLoader(BaseLoader):
     """Loader for Split APK files"""
 
-    def _filter_split_apks(self) -> list[str]:
-        files = [path.name for path in self.source.glob("*") if path.is_file()]
+    @staticmethod
+    def filter_split_apks(source: Path) -> list[str]:
+        files = [path.name for path in source.glob("*") if path.is_file()]
         return list(
             filter(
                 lambda x: (x.startswith("base") or x.startswith("split_")) and x.endswith(".apk"),
@@ -21,17 +23,15 @@ class SplitAPKLoader(BaseLoader):
         path = self.merge_temp_path
         path.mkdir()
 
-        candidates = self._filter_split_apks()
+        candidates = self.filter_split_apks(self.source)
         Logger.debug(f"Filtered split APKs: {', '.join(candidates)} -> {path}")
         for apk in candidates:
-            shutil.copy(self.source / apk, path / apk)
+            # APKEditor only reads them
+            stage(self.source / apk, path / apk, read_only=True)
 
         Logger.info("Merging split APKs...")
-        _ = run_command_and_check(
+        _ = self.apkeditor.run(
             [
-                "java",
-                "-jar",
-                self.apkeditor_path,
                 "m",
                 "-i",
                 path,
@@ -50,9 +50,10 @@ class SplitAPKLoader(BaseLoader):
 
     @property
     def output_path(self):
-        return self.source / (self.source.absolute().name + "-merged")
+        # Temp path is unique per run, so concurrent runs on same input don't collide
+        return self.temp_path / (self.source.absolute().name + "-merged")
 
-    def __del__(self):
+    def cleanup(self):
         self.output_path.unlink(True)
         if self.merge_temp_path.exists():
             shutil.rmtree(self.merge_temp_path)
@@ -0,0 +1,19 @@
+from pathlib import Path
+
+from fgi.loaders.base import BaseLoader
+from fgi.loaders.split import SplitAPKLoader
+
+
+class SplitNativeLoader(BaseLoader):
+    """Loader for Split APK files which are patched in place, without merging"""
+
+    def load(self):
+        assert len(self.base_candidates) == 1, "Split APKs must contain exactly one base APK"
+
+    @property
+    def base_candidates(self) -> list[str]:
+        return [name for name in SplitAPKLoader.filter_split_apks(self.source) if name.startswith("base")]
+
+    @property
+    def output_path(self) -> Path:
+        return self.source / self.base_candidates[0]
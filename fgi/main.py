@@ -1,49 +1,78 @@
+import shutil
+import sys
+import tempfile
 import traceback
+from contextlib import ExitStack
+from pathlib import Path
 
 from fgi.apk import APK
+from fgi.apkeditor import APKEditor
 from fgi.arguments import Arguments
 from fgi.cache import Cache
+from fgi.constants import ARCHITECTURES
 from fgi.frida_config import CONFIG_TYPES
 from fgi.library import Library
 from fgi.logger import Logger
 from fgi.manifest import Manifest
-from fgi.smali import Smali
+from fgi.planner import ScratchPlanner
+from fgi.profiler import Profiler
+from fgi.result_cache import ResultCache
+from fgi.smali import Smali, SmaliIndex
+from fgi.splits import Splits
+from fgi.tree_cache import TreeCache
+from fgi.utils.not_none import not_none
 
 
 class App:
+    def __init__(self, argv: list[str] | None = None):
+        self.argv = argv
+
     def run(self):
-        arguments = Arguments.create()
+        arguments = Arguments.create(self.argv)
 
         Logger.initialize(arguments.verbose)
+        Profiler.initialize(arguments.profile is not None)
 
         arguments.validate()
 
-        cache = Cache()
+        try:
+            with Profiler.stage("total"):
+                cache = App.prepare(arguments)
+                App.patch(arguments, cache)
+                del cache
+        finally:
+            if arguments.profile is not None:
+                Profiler.report(arguments.profile)
+
+    @staticmethod
+    def prepare(arguments: Arguments) -> Cache:
+        """Set up everything shared between patches: cache, deps and debug key"""
+        cache = Cache(arguments.download_timeout, arguments.download_chunk_size, arguments.update_ttl, arguments.update_deadline)
         cache.ensure()
 
         if not arguments.offline_mode:
-            cache.check_and_download_frida(target_version=arguments.frida_version)
-            cache.check_and_download_apkeditor()
+            with Profiler.stage("update check"):
+                tags = cache.get_latest_tags(["apkeditor"] if arguments.frida_version else ["frida", "apkeditor"])
+            with Profiler.stage("download"):
+                cache.check_and_download_frida(target_version=arguments.frida_version or tags["frida"])
+                cache.check_and_download_apkeditor(target_version=tags["apkeditor"])
         else:
             Logger.warn("Skipping update check for deps")
+            if arguments.frida_version:
+                cache.use_frida(arguments.frida_version)
 
-        loader_type = arguments.pick_loader()
-        Logger.debug(f"Using loader: {loader_type}")
-        loader = loader_type(cache.get_apkeditor_path(), arguments.input, arguments.temp_root_path)
-        loader.load()
-        apk = APK(cache.get_apkeditor_path(), arguments, loader)
-        apk.decode()
-
-        entrypoint = apk.get_entry_activity()
-        smali = Smali.find(apk.temp_path, entrypoint)
-        smali.perform_injection(arguments.library_name)
-        del smali
+        if not cache.get_key_path().exists():
+            with Profiler.stage("generate key"):
+                cache.ensure_key()
+        return cache
 
+    @staticmethod
+    def create_library(arguments: Arguments, gadgets_path: Path) -> Library:
         library = Library(
             arguments.library_name,
             arguments.architectures,
-            cache.get_home_path(),
-            apk.temp_path,
+            gadgets_path,
+            arguments.stored_libs,
         )
         library.copy_frida()
 
@@ -60,25 +89,119 @@ class App:
             with open(arguments.script_path, "rb") as f:
                 script = f.read()
                 library.copy_script(arguments.script_name, script)
-        del library
+        return library
+
+    @staticmethod
+    def inject(apk: APK, arguments: Arguments, tree_cache: TreeCache | None = None):
+        """Decode dex files (or only ones with entrypoints), inject loadLibrary into entrypoints and enable native libs extraction"""
+        with Profiler.stage("decode"):
+            entrypoints = apk.get_entry_activities()
+            apk.decode_dex(apk.find_entry_dexes(entrypoints) if arguments.targeted_decode or arguments.split_native else apk.list_dexes(), tree_cache)
+        with Profiler.stage("smali injection"):
+            smali_index = SmaliIndex(apk.temp_path)
+            for entrypoint in entrypoints:
+                smali = Smali.find(apk.temp_path, entrypoint, smali_index)
+                smali.perform_injection(arguments.library_name)
+                smali.save()
+
+        with Profiler.stage("manifest"):
+            manifest = Manifest.from_apk(apk.loader.output_path)
+            if not arguments.stored_libs:
+                manifest.enable_extract_native_libs()
+            apk.manifest = manifest.to_bytes()
+
+    @staticmethod
+    def patch(arguments: Arguments, cache: Cache, apkeditor: APKEditor | None = None) -> bool:
+        """Patch single input, returns True if result is taken from result cache"""
+        # Input may be pinned to other frida version than default one, every version is cached side by side
+        frida_version = arguments.frida_version or cache.get_version("frida")
+        if arguments.offline_mode:
+            assert cache.gadgets.has(frida_version), f"frida-gadget {frida_version} isn't cached, run without offline mode to download it"
+        else:
+            with Profiler.stage("download"):
+                cache.ensure_frida(frida_version)
+        gadgets_path = cache.get_gadgets_path(frida_version)
+
+        # Result cache holds single APKs only
+        result_cache = None if arguments.no_result_cache or arguments.split_native else ResultCache(cache.get_results_path())
+        result_key = ""
+        if result_cache is not None:
+            versions = {"frida": frida_version, "apkeditor": cache.get_version("apkeditor")}
+            with Profiler.stage("result cache lookup"):
+                result_key = result_cache.compute_key(arguments, versions, cache.get_key_path())
+                is_cached = result_cache.fetch(result_key, not_none(arguments.out))
+            if is_cached:
+                Logger.info(f"APK is ready at {arguments.out}")
+                return True
+
+        with Profiler.stage("scratch planning"):
+            ScratchPlanner(arguments, gadgets_path).plan()
 
-        manifest = Manifest(apk.temp_path / "AndroidManifest.xml")
-        manifest.enable_extract_native_libs()
-        del manifest
+        loader_type = arguments.pick_loader()
+        Logger.debug(f"Using loader: {loader_type}")
+        with ExitStack() as stack:
+            # Names of temp files are derived from input name, so every run gets its own directory for them
+            arguments.temp_root_path = Path(tempfile.mkdtemp(prefix="fgi-", dir=arguments.temp_root_path))
+            if not arguments.no_cleanup:
+                stack.callback(shutil.rmtree, arguments.temp_root_path, True)
+            if apkeditor is None:
+                apkeditor = stack.enter_context(APKEditor(cache.get_apkeditor_path(), arguments.warm_jvm))
+            loader = loader_type(apkeditor, arguments.input, arguments.temp_root_path)
+            apk = stack.enter_context(APK(apkeditor, arguments, loader))
+            with Profiler.stage("load"):
+                loader.load()
+            splits = stack.enter_context(Splits(arguments.input, arguments.temp_root_path)) if arguments.split_native else None
+            if len(arguments.architectures) == 0:
+                arguments.architectures = apk.list_architectures()
+                if splits is not None:
+                    arguments.architectures = [arch for arch in ARCHITECTURES if arch in arguments.architectures or arch in splits.abi_splits]
+                Logger.debug(f"Using architectures from APK: {', '.join(arguments.architectures)}")
+            tree_cache = TreeCache(cache.get_trees_path(), cache.get_version("apkeditor")) if arguments.tree_cache else None
+            App.inject(apk, arguments, tree_cache)
+            library = App.create_library(arguments, gadgets_path)
+
+            with Profiler.stage("build"):
+                apk.build()
+            if splits is None:
+                with Profiler.stage("compose"):
+                    apk.compose(library)
+                with Profiler.stage("sign"):
+                    apk.sign(cache.get_key_path())
+            else:
+                with Profiler.stage("compose"):
+                    splits.prepare()
+                    apk.compose(library, splits.get_base_architectures(arguments.architectures))
+                    apk.export(splits.out_path / loader.output_path.name)
+                    splits.compose(library, arguments.architectures, arguments.page_size)
+                with Profiler.stage("sign"):
+                    splits.sign(cache.get_key_path())
+                splits.move(not_none(arguments.out))
+        if result_cache is not None:
+            with Profiler.stage("result cache store"):
+                result_cache.store(result_key, not_none(arguments.out))
+
+        if arguments.split_native:
+            Logger.info(f"Split APKs are ready at {arguments.out}, install them with adb install-multiple {arguments.out}/*.apk")
+        else:
+            Logger.info(f"APK is ready at {arguments.out}")
+        return False
 
-        apk.build()
-        apk.zipalign()
-        if not cache.get_key_path().exists():
-            apk.generate_debug_key(cache.get_key_path())
-        apk.sign(cache.get_key_path())
-        del apk
-        del cache
 
-        Logger.info(f"APK is ready at {arguments.out}")
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        from fgi.batch import BatchApp
 
+        app = BatchApp(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from fgi.serve import ServeApp
 
-def main():
-    app = App()
+        app = ServeApp(sys.argv[2:])
+    elif len(sys.argv) > 1 and sys.argv[1] == "update-script":
+        from fgi.update_script import UpdateScriptApp
+
+        app = UpdateScriptApp(sys.argv[2:])
+    else:
+        app = App()
     try:
         app.run()
     except KeyboardInterrupt:
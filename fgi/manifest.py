@@ -1,25 +1,25 @@
 from pathlib import Path
-from xml.etree import ElementTree
+from zipfile import ZipFile
 
+from fgi.axml import AXMLWriter
 from fgi.logger import Logger
 
 
 class Manifest:
-    def __init__(self, xml_path: Path):
-        ElementTree.register_namespace("android", "http://schemas.android.com/apk/res/android")
-        self.path = xml_path
-        with open(self.path, "r", encoding="utf8") as f:
-            self.content = ElementTree.parse(f)
+    """Patches binary AndroidManifest.xml of APK, so resources don't need to be decoded"""
+
+    def __init__(self, data: bytes):
+        self.writer = AXMLWriter(data)
+
+    @staticmethod
+    def from_apk(apk_path: Path) -> "Manifest":
+        with ZipFile(apk_path) as zipfile:
+            return Manifest(zipfile.read("AndroidManifest.xml"))
 
     def enable_extract_native_libs(self):
-        root = self.content.getroot()
-        application_tag = root.findall("application")[0]
-        if (
-            "{http://schemas.android.com/apk/res/android}extractNativeLibs" in application_tag.attrib
-            and application_tag.attrib["{http://schemas.android.com/apk/res/android}extractNativeLibs"] == "false"
-        ):
+        if self.writer.get_attribute("application", "extractNativeLibs") is False:
             Logger.debug("Enabling extractNativeLibs in manifest")
-            application_tag.attrib["{http://schemas.android.com/apk/res/android}extractNativeLibs"] = "true"
+            self.writer.set_attribute("application", "extractNativeLibs", True)
 
-    def __del__(self):
-        self.content.write(self.path, encoding="utf8", xml_declaration=True)
+    def to_bytes(self) -> bytes:
+        return self.writer.to_bytes()
@@ -0,0 +1,78 @@
+import re
+import shutil
+from pathlib import Path
+from zipfile import ZipFile
+
+from fgi.arguments import Arguments
+from fgi.constants import ARCHITECTURES, DECODE_EXPANSION_RATIO, DEX_ENTRY_PATTERN, SCRATCH_MARGIN
+from fgi.loaders.split import SplitAPKLoader
+from fgi.logger import Logger
+from fgi.utils.not_none import not_none
+
+MIB = 1024 * 1024
+
+
+class ScratchPlanner:
+    """Estimates peak temp space usage from central directory of input and picks location which fits it"""
+
+    def __init__(self, arguments: Arguments, gadgets_path: Path):
+        self.arguments = arguments
+        self.gadgets_path = gadgets_path
+
+    def _get_input_paths(self) -> list[Path]:
+        if self.arguments.is_split_apk():
+            return [self.arguments.input / name for name in SplitAPKLoader.filter_split_apks(self.arguments.input)]
+        return [self.arguments.input]
+
+    def _get_library_size(self) -> int:
+        architectures = self.arguments.architectures or ARCHITECTURES.keys()
+        paths = [self.gadgets_path / (arch + ".so") for arch in architectures]
+        return sum(path.stat().st_size for path in paths if path.exists())
+
+    def estimate(self) -> int:
+        input_size = 0
+        dex_sizes: list[int] = []
+        table_size = 0
+        for path in self._get_input_paths():
+            input_size += path.stat().st_size
+            with ZipFile(path) as zipfile:
+                for info in zipfile.infolist():
+                    if re.fullmatch(DEX_ENTRY_PATTERN, info.filename):
+                        dex_sizes.append(info.file_size)
+                    elif info.filename == "resources.arsc":
+                        table_size += info.file_size * DECODE_EXPANSION_RATIO
+        output_size = input_size + self._get_library_size()
+
+        # Every stage deletes what previous one produced as soon as it's consumed, stub APK is deleted after decoding
+        if self.arguments.targeted_decode or self.arguments.split_native:
+            # Usually only one dex is decoded
+            tree_size = max(dex_sizes, default=0) * DECODE_EXPANSION_RATIO + table_size
+        else:
+            tree_size = sum(dex_sizes) * DECODE_EXPANSION_RATIO + table_size
+        # Merged APK of split APKs stays in scratch until output is composed
+        merged_size = input_size if self.arguments.is_split_apk() and not self.arguments.split_native else 0
+        return merged_size + max(tree_size, output_size)
+
+    def plan(self):
+        """Check temp root path, default one is replaced by output directory or current one if it doesn't fit"""
+        required = int(self.estimate() * SCRATCH_MARGIN)
+        Logger.debug(f"Estimated peak scratch space: {required // MIB} MiB")
+
+        candidates = [self.arguments.temp_root_path]
+        if self.arguments.temp_root_path.absolute() == Path(Arguments.get_default_temp_root_path()).absolute():
+            candidates += [not_none(self.arguments.out).absolute().parent, Path.cwd()]
+
+        free = 0
+        for candidate in candidates:
+            free = shutil.disk_usage(candidate).free
+            Logger.debug(f"Free space in {candidate}: {free // MIB} MiB")
+            if free >= required:
+                if candidate != self.arguments.temp_root_path:
+                    Logger.warn(f"Not enough space in {self.arguments.temp_root_path}, using {candidate} for temp files")
+                    self.arguments.temp_root_path = candidate
+                return
+        # Estimate is rough, so patching is attempted anyway
+        Logger.warn(
+            f"Temp files may not fit: ~{required // MIB} MiB is estimated, but only {free // MIB} MiB is free in {candidates[-1]}, "
+            + 'specify other location via "-r" if patching fails'
+        )
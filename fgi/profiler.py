@@ -0,0 +1,176 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+from fgi.logger import Logger
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MIB = 1024 * 1024
+# ru_maxrss is in bytes on macOS and in KiB elsewhere
+MAXRSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+
+def _read_io(pid: int | str = "self") -> tuple[int, int] | None:
+    """Bytes read and written by process (including reaped children), Linux only"""
+    try:
+        with open(f"/proc/{pid}/io", "r", encoding="utf8") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _read_peak_rss() -> int | None:
+    """Peak RSS since last reset, falls back to peak RSS of whole run"""
+    try:
+        with open("/proc/self/status", "r", encoding="utf8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_SCALE
+
+
+def _reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="utf8") as f:
+            _ = f.write("5")
+    except OSError:
+        pass
+
+
+def _get_cpu_times() -> tuple[float, float]:
+    """CPU time of this process and of reaped children"""
+    if resource is None:
+        return time.process_time(), 0
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return time.process_time(), children.ru_utime + children.ru_stime
+
+
+class Profiler:
+    """Records wall time, CPU time, peak RSS and I/O of stages and subprocesses"""
+
+    enabled = False
+    records: list[dict[str, Any]] = []
+    # Running peaks of open stages, every RSS reading is folded into all of them
+    stack: list[dict[str, Any]] = []
+    lock = threading.Lock()
+
+    @staticmethod
+    def initialize(enabled: bool):
+        Profiler.enabled = enabled
+        Profiler.records = []
+        Profiler.stack = []
+
+    @staticmethod
+    def _fold_peak_rss():
+        peak = _read_peak_rss()
+        if peak is None:
+            return
+        for record in Profiler.stack:
+            record["peak_rss"] = max(record["peak_rss"] or 0, peak)
+        _reset_peak_rss()
+
+    @staticmethod
+    @contextmanager
+    def stage(name: str):
+        if not Profiler.enabled:
+            yield
+            return
+
+        record: dict[str, Any] = {"kind": "stage", "name": name, "depth": len(Profiler.stack), "peak_rss": None}
+        with Profiler.lock:
+            Profiler.records.append(record)
+            Profiler._fold_peak_rss()
+            Profiler.stack.append(record)
+        wall = time.perf_counter()
+        cpu, children_cpu = _get_cpu_times()
+        io = _read_io()
+        try:
+            yield
+        finally:
+            record["wall"] = time.perf_counter() - wall
+            end_cpu, end_children_cpu = _get_cpu_times()
+            record["cpu"] = end_cpu - cpu
+            record["children_cpu"] = end_children_cpu - children_cpu
+            end_io = _read_io()
+            record["read_bytes"] = end_io[0] - io[0] if io and end_io else None
+            record["write_bytes"] = end_io[1] - io[1] if io and end_io else None
+            with Profiler.lock:
+                Profiler._fold_peak_rss()
+                _ = Profiler.stack.pop()
+
+    @staticmethod
+    def run_command(cmd: list[str | Path]) -> tuple[int, str]:
+        """Run command like subprocess.check_output does, recording resource usage of it"""
+        record: dict[str, Any] = {"kind": "subprocess", "name": " ".join(str(part) for part in cmd), "depth": len(Profiler.stack)}
+        wall = time.perf_counter()
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        output = process.stdout.read()  # pyright: ignore[reportOptionalMemberAccess]
+        if hasattr(os, "wait4"):
+            io = None
+            if hasattr(os, "waitid") and hasattr(os, "WNOWAIT"):
+                # Wait without reaping first, I/O counters of zombie are still readable
+                _ = os.waitid(os.P_PID, process.pid, os.WEXITED | os.WNOWAIT)
+                io = _read_io(process.pid)
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+            record["cpu"] = usage.ru_utime + usage.ru_stime
+            record["peak_rss"] = usage.ru_maxrss * MAXRSS_SCALE
+            record["read_bytes"], record["write_bytes"] = io if io else (usage.ru_inblock * 512, usage.ru_oublock * 512)
+        else:
+            _ = process.wait()
+            record.update({"cpu": None, "peak_rss": None, "read_bytes": None, "write_bytes": None})
+        process.stdout.close()  # pyright: ignore[reportOptionalMemberAccess]
+        record["wall"] = time.perf_counter() - wall
+        record["children_cpu"] = 0
+        record["exit_code"] = process.returncode
+        with Profiler.lock:
+            Profiler.records.append(record)
+        return process.returncode, output.decode()
+
+    @staticmethod
+    def format_table() -> str:
+        def size(value: int | None) -> str:
+            return "-" if value is None else f"{value / MIB:.1f}"
+
+        def seconds(value: float | None) -> str:
+            return "-" if value is None else f"{value:.2f}"
+
+        rows = [("Stage", "Wall s", "CPU s", "Child CPU s", "Peak RSS MiB", "Read MiB", "Written MiB")]
+        for record in Profiler.records:
+            name = "  " * record["depth"] + ("$ " if record["kind"] == "subprocess" else "") + record["name"]
+            if len(name) > 60:
+                name = name[:57] + "..."
+            rows.append(
+                (
+                    name,
+                    seconds(record.get("wall")),
+                    seconds(record.get("cpu")),
+                    seconds(record.get("children_cpu")),
+                    size(record.get("peak_rss")),
+                    size(record.get("read_bytes")),
+                    size(record.get("write_bytes")),
+                )
+            )
+        widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+        return "\n".join("  ".join(cell.ljust(widths[i]) if i == 0 else cell.rjust(widths[i]) for i, cell in enumerate(row)) for row in rows)
+
+    @staticmethod
+    def report(path: Path):
+        with open(path, "w", encoding="utf8") as f:
+            json.dump({"records": Profiler.records}, f, indent=2)
+        Logger.info(f"Profile is written to {path}:\n{Profiler.format_table()}")
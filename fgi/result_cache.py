@@ -0,0 +1,80 @@
+import hashlib
+from pathlib import Path
+
+from fgi.arguments import Arguments
+from fgi.constants import CHUNK_SIZE, RESULT_CACHE_MAX_SIZE
+from fgi.loaders.split import SplitAPKLoader
+from fgi.logger import Logger
+from fgi.utils.atomic import atomic_path
+from fgi.utils.lru import LRUCache
+from fgi.utils.stage import stage
+
+# Bump when pipeline changes in a way which affects output
+RESULT_CACHE_FORMAT = "1"
+
+
+class ResultCache(LRUCache):
+    """Signed APKs keyed by hash of everything which affects them"""
+
+    description = "result cache"
+
+    def __init__(self, path: Path, max_size: int = RESULT_CACHE_MAX_SIZE):
+        super().__init__(path, max_size)
+
+    def _update_file(self, digest: "hashlib._Hash", path: Path | None):
+        if path is None:
+            digest.update(b"\x00")
+            return
+        with open(path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+        digest.update(b"\x01")
+
+    def compute_key(self, arguments: Arguments, versions: dict[str, str], key_path: Path) -> str:
+        digest = hashlib.sha256(RESULT_CACHE_FORMAT.encode())
+        if arguments.is_split_apk():
+            for name in sorted(SplitAPKLoader.filter_split_apks(arguments.input)):
+                digest.update(name.encode())
+                self._update_file(digest, arguments.input / name)
+        else:
+            self._update_file(digest, arguments.input)
+
+        options = [
+            ",".join(arguments.architectures),
+            arguments.config_type or "",
+            arguments.library_name,
+            arguments.script_name,
+            str(arguments.targeted_decode),
+            str(arguments.stored_libs),
+            str(arguments.page_size),
+            *(f"{k}={v}" for k, v in sorted(versions.items())),
+        ]
+        digest.update("\n".join(options).encode())
+        self._update_file(digest, arguments.config_path)
+        self._update_file(digest, arguments.script_path if arguments.is_script_required() else None)
+        self._update_file(digest, key_path)
+        return digest.hexdigest()
+
+    def get_entry_path(self, key: str) -> Path:
+        return self.path / f"{key}.apk"
+
+    def fetch(self, key: str, out: Path) -> bool:
+        entry = self.get_entry_path(key)
+        if not entry.exists():
+            return False
+        Logger.info(f"Found patched APK in result cache ({key[:12]})")
+        # Out belongs to user and may be modified in place (e.g. by update-script), so it never shares data with entry
+        stage(entry, out)
+        self.touch_entry(entry)
+        return True
+
+    def store(self, key: str, path: Path):
+        self.ensure()
+        entry = self.get_entry_path(key)
+        with atomic_path(entry) as temp_entry:
+            stage(path, temp_entry)
+        Logger.debug(f"Stored patched APK in result cache ({key[:12]})")
+        self.evict(entry)
+
+    def _list_entries(self) -> list[Path]:
+        return list(self.path.glob("*.apk"))
@@ -0,0 +1,369 @@
+import argparse
+import hmac
+import itertools
+import json
+import os
+import queue
+import shutil
+import socketserver
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+from fgi.arguments import PATH_FIELDS, Arguments
+from fgi.constants import SERVE_PORT, SERVE_RETENTION
+from fgi.logger import Logger
+from fgi.session import Session
+
+JOB_STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINISHED_STATUSES = ("done", "failed", "cancelled")
+# Paths are chosen by server, so request can't read or write arbitrary files; script and config are sent as content
+FORBIDDEN_OPTIONS = (PATH_FIELDS - {"input"}) | {"no_cleanup"}
+
+
+@dataclass
+class ServeJob:
+    id: str
+    input: str
+    options: dict[str, Any]
+    priority: int = 0
+    status: str = "queued"
+    out: str | None = None
+    architectures: list[str] = field(default_factory=list)
+    cached: bool = False
+    error: str | None = None
+    created: float = field(default_factory=time.time)
+    started: float | None = None
+    finished: float | None = None
+
+    def describe(self) -> dict[str, Any]:
+        return {k: v for k, v in asdict(self).items() if k != "options"}
+
+
+@dataclass
+class ServeArguments:
+    host: str
+    port: int | None
+    socket: Path | None
+    token: str | None
+    jobs: int
+    out_dir: Path
+    retention: float
+    template: Arguments
+
+    @staticmethod
+    def create(argv: list[str]):
+        parser = argparse.ArgumentParser(prog="fgi serve")
+        _ = parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+        _ = parser.add_argument("--port", type=int, help=f"Listen on TCP port instead of Unix socket (default on POSIX), e.g. {SERVE_PORT}")
+        _ = parser.add_argument("--socket", type=Path, help='Unix socket path, defaults to "fgi.sock" in out directory')
+        _ = parser.add_argument("--token", type=str, help='Require "Authorization: Bearer <token>" header instead of checking Host header')
+        _ = parser.add_argument("-j", "--jobs", type=int, default=2, help="Count of workers")
+        _ = parser.add_argument("-O", "--out-dir", type=Path, default=Path.cwd() / "fgi-serve", help="Directory for job artifacts")
+        _ = parser.add_argument(
+            "--retention",
+            type=float,
+            default=SERVE_RETENTION / 3600,
+            help="Forget finished jobs and delete their artifacts after this many hours",
+        )
+        Arguments.add_options(parser)
+
+        args = parser.parse_args(argv)
+        template = Arguments.from_namespace(args)
+        # Warm JVM is the point of long-running server
+        template.warm_jvm = True
+        return ServeArguments(
+            args.host,  # pyright: ignore[reportAny]
+            args.port,  # pyright: ignore[reportAny]
+            args.socket,  # pyright: ignore[reportAny]
+            args.token,  # pyright: ignore[reportAny]
+            args.jobs,  # pyright: ignore[reportAny]
+            args.out_dir,  # pyright: ignore[reportAny]
+            args.retention * 3600,  # pyright: ignore[reportAny]
+            template,
+        )
+
+    def validate(self):
+        assert self.jobs > 0, "Jobs count must be positive"
+        assert self.retention > 0, "Retention must be positive"
+        assert self.template.temp_root_path.exists(), "Root temp path doesn't exist"
+        assert self.socket is None or self.port is None, 'Specify either "socket" or "port"'
+        if self.socket is None and self.port is None:
+            if os.name == "posix":
+                self.socket = self.out_dir / "fgi.sock"
+            else:
+                self.port = SERVE_PORT
+        if self.socket is not None:
+            assert os.name == "posix", "Unix sockets are supported on POSIX only"
+            assert not self.socket.exists(), "Socket path already exists"
+
+    def get_allowed_hosts(self) -> set[str] | None:
+        """Host header values of requests to TCP server, so DNS rebinding can't be used to reach it from browser"""
+        if self.port is None or self.token is not None:
+            return None
+        return {f"{host}:{self.port}" for host in (self.host, "localhost", "127.0.0.1", "[::1]")}
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "fgi"
+    app: "ServeApp"
+
+    def log_message(self, format: str, *args: Any):
+        # Client address is empty for Unix sockets, so it's not logged
+        Logger.debug(f"{self.command} {self.path}: {format % args}")
+
+    def _send_json(self, status: HTTPStatus, body: Any):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        _ = self.wfile.write(data)
+
+    def _send_error(self, status: HTTPStatus, message: str):
+        self._send_json(status, {"error": message})
+
+    def _send_file(self, path: Path):
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/vnd.android.package-archive")
+        self.send_header("Content-Length", str(path.stat().st_size))
+        self.send_header("Content-Disposition", f'attachment; filename="{path.name}"')
+        self.end_headers()
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, self.wfile)
+
+    def _authorize(self) -> bool:
+        """Reject requests which may be sent by browser on behalf of any web page"""
+        error = self.app.authorize(self.headers.get("Host"), self.headers.get("Authorization"))
+        if error is not None:
+            self._send_error(HTTPStatus.FORBIDDEN, error)
+        return error is None
+
+    def _route(self) -> tuple[ServeJob | None, list[str]]:
+        parts = [part for part in self.path.split("?")[0].split("/") if part]
+        if len(parts) < 2 or parts[0] != "jobs":
+            return None, parts
+        return self.app.jobs.get(parts[1]), parts
+
+    def do_GET(self):
+        if not self._authorize():
+            return
+        job, parts = self._route()
+        if parts == ["health"]:
+            self._send_json(HTTPStatus.OK, self.app.describe())
+        elif parts == ["jobs"]:
+            self._send_json(HTTPStatus.OK, [job.describe() for job in self.app.list_jobs()])
+        elif job is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown job")
+        elif len(parts) == 2:
+            self._send_json(HTTPStatus.OK, job.describe())
+        elif parts[2] == "artifact" and len(parts) <= 4:
+            if job.status != "done" or job.out is None:
+                self._send_error(HTTPStatus.CONFLICT, f"Job is {job.status}")
+                return
+            out = Path(job.out)
+            if out.is_file() and len(parts) == 3:
+                self._send_file(out)
+            elif out.is_dir() and len(parts) == 3:
+                self._send_json(HTTPStatus.OK, sorted(path.name for path in out.iterdir()))
+            elif out.is_dir() and (out / parts[3]).is_file() and parts[3] in os.listdir(out):
+                self._send_file(out / parts[3])
+            else:
+                self._send_error(HTTPStatus.NOT_FOUND, "Unknown artifact")
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown path")
+
+    def do_POST(self):
+        if not self._authorize():
+            return
+        _, parts = self._route()
+        if parts != ["jobs"]:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown path")
+            return
+        # Unlike text/plain or form, JSON body can't be posted cross-origin without CORS preflight
+        if self.headers.get_content_type() != "application/json":
+            self._send_error(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Content-Type must be application/json")
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            assert isinstance(body, dict), "Request body must be JSON object"
+            job = self.app.submit(body)  # pyright: ignore[reportUnknownArgumentType]
+        except (AssertionError, ValueError, TypeError, OSError) as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e) or type(e).__name__)
+            return
+        self._send_json(HTTPStatus.ACCEPTED, job.describe())
+
+    def do_DELETE(self):
+        if not self._authorize():
+            return
+        job, parts = self._route()
+        if job is None or len(parts) != 2:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown job")
+        elif job.status in FINISHED_STATUSES:
+            self.app.remove(job)
+            self._send_json(HTTPStatus.OK, job.describe())
+        elif not self.app.cancel(job):
+            self._send_error(HTTPStatus.CONFLICT, f"Job is {job.status}")
+        else:
+            self._send_json(HTTPStatus.OK, job.describe())
+
+
+class ServeApp:
+    """Long-running server, queues patch jobs by priority and runs them on workers sharing one Session"""
+
+    def __init__(self, argv: list[str]):
+        self.argv = argv
+        self.jobs: dict[str, ServeJob] = {}
+        self.queue: queue.PriorityQueue[tuple[int, int, ServeJob]] = queue.PriorityQueue()
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.serve: ServeArguments | None = None
+        self.session: Session | None = None
+
+    def run(self):
+        self.serve = ServeArguments.create(self.argv)
+
+        Logger.initialize(self.serve.template.verbose)
+
+        self.serve.validate()
+        self.serve.out_dir.mkdir(parents=True, exist_ok=True)
+
+        with Session(self.serve.template) as session:
+            self.session = session
+            for _ in range(self.serve.jobs):
+                threading.Thread(target=self._work, daemon=True).start()
+
+            handler = type("Handler", (_Handler,), {"app": self})
+            if self.serve.socket is not None:
+                server = _UnixHTTPServer(str(self.serve.socket), handler)
+                os.chmod(self.serve.socket, 0o600)
+                Logger.info(f"Listening on {self.serve.socket}")
+            else:
+                server = ThreadingHTTPServer((self.serve.host, self.serve.port or 0), handler)
+                # Port 0 is replaced by picked one, it's used for Host check
+                self.serve.port = server.server_address[1]
+                Logger.info(f"Listening on http://{self.serve.host}:{server.server_address[1]}")
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+                if self.serve.socket is not None:
+                    self.serve.socket.unlink(missing_ok=True)
+
+    def authorize(self, host: str | None, authorization: str | None) -> str | None:
+        """Error message if request isn't allowed"""
+        assert self.serve is not None
+        if self.serve.token is not None:
+            if not hmac.compare_digest((authorization or "").encode(), f"Bearer {self.serve.token}".encode()):
+                return "Invalid token"
+            return None
+        allowed_hosts = self.serve.get_allowed_hosts()
+        if allowed_hosts is not None and host not in allowed_hosts:
+            return "Invalid Host header"
+        return None
+
+    def describe(self) -> dict[str, Any]:
+        with self.lock:
+            counts = {status: 0 for status in JOB_STATUSES}
+            for job in self.jobs.values():
+                counts[job.status] += 1
+        return {"workers": self.serve.jobs if self.serve else 0, "jobs": counts}
+
+    def list_jobs(self) -> list[ServeJob]:
+        with self.lock:
+            return list(self.jobs.values())
+
+    def submit(self, body: dict[str, Any]) -> ServeJob:
+        """Validate request and queue job, request is {"input": ..., "options": {...}, "priority": 0, "script": "...", "config": {...}}"""
+        assert self.serve is not None and self.session is not None
+        assert "input" in body, '"input" key is missing'
+        options: dict[str, Any] = {k.replace("-", "_"): v for k, v in (body.get("options") or {}).items()}
+        for key in options:
+            assert key not in FORBIDDEN_OPTIONS, f'Option "{key}" can\'t be set by request'
+        priority = int(body.get("priority") or 0)
+        self.prune()
+        job = ServeJob(uuid.uuid4().hex[:12], str(body["input"]), options, priority)
+        job_path = self.serve.out_dir / job.id
+
+        job_path.mkdir()
+        try:
+            if body.get("script") is not None:
+                if body.get("config") is None:
+                    options.setdefault("config_type", "script")
+                options["script_path"] = job_path / "script.js"
+                _ = options["script_path"].write_text(str(body["script"]), encoding="utf8")
+            if body.get("config") is not None:
+                options["config_type"] = None
+                options["config_path"] = job_path / "config.json"
+                config = body["config"]
+                _ = options["config_path"].write_text(config if isinstance(config, str) else json.dumps(config), encoding="utf8")
+            options["out"] = self.session.template.override({**options, "input": job.input}).get_default_out(job_path)
+            arguments = self.session.template.override({**options, "input": job.input})
+            arguments.validate()
+        except BaseException:
+            shutil.rmtree(job_path, True)
+            raise
+
+        with self.lock:
+            self.jobs[job.id] = job
+        # Higher priority first, same priority in order of submission
+        self.queue.put((-priority, next(self.counter), job))
+        Logger.info(f"Queued job {job.id} ({job.input}, priority {priority})")
+        return job
+
+    def remove(self, job: ServeJob):
+        """Forget finished job and delete its artifacts"""
+        assert self.serve is not None
+        with self.lock:
+            _ = self.jobs.pop(job.id, None)
+        shutil.rmtree(self.serve.out_dir / job.id, True)
+        Logger.debug(f"Removed job {job.id}")
+
+    def prune(self):
+        """Remove jobs finished longer than retention ago, so long-running server doesn't grow without bound"""
+        assert self.serve is not None
+        deadline = time.time() - self.serve.retention
+        for job in self.list_jobs():
+            if job.status in FINISHED_STATUSES and job.finished is not None and job.finished < deadline:
+                self.remove(job)
+
+    def cancel(self, job: ServeJob) -> bool:
+        with self.lock:
+            if job.status != "queued":
+                return False
+            job.status = "cancelled"
+            job.finished = time.time()
+        return True
+
+    def _work(self):
+        assert self.serve is not None and self.session is not None
+        while True:
+            _, _, job = self.queue.get()
+            with self.lock:
+                if job.status != "queued":
+                    continue
+                job.status = "running"
+                job.started = time.time()
+            Logger.info(f"Starting job {job.id}")
+            try:
+                result = self.session.patch(job.input, job.options)
+                job.out = str(result.out)
+                job.architectures = result.architectures
+                job.cached = result.cached
+                job.status = "done"
+                Logger.info(f"Finished job {job.id} ({result.elapsed:.1f}s)")
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.status = "failed"
+                Logger.error(f"Failed job {job.id}: {job.error}")
+            finally:
+                job.finished = time.time()
@@ -0,0 +1,69 @@
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from fgi.apkeditor import APKEditor
+from fgi.arguments import SHARED_FIELDS, Arguments
+from fgi.cache import Cache
+from fgi.main import App
+from fgi.signer import Signer
+from fgi.utils.not_none import not_none
+
+
+@dataclass
+class PatchResult:
+    out: Path
+    architectures: list[str]
+    cached: bool
+    elapsed: float
+
+
+class Session:
+    """Loads cache, deps, debug key and APKEditor once and patches many inputs in process
+
+    with Session(warm_jvm=True) as session:
+        result = session.patch("target.apk", {"config_type": "script", "script_path": "index.js"})
+    """
+
+    def __init__(self, template: Arguments | None = None, **options: Any):
+        for key in options:
+            assert key in SHARED_FIELDS, f'Option "{key}" is not shared, pass it to patch instead'
+        # Template holds defaults of per-patch options too, e.g. when parsed from command line
+        self.template = template or Arguments.create_default()
+        for key, value in options.items():
+            setattr(self.template, key, value)
+        self.cache: Cache | None = None
+        self.apkeditor: APKEditor | None = None
+
+    def open(self):
+        if self.cache is not None:
+            return
+        self.cache = App.prepare(self.template)
+        self.apkeditor = APKEditor(self.cache.get_apkeditor_path(), self.template.warm_jvm)
+        # Loaded once and reused by every patch
+        _ = Signer.load(self.cache.get_key_path())
+
+    def close(self):
+        if self.apkeditor is not None:
+            self.apkeditor.close()
+            self.apkeditor = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def patch(self, input: str | Path, options: dict[str, Any] | None = None) -> PatchResult:
+        """Patch input with given options (Arguments field names, e.g. "out" or "architectures"), defaults are same as in CLI"""
+        assert self.cache is not None, "Session is not opened"
+        arguments = self.template.override({**(options or {}), "input": input})
+        arguments.validate()
+        started = time.monotonic()
+        cached = App.patch(arguments, self.cache, self.apkeditor)
+        return PatchResult(not_none(arguments.out), arguments.architectures, cached, time.monotonic() - started)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
@@ -0,0 +1,190 @@
+import datetime
+import functools
+import hashlib
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fgi.logger import Logger
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import padding, rsa
+    from cryptography.hazmat.primitives.serialization import pkcs12
+    from cryptography.x509.oid import NameOID
+except ImportError:  # Optional, apksigner is used without it
+    x509 = None
+
+KEY_PASSWORD = b"android"
+KEY_ALIAS = b"androiddebugkey"
+
+# Fixed by APK Signature Scheme v2, unlike I/O chunk size
+DIGEST_CHUNK_SIZE = 1024 * 1024
+SIGNING_BLOCK_MAGIC = b"APK Sig Block 42"
+EOCD_SIGNATURE = 0x06054B50
+EOCD_SIZE = 22
+
+V2_BLOCK_ID = 0x7109871A
+V3_BLOCK_ID = 0xF05368C0
+STRIPPING_PROTECTION_ATTRIBUTE_ID = 0xBEEFF00D
+RSA_PKCS1_SHA256 = 0x0103
+
+# First platform versions verifying v2 and v3 signatures, v1 (JAR) signature is required below V2_MIN_SDK
+V2_MIN_SDK = 24
+V3_MIN_SDK = 28
+MAX_SDK = 0x7FFFFFFF
+
+
+def _prefixed(data: bytes) -> bytes:
+    return struct.pack("<I", len(data)) + data
+
+
+def _sequence(items: list[bytes]) -> bytes:
+    return _prefixed(b"".join(_prefixed(item) for item in items))
+
+
+def _digest_chunk(chunk: memoryview) -> bytes:
+    digest = hashlib.sha256(b"\xa5" + struct.pack("<I", len(chunk)))
+    digest.update(chunk)
+    return digest.digest()
+
+
+class Signer:
+    """In-process APK Signature Scheme v2 and v3 signer, for APKs which don't need v1 signature (minSdk >= 24)"""
+
+    def __init__(self, key: "rsa.RSAPrivateKey", certificate: "x509.Certificate"):
+        self.key = key
+        self.certificate = certificate.public_bytes(serialization.Encoding.DER)
+        self.public_key = key.public_key().public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+
+    @staticmethod
+    def is_available() -> bool:
+        return x509 is not None
+
+    @staticmethod
+    @functools.cache
+    def load(key_path: Path) -> "Signer | None":
+        """Signer for debug key, loaded once per run. None if it's unavailable or key can't be used"""
+        if not Signer.is_available():
+            Logger.debug("cryptography is not installed, using apksigner")
+            return None
+        with open(key_path, "rb") as f:
+            data = f.read()
+        try:
+            key, certificate, _ = pkcs12.load_key_and_certificates(data, KEY_PASSWORD)
+        except ValueError as e:
+            # e.g. JKS keystore created by old keytool
+            Logger.warn(f"Failed to load debug key ({e}), using apksigner")
+            return None
+        if not isinstance(key, rsa.RSAPrivateKey) or certificate is None:
+            Logger.warn("Debug key is not RSA key with certificate, using apksigner")
+            return None
+        return Signer(key, certificate)
+
+    @staticmethod
+    def generate_key(key_path: Path):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name(
+            [
+                x509.NameAttribute(NameOID.COUNTRY_NAME, "US"),
+                x509.NameAttribute(NameOID.ORGANIZATION_NAME, "Android"),
+                x509.NameAttribute(NameOID.COMMON_NAME, "Android Debug"),
+            ]
+        )
+        now = datetime.datetime.now(datetime.timezone.utc)
+        certificate = (
+            x509.CertificateBuilder()
+            .subject_name(name)
+            .issuer_name(name)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + datetime.timedelta(days=10000))
+            .sign(key, hashes.SHA256())
+        )
+        data = pkcs12.serialize_key_and_certificates(KEY_ALIAS, key, certificate, None, serialization.BestAvailableEncryption(KEY_PASSWORD))
+        with open(key_path, "wb") as f:
+            _ = f.write(data)
+
+    def _find_sections(self, data: mmap.mmap) -> tuple[int, int, int]:
+        """Offsets of signing block (or central directory if there is no block), central directory and EOCD"""
+        eocd_offset = data.rfind(struct.pack("<I", EOCD_SIGNATURE), max(0, len(data) - 0xFFFF - EOCD_SIZE))
+        assert eocd_offset >= 0, "End of central directory is not found"
+        cd_size, cd_offset = struct.unpack_from("<II", data, eocd_offset + 12)
+        if cd_offset == 0xFFFFFFFF:
+            raise RuntimeError("Zip64 is not supported")
+        assert cd_offset + cd_size == eocd_offset, "Central directory must be followed by EOCD"
+
+        block_offset = cd_offset
+        if cd_offset >= 32 and data[cd_offset - 16 : cd_offset] == SIGNING_BLOCK_MAGIC:
+            # Already signed, existing block is replaced
+            (block_size,) = struct.unpack_from("<Q", data, cd_offset - 24)
+            block_offset = cd_offset - block_size - 8
+        return block_offset, cd_offset, eocd_offset
+
+    def _compute_digest(self, data: mmap.mmap, block_offset: int, cd_offset: int, eocd_offset: int) -> bytes:
+        """Top level digest over 1 MiB chunks of entries, central directory and EOCD (pointing to signing block)"""
+        eocd = bytearray(data[eocd_offset:])
+        struct.pack_into("<I", eocd, 16, block_offset)
+        view = memoryview(data)
+        chunks = [
+            view[i : min(i + DIGEST_CHUNK_SIZE, end)]
+            for start, end in ((0, block_offset), (cd_offset, eocd_offset))
+            for i in range(start, end, DIGEST_CHUNK_SIZE)
+        ]
+        chunks.append(memoryview(eocd))
+        try:
+            # hashlib releases GIL for large buffers, so chunks are hashed in parallel
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                digests = list(executor.map(_digest_chunk, chunks))
+        finally:
+            # mmap can't be closed while views exist
+            for chunk in chunks:
+                chunk.release()
+            view.release()
+        return hashlib.sha256(b"\x5a" + struct.pack("<I", len(digests)) + b"".join(digests)).digest()
+
+    def _sign_data(self, signed_data: bytes) -> bytes:
+        signature = self.key.sign(signed_data, padding.PKCS1v15(), hashes.SHA256())
+        return _sequence([struct.pack("<I", RSA_PKCS1_SHA256) + _prefixed(signature)])
+
+    def _create_v2_block(self, digest: bytes) -> bytes:
+        digests = _sequence([struct.pack("<I", RSA_PKCS1_SHA256) + _prefixed(digest)])
+        # Tells v3 aware platforms that v3 signature is expected, so it can't be stripped
+        attributes = _sequence([struct.pack("<II", STRIPPING_PROTECTION_ATTRIBUTE_ID, 3)])
+        signed_data = digests + _sequence([self.certificate]) + attributes
+        signer = _prefixed(signed_data) + self._sign_data(signed_data) + _prefixed(self.public_key)
+        return _sequence([signer])
+
+    def _create_v3_block(self, digest: bytes) -> bytes:
+        digests = _sequence([struct.pack("<I", RSA_PKCS1_SHA256) + _prefixed(digest)])
+        sdk_range = struct.pack("<II", V3_MIN_SDK, MAX_SDK)
+        signed_data = digests + _sequence([self.certificate]) + sdk_range + _sequence([])
+        signer = _prefixed(signed_data) + sdk_range + self._sign_data(signed_data) + _prefixed(self.public_key)
+        return _sequence([signer])
+
+    def _create_signing_block(self, digest: bytes) -> bytes:
+        blocks = ((V2_BLOCK_ID, self._create_v2_block(digest)), (V3_BLOCK_ID, self._create_v3_block(digest)))
+        pairs = b"".join(struct.pack("<QI", len(value) + 4, block_id) + value for block_id, value in blocks)
+        size = len(pairs) + 8 + len(SIGNING_BLOCK_MAGIC)
+        return struct.pack("<Q", size) + pairs + struct.pack("<Q", size) + SIGNING_BLOCK_MAGIC
+
+    def sign(self, path: Path):
+        """Sign APK in place: signing block is written between entries and central directory"""
+        with open(path, "r+b") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                block_offset, cd_offset, eocd_offset = self._find_sections(data)
+                digest = self._compute_digest(data, block_offset, cd_offset, eocd_offset)
+                central_directory = data[cd_offset:eocd_offset]
+                eocd = bytearray(data[eocd_offset:])
+
+            block = self._create_signing_block(digest)
+            struct.pack_into("<I", eocd, 16, block_offset + len(block))
+            _ = f.seek(block_offset)
+            _ = f.write(block)
+            _ = f.write(central_directory)
+            _ = f.write(eocd)
+            _ = f.truncate()
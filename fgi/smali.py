@@ -1,7 +1,60 @@
+import json
+import re
 from pathlib import Path
 
-from fgi.constants import SMALI_FULL_LOAD_LIBRARY, SMALI_PARTIAL_LOAD_LIBRARY
+from fgi.constants import SMALI_FULL_LOAD_LIBRARY, SMALI_INDEX_NAME, SMALI_PARTIAL_LOAD_LIBRARY
 from fgi.logger import Logger
+from fgi.utils.atomic import atomic_path
+
+
+class SmaliIndex:
+    """Maps fully qualified class names to smali files in decoded tree"""
+
+    def __init__(self, temp_path: Path):
+        # Same order as dex files are loaded: classes, classes2, ..., classes10
+        roots = [(path, match) for path in (temp_path / "smali").glob("classes*") if (match := re.fullmatch(r"classes(\d*)", path.name))]
+        self.roots = [path for path, _ in sorted(roots, key=lambda x: int(x[1].group(1) or 1))]
+        self.index_path = temp_path / SMALI_INDEX_NAME
+        self.index: dict[str, str] | None = None
+
+    def _build(self) -> dict[str, str]:
+        Logger.debug("Building smali index...")
+        index: dict[str, str] = {}
+        for root in self.roots:
+            for path in root.rglob("*.smali"):
+                with open(path, "r", encoding="utf8") as f:
+                    header = f.readline().split()
+                # e.g. ".class public final Lcom/example/Main;"
+                if not header or header[0] != ".class":
+                    continue
+                class_name = header[-1][1:-1].replace("/", ".")
+                # Same class in several dex files, first one wins like at runtime
+                _ = index.setdefault(class_name, str(path.relative_to(self.index_path.parent)))
+        return index
+
+    def _load(self) -> dict[str, str]:
+        if self.index is None:
+            if self.index_path.exists():
+                with open(self.index_path, "r", encoding="utf8") as f:
+                    self.index = json.load(f)
+            else:
+                self.index = self._build()
+                with open(self.index_path, "w", encoding="utf8") as f:
+                    json.dump(self.index, f)
+        return self.index
+
+    def ensure(self):
+        """Build and persist index, e.g. before decoded tree is stored in tree cache"""
+        _ = self._load()
+
+    def find(self, class_name: str) -> Path | None:
+        relative = class_name.replace(".", "/") + ".smali"
+        for root in self.roots:
+            if (root / relative).is_file():
+                return root / relative
+        # File name may not match class name, e.g. if it's not allowed by filesystem
+        path = self._load().get(class_name)
+        return self.index_path.parent / path if path else None
 
 
 class Smali:
@@ -11,17 +64,14 @@ class Smali:
             self.content = f.readlines()
 
     @staticmethod
-    def find(temp_path: Path, entrypoint: str):
-        target_smali = entrypoint.split(".")[-1] + ".smali"
+    def find(temp_path: Path, entrypoint: str, index: SmaliIndex | None = None):
+        Logger.info(f"Looking for {entrypoint}...")
 
-        Logger.info(f"Looking for {target_smali}...")
-
-        for child in (temp_path / "smali").rglob("*"):
-            if target_smali == child.name.split("/")[-1]:
-                Logger.info(f"Found at {child}")
-
-                return Smali(child)
-        raise RuntimeError(f"Couldn't find smali containing entrypoint ({entrypoint})")
+        path = (index or SmaliIndex(temp_path)).find(entrypoint)
+        if path is None:
+            raise RuntimeError(f"Couldn't find smali containing entrypoint ({entrypoint})")
+        Logger.info(f"Found at {path}")
+        return Smali(path)
 
     def find_inject_point(self, start: int) -> int:
         pos = start
@@ -117,6 +167,7 @@ class Smali:
         self.put_load_library(library_name, marker_value)
         self.update_locals(marker_value)
 
-    def __del__(self):
-        with open(self.path, "w", encoding="utf8") as f:
+    def save(self):
+        # Replaced instead of written in place, as decoded tree may be hardlinked from tree cache
+        with atomic_path(self.path) as path, open(path, "w", encoding="utf8") as f:
             f.writelines(self.content)
@@ -0,0 +1,84 @@
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from zipfile import ZipFile
+
+from fgi.apk import APK
+from fgi.archive import LIBRARY_ALIGNMENT, ZipRewriter
+from fgi.axml import BINARY_MANIFEST_ERRORS, BinaryManifest
+from fgi.constants import SIGNATURE_ENTRY_PATTERN
+from fgi.library import Library
+from fgi.loaders.split import SplitAPKLoader
+from fgi.logger import Logger
+from fgi.utils.stage import stage
+
+
+class Splits:
+    """Split APK set which is patched in place: base APK gets injection, ABI config splits get libraries"""
+
+    def __init__(self, source: Path, temp_root_path: Path):
+        self.source = source
+        self.out_path = temp_root_path / (source.absolute().name + "-splits")
+        self.names = sorted(SplitAPKLoader.filter_split_apks(source))
+        self.abi_splits: dict[str, str] = {}
+        for name in self.names:
+            try:
+                arch = BinaryManifest.from_apk(source / name).split_architecture
+            except BINARY_MANIFEST_ERRORS as e:
+                Logger.warn(f"Failed to read manifest of {name} ({e}), treating it as non-ABI split")
+                continue
+            if arch:
+                Logger.debug(f"ABI split for {arch}: {name}")
+                self.abi_splits[arch] = name
+
+    def prepare(self):
+        self.out_path.mkdir()
+
+    def get_base_architectures(self, architectures: list[str]) -> list[str]:
+        """Architectures without ABI split, their libraries go to base APK"""
+        return [arch for arch in architectures if arch not in self.abi_splits]
+
+    def compose(self, library: Library, architectures: list[str], page_size: int = LIBRARY_ALIGNMENT):
+        """Append libraries to ABI splits, other splits (except base) are copied as is"""
+        touched = {self.abi_splits[arch] for arch in architectures if arch in self.abi_splits}
+        for name in self.names:
+            if name.startswith("base"):
+                continue
+            if name not in touched:
+                # Signed in place later, so can't be hardlinked
+                stage(self.source / name, self.out_path / name)
+                continue
+            Logger.info(f"Injecting libraries into {name}...")
+            arch = next(arch for arch, split in self.abi_splits.items() if split == name)
+            with ZipFile(self.source / name) as source, ZipRewriter(self.out_path / name, library_alignment=page_size) as built:
+                for info in source.infolist():
+                    if not re.fullmatch(SIGNATURE_ENTRY_PATTERN, info.filename):
+                        built.copy(source, info)
+                library.write(built, [arch])
+
+    def sign(self, key_path: Path):
+        Logger.info(f"Signing {len(self.names)} split APKs...")
+        paths = [self.out_path / name for name in self.names]
+        base_path = next(path for path in paths if path.name.startswith("base"))
+        min_sdk_version = APK.read_min_sdk_version(base_path)
+        with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+            # Propagate first exception, if any
+            for _ in executor.map(lambda path: APK.sign_file(path, key_path, min_sdk_version), paths):
+                pass
+
+    def move(self, out: Path):
+        shutil.move(self.out_path, out)
+
+    def cleanup(self):
+        if self.out_path.exists():
+            shutil.rmtree(self.out_path, True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.cleanup()
+
+    def __del__(self):
+        self.cleanup()
@@ -0,0 +1,70 @@
+import hashlib
+import os
+import shutil
+import threading
+from pathlib import Path
+
+from fgi.constants import CHUNK_SIZE, TREE_CACHE_MAX_SIZE
+from fgi.logger import Logger
+from fgi.utils.atomic import FileLock
+from fgi.utils.lru import LRUCache
+from fgi.utils.stage import stage_tree
+
+# Bump when stub APK or decoding changes in a way which affects decoded tree
+TREE_CACHE_FORMAT = "1"
+
+
+class TreeCache(LRUCache):
+    """Pristine trees decoded by APKEditor, keyed by hash of decoded stub APK and APKEditor version"""
+
+    description = "tree cache"
+
+    def __init__(self, path: Path, apkeditor_version: str, max_size: int = TREE_CACHE_MAX_SIZE):
+        super().__init__(path, max_size)
+        self.apkeditor_version = apkeditor_version
+
+    def compute_key(self, stub_path: Path) -> str:
+        """Stub holds everything which is decoded (manifest, resource table and dex files), so it's hashed instead of whole input"""
+        digest = hashlib.sha256(f"{TREE_CACHE_FORMAT}\n{self.apkeditor_version}\n".encode())
+        with open(stub_path, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_entry_path(self, key: str) -> Path:
+        return self.path / key
+
+    def fetch(self, key: str, destination: Path) -> bool:
+        entry = self.get_entry_path(key)
+        if not entry.is_dir():
+            return False
+        # Entry can't be evicted while it's staged
+        with self._lock():
+            if not entry.is_dir():
+                return False
+            Logger.info(f"Found decoded tree in tree cache ({key[:12]})")
+            # Files which are patched are replaced, not written in place, so tree can be hardlinked
+            stage_tree(entry, destination, read_only=True)
+            self.touch_entry(entry)
+        return True
+
+    def _lock(self) -> FileLock:
+        return FileLock(self.path / "tree.lock")
+
+    def store(self, key: str, source: Path):
+        self.ensure()
+        entry = self.get_entry_path(key)
+        temp_entry = entry.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            stage_tree(source, temp_entry, read_only=True)
+            with self._lock():
+                # Concurrent run may have stored same tree meanwhile
+                if not entry.exists():
+                    _ = temp_entry.replace(entry)
+                    Logger.debug(f"Stored decoded tree in tree cache ({key[:12]})")
+                self.evict(entry)
+        finally:
+            shutil.rmtree(temp_entry, True)
+
+    def _list_entries(self) -> list[Path]:
+        return [path for path in super()._list_entries() if path.is_dir()]
@@ -0,0 +1,154 @@
+import argparse
+import shutil
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from zipfile import ZIP_STORED, ZipFile
+
+from fgi.apk import APK
+from fgi.archive import LIBRARY_ALIGNMENT, replace_entries
+from fgi.cache import Cache
+from fgi.constants import ARCHITECTURES
+from fgi.logger import Logger
+from fgi.utils.atomic import atomic_path
+from fgi.utils.stage import stage
+
+
+@dataclass
+class UpdateScriptArguments:
+    input: Path
+    out: Path | None
+    script_path: Path
+    config_path: Path | None
+    library_name: str
+    script_name: str
+    page_size: int
+    verbose: bool
+
+    @staticmethod
+    def create(argv: list[str]):
+        parser = argparse.ArgumentParser(prog="fgi update-script")
+        _ = parser.add_argument("-i", "--input", type=Path, required=True, help="APK patched by fgi or directory of split APKs patched with --split-native")
+        _ = parser.add_argument("-o", "--out", type=Path, help="Output APK file or directory. Input is replaced if not specified")
+        _ = parser.add_argument("-l", "--script-path", type=Path, required=True, help="New script path")
+        _ = parser.add_argument("-c", "--config-path", type=Path, help="New config path, config is kept as is if not specified")
+        _ = parser.add_argument("-n", "--library-name", type=str, default="libfrida.so", help="frida-gadget library name used while patching")
+        _ = parser.add_argument("-s", "--script-name", type=str, default="libscript.so", help="frida-gadget script name used while patching")
+        _ = parser.add_argument(
+            "--page-size",
+            type=int,
+            choices=[4, 16],
+            default=LIBRARY_ALIGNMENT // 1024,
+            help="Alignment of uncompressed native libraries, in KiB (same as used while patching)",
+        )
+        _ = parser.add_argument("-v", "--verbose", action="store_true", help="Verbose logging (useful for debugging)")
+
+        args = parser.parse_args(argv)
+        return UpdateScriptArguments(
+            args.input,  # pyright: ignore[reportAny]
+            args.out,  # pyright: ignore[reportAny]
+            args.script_path,  # pyright: ignore[reportAny]
+            args.config_path,  # pyright: ignore[reportAny]
+            args.library_name,  # pyright: ignore[reportAny]
+            args.script_name,  # pyright: ignore[reportAny]
+            args.page_size * 1024,  # pyright: ignore[reportAny]
+            args.verbose,  # pyright: ignore[reportAny]
+        )
+
+    def validate(self):
+        assert self.input.exists(), "Input APK doesn't exist"
+        if self.out is not None:
+            assert not self.out.exists(), "Out path is exist, delete, rename or specify another one"
+            if self.input.is_file():
+                assert self.out.name.endswith(".apk"), "Out filename must endswith .apk"
+        assert self.script_path.exists(), "Script doesn't exist"
+        if self.config_path:
+            assert self.config_path.exists(), "Config doesn't exist"
+        assert self.library_name.startswith("lib") and self.library_name.endswith(".so"), "Invalid name for frida library"
+        assert self.script_name.startswith("lib") and self.script_name.endswith(".so"), "Invalid name for frida script"
+
+
+class UpdateScriptApp:
+    """Replaces script (and optionally config) of already patched APK, without decoding and rebuilding it"""
+
+    def __init__(self, argv: list[str]):
+        self.argv = argv
+
+    def run(self):
+        update = UpdateScriptArguments.create(self.argv)
+
+        Logger.initialize(update.verbose)
+
+        update.validate()
+
+        cache = Cache()
+        cache.ensure()
+        cache.ensure_key()
+
+        script = update.script_path.read_bytes()
+        config = update.config_path.read_bytes() if update.config_path else None
+        # Everything is checked before out is staged, so failed update leaves nothing behind
+        apk_paths = sorted(update.input.glob("*.apk")) if update.input.is_dir() else [update.input]
+        plans = {apk_path: plan for apk_path in apk_paths if (plan := self.plan(apk_path, update, script, config)) is not None}
+        assert len(plans) > 0, f"No {update.library_name} found in {update.input}, is it patched by fgi?"
+
+        if update.out is not None and update.input.is_dir():
+            update.out.mkdir()
+        try:
+            self.apply(update, plans, cache.get_key_path())
+        except BaseException:
+            if update.out is not None and update.input.is_dir():
+                shutil.rmtree(update.out, True)
+            raise
+
+    def apply(self, update: UpdateScriptArguments, plans: dict[Path, tuple[dict[str, bytes], bool]], key_path: Path):
+        """Update and sign temp copies next to targets, they replace targets only when all of them are done
+
+        So failure leaves targets intact, and hardlinks of input (e.g. in result cache) aren't written through
+        """
+        updated: list[str] = []
+        # Splits have no <uses-sdk>, minSdk of whole set is taken from base APK
+        base_paths = sorted(update.input.glob("base*.apk")) if update.input.is_dir() else []
+        min_sdk_version = APK.read_min_sdk_version(base_paths[0]) if base_paths else None
+        with ExitStack() as stack:
+            for apk_path, (entries, compress) in plans.items():
+                target = apk_path
+                if update.out is not None:
+                    target = update.out / apk_path.name if update.input.is_dir() else update.out
+                temp_path = stack.enter_context(atomic_path(target))
+                # Reflinked where filesystem allows it, so only updated entries are actually written
+                stage(apk_path, temp_path)
+                Logger.info(f"Replacing {update.script_name} in {target.name}...")
+                if replace_entries(temp_path, entries, compress, update.page_size):
+                    Logger.debug(f"Updated {target.name} in place")
+                else:
+                    Logger.debug(f"Rewrote {target.name}, too many entries follow replaced ones")
+                Logger.info(f"Signing {target.name}...")
+                APK.sign_file(temp_path, key_path, min_sdk_version)
+                updated.append(target.name)
+
+            if update.out is not None and update.input.is_dir():
+                for path in update.input.iterdir():
+                    if path.is_file() and path not in plans:
+                        stage(path, update.out / path.name)
+        Logger.info(f"Updated script in {', '.join(updated)}")
+
+    def plan(self, path: Path, update: UpdateScriptArguments, script: bytes, config: bytes | None) -> tuple[dict[str, bytes], bool] | None:
+        """Script and config entries of every ABI which has frida-gadget and whether they're compressed, None if APK has no frida-gadget"""
+        with ZipFile(path) as zipfile:
+            names = set(zipfile.namelist())
+            abis = [abi for abi in ARCHITECTURES.values() if f"lib/{abi}/{update.library_name}" in names]
+            if not abis:
+                Logger.debug(f"Skipping {path.name}, it has no {update.library_name}")
+                return None
+            # Injected entries are either all compressed or all stored (--stored-libs)
+            compress = zipfile.getinfo(f"lib/{abis[0]}/{update.library_name}").compress_type != ZIP_STORED
+
+        entries: dict[str, bytes] = {}
+        for abi in abis:
+            script_name = f"lib/{abi}/{update.script_name}"
+            assert script_name in names or config is not None, f'{path.name} has no {script_name}, patch it with "script" config or specify new config'
+            entries[script_name] = script
+            if config is not None:
+                entries[f"lib/{abi}/{update.library_name.replace('.so', '.config.so')}"] = config
+        return entries, compress
@@ -0,0 +1,53 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+from fgi.logger import Logger
+
+
+class LRUCache:
+    """Directory of entries (files or directories), least recently used ones are evicted once total size exceeds limit"""
+
+    description = "cache"
+
+    def __init__(self, path: Path, max_size: int, min_age: float = 0):
+        self.path = path
+        self.max_size = max_size
+        self.min_age = min_age
+
+    def ensure(self):
+        if not self.path.exists():
+            self.path.mkdir()
+
+    def _list_entries(self) -> list[Path]:
+        return [path for path in self.path.iterdir() if not path.name.startswith(".")]
+
+    def _get_access_path(self, entry: Path) -> Path:
+        """File which mtime is used as last access time of entry"""
+        return entry
+
+    def _get_size(self, entry: Path) -> int:
+        if entry.is_dir():
+            return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(entry) for name in files)
+        return entry.stat().st_size
+
+    def _remove(self, entry: Path):
+        if entry.is_dir():
+            shutil.rmtree(entry, True)
+        else:
+            entry.unlink(True)
+
+    def touch_entry(self, entry: Path):
+        os.utime(self._get_access_path(entry))
+
+    def evict(self, keep: Path | None = None):
+        entries = sorted(((self._get_access_path(entry).stat().st_mtime, entry) for entry in self._list_entries()), reverse=True)
+        total = 0
+        for i, (access_time, entry) in enumerate(entries):
+            total += self._get_size(entry)
+            # Most recently used entry and entry in use are always kept, even if they alone exceed limit. Entries used by concurrent runs
+            # can't be detected, so ones used within min_age are kept too
+            if total > self.max_size and i > 0 and entry != keep and time.time() - access_time > self.min_age:
+                Logger.debug(f"Evicting {entry.name} from {self.description}")
+                self._remove(entry)
@@ -0,0 +1,59 @@
+import os
+import shutil
+from pathlib import Path
+
+from fgi.logger import Logger
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# _IOW(0x94, 9, int) from linux/fs.h
+FICLONE = 0x40049409
+
+
+def _reflink(source: Path, destination: Path) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            _ = fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError:
+        destination.unlink(True)
+        return False
+
+
+def _place(source: Path, destination: Path, read_only: bool) -> str:
+    if _reflink(source, destination):
+        return "Reflinked"
+    if read_only:
+        try:
+            os.link(source, destination)
+            return "Hardlinked"
+        except OSError:
+            pass
+    _ = shutil.copy(source, destination)
+    return "Copied"
+
+
+def stage(source: Path, destination: Path, read_only: bool = False):
+    """Place source at destination without copying data where possible: reflink, then hardlink, then copy
+
+    Hardlink shares data with source, so it's used only if read_only is set, meaning neither file is modified in place afterwards.
+    Reflink is copy-on-write, so destination staged without read_only can be modified safely
+    """
+    Logger.debug(f"{_place(source, destination, read_only)} {source} -> {destination}")
+
+
+def stage_tree(source: Path, destination: Path, read_only: bool = False):
+    """Same as stage, but for every file of directory tree"""
+    methods: dict[str, int] = {}
+    for root, _, files in os.walk(source):
+        target = destination / Path(root).relative_to(source)
+        target.mkdir(parents=True, exist_ok=True)
+        for name in files:
+            method = _place(Path(root) / name, target / name, read_only)
+            methods[method] = methods.get(method, 0) + 1
+    Logger.debug(f"Staged {source} -> {destination} ({', '.join(f'{method.lower()} {count}' for method, count in methods.items()) or 'empty'})")
@@ -0,0 +1,31 @@
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import Scenario, generate
+
+KIB = 1024
+
+
+@pytest.fixture(scope="session")
+def key_path(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    _ = pytest.importorskip("cryptography")
+    from fgi.signer import Signer
+
+    path = tmp_path_factory.mktemp("key") / "debug.keystore"
+    Signer.generate_key(path)
+    return path
+
+
+@pytest.fixture
+def make_apk(tmp_path: Path) -> Callable[..., Path]:
+    """Small synthetic APK, options are Scenario fields"""
+
+    def make(**options: object) -> Path:
+        scenario = Scenario("test", classes_per_dex=16, native_lib_size=64 * KIB, resource_size=64 * KIB, resource_count=4)
+        for name, value in options.items():
+            setattr(scenario, name, value)
+        return generate(scenario, tmp_path)
+
+    return make
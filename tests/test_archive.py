@@ -0,0 +1,62 @@
+import struct
+from pathlib import Path
+from zipfile import ZIP_DEFLATED, ZIP_STORED, ZipFile
+
+import pytest
+
+from fgi.archive import ZipRewriter
+
+
+def _data_offset(path: Path, name: str) -> int:
+    with ZipFile(path) as zipfile, open(path, "rb") as f:
+        offset = zipfile.getinfo(name).header_offset
+        _ = f.seek(offset + 26)
+        name_size, extra_size = struct.unpack("<HH", f.read(4))
+    return offset + 30 + name_size + extra_size
+
+
+@pytest.mark.parametrize("library_alignment", [4096, 16384])
+def test_alignment(tmp_path: Path, library_alignment: int):
+    path = tmp_path / "aligned.apk"
+    with ZipRewriter(path, library_alignment=library_alignment) as writer:
+        writer.write("AndroidManifest.xml", b"manifest" * 10)
+        writer.write("resources.arsc", b"odd" * 7, compress=False)
+        writer.write("lib/arm64-v8a/liba.so", b"a" * 1001, compress=False)
+        writer.write_file("lib/arm64-v8a/libb.so", Path(__file__), compress=False)
+        writer.write("assets/x.bin", b"x" * 3, compress=False)
+
+    assert _data_offset(path, "resources.arsc") % 4 == 0
+    assert _data_offset(path, "assets/x.bin") % 4 == 0
+    assert _data_offset(path, "lib/arm64-v8a/liba.so") % library_alignment == 0
+    assert _data_offset(path, "lib/arm64-v8a/libb.so") % library_alignment == 0
+    with ZipFile(path) as zipfile:
+        assert zipfile.testzip() is None
+        assert zipfile.read("lib/arm64-v8a/libb.so") == Path(__file__).read_bytes()
+
+
+def test_copy_keeps_compression(tmp_path: Path):
+    source_path = tmp_path / "source.apk"
+    with ZipRewriter(source_path) as writer:
+        writer.write("classes.dex", b"dex" * 100)
+        writer.write("lib/x86/liba.so", b"a" * 100, compress=False)
+        writer.write("lib/x86/libb.so", b"b" * 100)
+
+    path = tmp_path / "copy.apk"
+    with ZipFile(source_path) as source, ZipRewriter(path) as writer:
+        writer.copy_all(source, exclude={"lib/x86/libb.so"})
+        writer.copy(source, source.getinfo("lib/x86/libb.so"), "lib/x86/libc.so")
+
+    with ZipFile(path) as zipfile:
+        assert zipfile.testzip() is None
+        assert zipfile.namelist() == ["classes.dex", "lib/x86/liba.so", "lib/x86/libc.so"]
+        assert zipfile.getinfo("classes.dex").compress_type == ZIP_DEFLATED
+        assert zipfile.getinfo("lib/x86/liba.so").compress_type == ZIP_STORED
+        assert zipfile.read("lib/x86/libc.so") == b"b" * 100
+    assert _data_offset(path, "lib/x86/liba.so") % 4096 == 0
+
+
+def test_duplicate_entry(tmp_path: Path):
+    with ZipRewriter(tmp_path / "duplicate.apk") as writer:
+        writer.write("classes.dex", b"dex")
+        with pytest.raises(RuntimeError):
+            writer.write("classes.dex", b"dex")
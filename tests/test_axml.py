@@ -0,0 +1,97 @@
+import pytest
+
+from benchmarks.synthetic import ENTRY_ACTIVITY, PACKAGE, Scenario, create_manifest
+from fgi.axml import ANDROID_NAMESPACE, AXML, AXMLWriter, BinaryManifest
+
+# android:resizeableActivity, not in known resource ids
+RESIZEABLE_ACTIVITY_ID = 0x010104F6
+
+
+def _write(**options: object) -> AXMLWriter:
+    scenario = Scenario("test")
+    for name, value in options.items():
+        setattr(scenario, name, value)
+    return AXMLWriter(create_manifest(scenario))
+
+
+def _resource_ids(axml: AXML, element: str) -> list[int]:
+    """Resource ids of element attributes in order, to check they stay sorted"""
+    writer = AXMLWriter(axml.data)
+    chunk = writer.chunks[writer._find_element(element)]  # pyright: ignore[reportPrivateUsage]
+    return [writer._get_resource_id(idx) or 0xFFFFFFFF for _, _, idx in writer._attributes(chunk)]  # pyright: ignore[reportPrivateUsage]
+
+
+def test_unchanged_round_trip():
+    data = create_manifest(Scenario("test"))
+    assert AXMLWriter(data).to_bytes() == data
+
+
+def test_set_existing_attribute():
+    writer = _write(extract_native_libs=False)
+    writer.set_attribute("application", "extractNativeLibs", True)
+    assert writer.get_attribute("application", "extractNativeLibs") is True
+    manifest = BinaryManifest(writer.to_bytes())
+    assert manifest.extract_native_libs is True
+    assert manifest.get_entry_activities() == [ENTRY_ACTIVITY]
+
+
+def test_insert_attributes():
+    writer = _write()
+    writer.set_attribute("application", "label", "Patched label")
+    writer.set_attribute("application", "debuggable", True)
+    writer.set_attribute("application", "usesCleartextTraffic", True)
+    writer.set_attribute("manifest", "custom", "value", namespace=None)
+    manifest = BinaryManifest(writer.to_bytes())
+
+    assert manifest.application is not None
+    assert manifest.application.get("label") == "Patched label"
+    assert manifest.application.get("debuggable") is True
+    assert manifest.application.get("usesCleartextTraffic") is True
+    assert manifest.application.get("extractNativeLibs") is False
+    assert manifest.manifest.get("custom", namespace=None) == "value"
+    # Existing strings are remapped when pool grows, so everything else must still resolve
+    assert manifest.package == PACKAGE
+    assert manifest.min_sdk_version == 24
+    assert manifest.get_entry_activities() == [ENTRY_ACTIVITY]
+    ids = _resource_ids(manifest, "application")
+    assert ids == sorted(ids)
+
+
+def test_add_element():
+    writer = _write()
+    writer.add_element("application", "meta-data", {"name": "fgi.key", "value": "fgi.value"})
+    writer.add_element("application", "activity", {"name": "com.fgi.Other", "resizeableActivity": (False, RESIZEABLE_ACTIVITY_ID)})
+    manifest = BinaryManifest(writer.to_bytes())
+
+    assert manifest.application is not None
+    (meta_data,) = manifest.application.iter("meta-data")
+    assert meta_data.get("name") == "fgi.key"
+    assert meta_data.get("value") == "fgi.value"
+    other = [activity for activity in manifest.application.iter("activity") if activity.get("name") == "com.fgi.Other"]
+    assert len(other) == 1
+    assert other[0].get("resizeableActivity") is False
+    assert manifest.get_entry_activities() == [ENTRY_ACTIVITY]
+
+
+def test_add_element_unknown_attribute():
+    writer = _write()
+    with pytest.raises(AssertionError):
+        writer.add_element("application", "activity", {"resizeableActivity": False})
+
+
+def test_androguard_reads_patched():
+    axml_printer = pytest.importorskip("androguard.core.axml").AXMLPrinter
+    writer = _write(extract_native_libs=False)
+    writer.set_attribute("application", "extractNativeLibs", True)
+    writer.set_attribute("application", "debuggable", True)
+    writer.add_element("application", "meta-data", {"name": "fgi.key", "value": "fgi.value"})
+    root = axml_printer(writer.to_bytes()).get_xml_obj()
+
+    android = f"{{{ANDROID_NAMESPACE}}}"
+    assert root.get("package") == PACKAGE
+    application = root.find("application")
+    assert application is not None
+    assert application.get(android + "extractNativeLibs") == "true"
+    assert application.get(android + "debuggable") == "true"
+    meta_data = application.find("meta-data")
+    assert meta_data is not None and meta_data.get(android + "value") == "fgi.value"
@@ -0,0 +1,27 @@
+from collections.abc import Callable
+from pathlib import Path
+
+from fgi.batch import BatchArguments
+
+
+def test_bad_entry_fails_alone(make_apk: Callable[..., Path], tmp_path: Path):
+    apk = make_apk()
+    script = tmp_path / "index.js"
+    _ = script.write_text("console.log(1)")
+    invalid_config = tmp_path / "invalid.json"
+    _ = invalid_config.write_text("{")
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+
+    batch = BatchArguments.create([str(apk), "-O", str(out_dir), "-t", "script", "-l", str(script)])
+    batch.validate()
+    entries = [
+        {"input": apk},
+        {"input": apk, "config_type": None, "config_path": str(invalid_config)},
+        {"input": apk, "config_type": None, "config_path": str(tmp_path / "missing.json")},
+        {"input": apk, "out": str(out_dir / "second.apk")},
+    ]
+    jobs = [batch.create_job(entry) for entry in entries]
+
+    assert [job.error is None for job in jobs] == [True, False, False, True]
+    assert all(job.arguments is not None for job in jobs if job.error is None)
@@ -0,0 +1,36 @@
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from benchmarks.synthetic import ENTRY_ACTIVITY, create_dex
+from fgi.apk import APK
+from fgi.apkeditor import APKEditor
+from fgi.arguments import Arguments
+from fgi.dex import Dex
+from fgi.loaders.apk import APKLoader
+
+
+def _create_apk(path: Path, tmp_path: Path) -> APK:
+    apkeditor = APKEditor(tmp_path / "APKEditor.jar")
+    return APK(apkeditor, Arguments.create(["-i", str(path)]), APKLoader(apkeditor, path, tmp_path))
+
+
+def test_entry_in_secondary_dex(make_apk: Callable[..., Path], tmp_path: Path):
+    apk = _create_apk(make_apk(dex_count=3), tmp_path)
+    assert apk.list_dexes() == ["classes.dex", "classes2.dex", "classes3.dex"]
+    assert apk.find_entry_dexes([ENTRY_ACTIVITY]) == ["classes3.dex"]
+
+
+def test_missing_entry(make_apk: Callable[..., Path], tmp_path: Path):
+    apk = _create_apk(make_apk(dex_count=2), tmp_path)
+    with pytest.raises(RuntimeError):
+        _ = apk.find_entry_dexes([ENTRY_ACTIVITY + "Missing"])
+
+
+def test_inner_class():
+    dex = Dex(create_dex({"com.example.Main$Inner": "android.app.Activity", "com.example.Main": "java.lang.Object"}))
+    assert Dex.to_descriptor("com.example.Main$Inner") == b"Lcom/example/Main$Inner;"
+    assert sorted(dex.class_descriptors()) == [b"Lcom/example/Main$Inner;", b"Lcom/example/Main;"]
+    assert dex.defines(b"Lcom/example/Main$Inner;")
+    assert not dex.defines(b"Lcom/example/Main$Other;")
@@ -0,0 +1,21 @@
+from collections.abc import Callable
+from pathlib import Path
+
+from benchmarks.synthetic import ENTRY_ACTIVITY, PACKAGE
+from fgi.axml import BinaryManifest
+
+
+def test_read(make_apk: Callable[..., Path]):
+    manifest = BinaryManifest.from_apk(make_apk(min_sdk_version=21, extract_native_libs=False))
+    assert manifest.package == PACKAGE
+    assert manifest.min_sdk_version == 21
+    assert manifest.extract_native_libs is False
+    assert manifest.split is None
+    assert manifest.get_entry_activities() == [ENTRY_ACTIVITY]
+
+
+def test_read_split(make_apk: Callable[..., Path]):
+    path = make_apk(split=True, architectures=("arm64",))
+    manifest = BinaryManifest.from_apk(path / "split_config.arm64_v8a.apk")
+    assert manifest.split == "config.arm64_v8a"
+    assert manifest.split_architecture == "arm64"
@@ -0,0 +1,165 @@
+import hashlib
+import shutil
+import struct
+from collections.abc import Callable
+from pathlib import Path
+
+import pytest
+
+from fgi.apk import APK
+from fgi.archive import ZipRewriter
+from fgi.splits import Splits
+
+cryptography = pytest.importorskip("cryptography")
+from cryptography import x509  # noqa: E402
+from cryptography.hazmat.primitives import hashes  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import padding  # noqa: E402
+
+from fgi.signer import RSA_PKCS1_SHA256, V2_BLOCK_ID, V3_BLOCK_ID, Signer  # noqa: E402
+
+MAGIC = b"APK Sig Block 42"
+CHUNK_SIZE = 1024 * 1024
+
+
+def _read_prefixed(data: bytes, offset: int) -> tuple[bytes, int]:
+    (size,) = struct.unpack_from("<I", data, offset)
+    return data[offset + 4 : offset + 4 + size], offset + 4 + size
+
+
+def _read_sequence(data: bytes) -> list[bytes]:
+    items: list[bytes] = []
+    offset = 0
+    while offset < len(data):
+        item, offset = _read_prefixed(data, offset)
+        items.append(item)
+    return items
+
+
+def _read_signing_block(data: bytes) -> tuple[dict[int, bytes], int, int, int]:
+    """Signing block pairs, offsets of block, central directory and EOCD, written from spec independently of signer"""
+    eocd_offset = data.rindex(b"PK\x05\x06")
+    cd_size, cd_offset = struct.unpack_from("<II", data, eocd_offset + 12)
+    assert cd_offset + cd_size == eocd_offset
+    assert data[cd_offset - 16 : cd_offset] == MAGIC
+    (size,) = struct.unpack_from("<Q", data, cd_offset - 24)
+    block_offset = cd_offset - size - 8
+    assert struct.unpack_from("<Q", data, block_offset)[0] == size
+    pairs: dict[int, bytes] = {}
+    offset = block_offset + 8
+    while offset < cd_offset - 24:
+        length, block_id = struct.unpack_from("<QI", data, offset)
+        pairs[block_id] = data[offset + 12 : offset + 8 + length]
+        offset += 8 + length
+    return pairs, block_offset, cd_offset, eocd_offset
+
+
+def _content_digest(data: bytes, block_offset: int, cd_offset: int, eocd_offset: int) -> bytes:
+    eocd = bytearray(data[eocd_offset:])
+    struct.pack_into("<I", eocd, 16, block_offset)
+    sections = (data[:block_offset], data[cd_offset:eocd_offset], bytes(eocd))
+    digests = [
+        hashlib.sha256(b"\xa5" + struct.pack("<I", len(chunk)) + chunk).digest()
+        for section in sections
+        for chunk in (section[i : i + CHUNK_SIZE] for i in range(0, len(section), CHUNK_SIZE))
+    ]
+    return hashlib.sha256(b"\x5a" + struct.pack("<I", len(digests)) + b"".join(digests)).digest()
+
+
+def _verify(path: Path, key_path: Path):
+    data = path.read_bytes()
+    pairs, block_offset, cd_offset, eocd_offset = _read_signing_block(data)
+    assert set(pairs) == {V2_BLOCK_ID, V3_BLOCK_ID}
+    digest = _content_digest(data, block_offset, cd_offset, eocd_offset)
+    signer = Signer.load(key_path)
+    assert signer is not None
+
+    for block_id, block in pairs.items():
+        (signer_data,) = _read_sequence(_read_prefixed(block, 0)[0])
+        signed_data, offset = _read_prefixed(signer_data, 0)
+        if block_id == V3_BLOCK_ID:
+            offset += 8  # min and max SDK
+        signatures, offset = _read_prefixed(signer_data, offset)
+        public_key, _ = _read_prefixed(signer_data, offset)
+        assert public_key == signer.public_key
+
+        digests, offset = _read_prefixed(signed_data, 0)
+        certificates, _ = _read_prefixed(signed_data, offset)
+        ((algorithm_digest,),) = [_read_sequence(digests)]
+        assert struct.unpack_from("<I", algorithm_digest)[0] == RSA_PKCS1_SHA256
+        assert _read_prefixed(algorithm_digest, 4)[0] == digest
+        certificate = x509.load_der_x509_certificate(_read_sequence(certificates)[0])
+
+        (signature,) = _read_sequence(signatures)
+        assert struct.unpack_from("<I", signature)[0] == RSA_PKCS1_SHA256
+        certificate.public_key().verify(_read_prefixed(signature, 4)[0], signed_data, padding.PKCS1v15(), hashes.SHA256())  # pyright: ignore
+
+
+def test_sign(make_apk: Callable[..., Path], key_path: Path):
+    path = make_apk()
+    APK.sign_file(path, key_path)
+    _verify(path, key_path)
+
+
+def test_sign_androguard(make_apk: Callable[..., Path], key_path: Path):
+    androguard_apk = pytest.importorskip("androguard.core.apk")
+    path = make_apk()
+    APK.sign_file(path, key_path)
+    apk = androguard_apk.APK(str(path))
+    assert apk.is_signed_v2() and apk.is_signed_v3()
+    signer = Signer.load(key_path)
+    assert signer is not None
+    assert apk.get_certificates_der_v2() == [signer.certificate]
+
+
+def test_resign_replaces_block(make_apk: Callable[..., Path], key_path: Path):
+    path = make_apk()
+    APK.sign_file(path, key_path)
+    size = path.stat().st_size
+    APK.sign_file(path, key_path)
+    assert path.stat().st_size == size
+    _verify(path, key_path)
+
+
+def test_resign_after_append(make_apk: Callable[..., Path], key_path: Path, tmp_path: Path):
+    from zipfile import ZipFile
+
+    path = make_apk()
+    APK.sign_file(path, key_path)
+    out = tmp_path / "out.apk"
+    with ZipFile(path) as source, ZipRewriter(out) as writer:
+        writer.copy_all(source)
+        writer.write("lib/arm64-v8a/libextra.so", b"extra", compress=False)
+    APK.sign_file(out, key_path)
+    _verify(out, key_path)
+
+
+def test_v1_fallback(make_apk: Callable[..., Path], key_path: Path, monkeypatch: pytest.MonkeyPatch):
+    commands: list[list[object]] = []
+    monkeypatch.setattr("fgi.apk.run_command_and_check", lambda command: commands.append(command))  # pyright: ignore
+    monkeypatch.setattr(Signer, "sign", lambda *_: pytest.fail("v2 signer is used for minSdk < 24"))  # pyright: ignore
+    path = make_apk(min_sdk_version=21)
+    APK.sign_file(path, key_path)
+    assert len(commands) == 1
+    assert str(commands[0][0]).startswith("apksigner") and commands[0][1] == "sign"
+
+
+def test_splits_use_base_min_sdk(make_apk: Callable[..., Path], key_path: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("fgi.apk.run_command_and_check", lambda *_: pytest.fail("apksigner is used for split without <uses-sdk>"))  # pyright: ignore
+    source = make_apk(split=True, architectures=("arm64",))
+    splits = Splits(source, tmp_path)
+    splits.prepare()
+    for path in source.iterdir():
+        _ = shutil.copy(path, splits.out_path)
+    splits.sign(key_path)
+    for name in splits.names:
+        _verify(splits.out_path / name, key_path)
+
+
+def test_tampered_entry_is_detected(make_apk: Callable[..., Path], key_path: Path):
+    path = make_apk()
+    APK.sign_file(path, key_path)
+    data = bytearray(path.read_bytes())
+    data[100] ^= 0xFF
+    _ = path.write_bytes(data)
+    with pytest.raises(AssertionError):
+        _verify(path, key_path)
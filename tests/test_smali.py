@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from fgi.constants import SMALI_INDEX_NAME
+from fgi.smali import SmaliIndex
+
+
+def _write_class(root: Path, class_name: str, file_name: str | None = None):
+    path = root / (file_name or class_name.replace(".", "/") + ".smali")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    _ = path.write_text(f".class public L{class_name.replace('.', '/')};\n.super Ljava/lang/Object;\n")
+
+
+def test_roots(tmp_path: Path):
+    smali = tmp_path / "smali"
+    for name in ("classes10", "classes2", "classes", "classes_backup", "classes2.orig"):
+        _write_class(smali / name, f"com.example.{name.replace('.', '_')}.Main")
+    # Non-numeric roots aren't dex files, so classes defined there are never found
+    _write_class(smali / "classes_backup", "com.example.Shadowed")
+    _write_class(smali / "classes2", "com.example.Shadowed")
+    _write_class(smali / "classes_backup", "com.example.Renamed", "Renamed.smali")
+
+    index = SmaliIndex(tmp_path)
+    assert [root.name for root in index.roots] == ["classes", "classes2", "classes10"]
+    assert index.find("com.example.Shadowed") == smali / "classes2/com/example/Shadowed.smali"
+    assert index.find("com.example.classes_backup.Main") is None
+    assert index.find("com.example.Renamed") is None
+
+    index.ensure()
+    assert (tmp_path / SMALI_INDEX_NAME).exists()
+
+
+def test_renamed_file(tmp_path: Path):
+    _write_class(tmp_path / "smali" / "classes2", "com.example.Main", "com/example/main_1.smali")
+    assert SmaliIndex(tmp_path).find("com.example.Main") == tmp_path / "smali/classes2/com/example/main_1.smali"
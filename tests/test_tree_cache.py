@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from fgi.smali import Smali
+from fgi.tree_cache import TreeCache
+
+MAIN = ".class public Lcom/example/Main;\n.super Landroid/app/Activity;\n"
+
+
+def _read_tree(path: Path) -> dict[str, str]:
+    return {str(file.relative_to(path)): file.read_text() for file in sorted(path.rglob("*")) if file.is_file()}
+
+
+def test_hit_is_independent(tmp_path: Path):
+    source = tmp_path / "source"
+    (source / "smali" / "classes").mkdir(parents=True)
+    _ = (source / "smali" / "classes" / "Main.smali").write_text(MAIN)
+    _ = (source / "AndroidManifest.xml").write_text("<manifest/>")
+    pristine = _read_tree(source)
+
+    cache = TreeCache(tmp_path / "trees", "1.0")
+    key = "0" * 64
+    assert not cache.fetch(key, tmp_path / "miss")
+    cache.store(key, source)
+
+    # Patched the way pipeline does it: smali is replaced, files are added and removed
+    first = tmp_path / "first"
+    assert cache.fetch(key, first)
+    smali = Smali(first / "smali" / "classes" / "Main.smali")
+    smali.content.append("# patched\n")
+    smali.save()
+    _ = (first / "smali" / "classes" / "Added.smali").write_text(MAIN)
+    (first / "AndroidManifest.xml").unlink()
+
+    second = tmp_path / "second"
+    assert cache.fetch(key, second)
+    assert _read_tree(second) == pristine
+    assert _read_tree(cache.get_entry_path(key)) == pristine
+    assert _read_tree(first)["smali/classes/Main.smali"].endswith("# patched\n")
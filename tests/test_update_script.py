@@ -0,0 +1,78 @@
+import os
+from collections.abc import Callable
+from pathlib import Path
+from zipfile import ZipFile
+
+import pytest
+
+from fgi.archive import ZipRewriter
+from fgi.update_script import UpdateScriptApp
+
+_ = pytest.importorskip("cryptography")
+
+CONFIG = b'{"interaction": {"type": "script", "path": "libscript.so"}}'
+
+
+@pytest.fixture
+def patched_apk(make_apk: Callable[..., Path], tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """APK laid out as fgi writes it: original entries, then frida-gadget, config and script of every ABI"""
+    (tmp_path / "home").mkdir()
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    source = make_apk()
+    path = tmp_path / "patched.apk"
+    with ZipFile(source) as zipfile, ZipRewriter(path) as writer:
+        writer.copy_all(zipfile)
+        writer.write("lib/arm64-v8a/libfrida.so", b"gadget")
+        writer.write("lib/arm64-v8a/libfrida.config.so", CONFIG)
+        writer.write("lib/arm64-v8a/libscript.so", b"console.log(1)")
+    return path
+
+
+def _run(*argv: str | Path):
+    UpdateScriptApp([str(arg) for arg in argv]).run()
+
+
+def test_replace(patched_apk: Path, tmp_path: Path):
+    script = tmp_path / "index.js"
+    _ = script.write_text("console.log(2)")
+    hardlink = tmp_path / "hardlink.apk"
+    os.link(patched_apk, hardlink)
+
+    _run("-i", patched_apk, "-l", script)
+
+    with ZipFile(patched_apk) as zipfile:
+        assert zipfile.testzip() is None
+        assert zipfile.read("lib/arm64-v8a/libscript.so") == b"console.log(2)"
+        assert zipfile.read("lib/arm64-v8a/libfrida.config.so") == CONFIG
+    assert b"APK Sig Block 42" in patched_apk.read_bytes()
+    with ZipFile(hardlink) as zipfile:
+        assert zipfile.read("lib/arm64-v8a/libscript.so") == b"console.log(1)"
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith(".tmp")]
+
+
+def test_out(patched_apk: Path, tmp_path: Path):
+    script = tmp_path / "index.js"
+    _ = script.write_text("console.log(2)")
+    out = tmp_path / "out.apk"
+    before = patched_apk.read_bytes()
+
+    _run("-i", patched_apk, "-o", out, "-l", script)
+
+    assert patched_apk.read_bytes() == before
+    with ZipFile(out) as zipfile:
+        assert zipfile.read("lib/arm64-v8a/libscript.so") == b"console.log(2)"
+
+
+def test_failure_keeps_input(patched_apk: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    script = tmp_path / "index.js"
+    _ = script.write_text("console.log(2)")
+    before = patched_apk.read_bytes()
+
+    def fail(*_: object):
+        raise RuntimeError("signing failed")
+
+    monkeypatch.setattr("fgi.apk.APK.sign_file", fail)
+    with pytest.raises(RuntimeError):
+        _run("-i", patched_apk, "-l", script)
+    assert patched_apk.read_bytes() == before
+    assert not [path for path in tmp_path.iterdir() if path.name.endswith(".tmp")]